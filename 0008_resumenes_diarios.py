@@ -0,0 +1,95 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:51
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum, F, OuterRef, Subquery, Value, DecimalField, ExpressionWrapper
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Carga inicial de los resúmenes a partir de los productos existentes"""
+    Product = apps.get_model('api', 'Product')
+    Comision = apps.get_model('api', 'Comision')
+    ResumenDiarioCategoria = apps.get_model('api', 'ResumenDiarioCategoria')
+    ResumenDiarioVendedor = apps.get_model('api', 'ResumenDiarioVendedor')
+
+    porcentaje = Coalesce(
+        Subquery(Comision.objects.filter(categoria=OuterRef('categoria'), activa=True).values('porcentaje')[:1]),
+        Value(0),
+        output_field=DecimalField(max_digits=5, decimal_places=2),
+    )
+    filas = (
+        Product.objects.annotate(fecha=TruncDate('fecha_publicacion'), comision_pct=porcentaje)
+        .annotate(comision_importe=ExpressionWrapper(
+            F('precio') * F('comision_pct') * Value(Decimal('0.01')), output_field=DecimalField(max_digits=14, decimal_places=4)
+        ))
+        .values('fecha', 'categoria', 'estado')
+        .annotate(cantidad=Count('id'), valor_total=Sum('precio'), comision_total=Sum('comision_importe'))
+        .order_by()
+    )
+    ResumenDiarioCategoria.objects.bulk_create([
+        ResumenDiarioCategoria(
+            fecha=fila['fecha'], categoria=fila['categoria'], estado=fila['estado'],
+            cantidad=fila['cantidad'], valor=fila['valor_total'], comision=fila['comision_total'] or 0,
+        )
+        for fila in filas
+    ], batch_size=5000)
+
+    filas = (
+        Product.objects.annotate(fecha=TruncDate('fecha_publicacion'))
+        .values('fecha', 'vendedor_id')
+        .annotate(publicaciones=Count('id'))
+        .order_by()
+    )
+    ResumenDiarioVendedor.objects.bulk_create([
+        ResumenDiarioVendedor(fecha=fila['fecha'], vendedor_id=fila['vendedor_id'], publicaciones=fila['publicaciones'])
+        for fila in filas
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('categoria', models.CharField(max_length=100)),
+                ('estado', models.CharField(choices=[('Activo', 'Activo'), ('Pausado', 'Pausado'), ('Vendido', 'Vendido'), ('Eliminado', 'Eliminado')], max_length=20)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('comision', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario por Categoría',
+                'verbose_name_plural': 'Resúmenes Diarios por Categoría',
+                'ordering': ['-fecha', 'categoria', 'estado'],
+                'indexes': [models.Index(fields=['estado', 'fecha'], name='api_resumen_estado_a1e86d_idx'), models.Index(fields=['categoria'], name='api_resumen_categor_b8b1c9_idx')],
+                'unique_together': {('fecha', 'categoria', 'estado')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenDiarioVendedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('publicaciones', models.IntegerField(default=0)),
+                ('vendedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario por Vendedor',
+                'verbose_name_plural': 'Resúmenes Diarios por Vendedor',
+                'ordering': ['-fecha'],
+                'unique_together': {('fecha', 'vendedor')},
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_resumenes_diarios'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='fecha_creacion',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='fecha_publicacion',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_indices_fechas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModeracionLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_nuevo', models.CharField(choices=[('Activo', 'Activo'), ('Pausado', 'Pausado'), ('Vendido', 'Vendido'), ('Eliminado', 'Eliminado')], max_length=20)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('productos', models.JSONField(default=list, help_text='IDs de los productos del lote')),
+                ('criterio', models.JSONField(blank=True, default=dict, help_text='Filtro o selección que originó el cambio')),
+                ('origen', models.CharField(blank=True, default='', max_length=50)),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='moderaciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lote de Moderación',
+                'verbose_name_plural': 'Lotes de Moderación',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_moderacionlote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Versiones redimensionadas de la imagen (ver imagenes.py)'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='banner_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Versiones redimensionadas del banner (ver imagenes.py)'),
+        ),
+    ]
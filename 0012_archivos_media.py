@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:50
+
+import api.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_variantes_imagenes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimage',
+            name='imagen',
+            field=models.ImageField(storage=api.almacenamiento.AlmacenamientoDeduplicado(), upload_to='productos/'),
+        ),
+        migrations.CreateModel(
+            name='ArchivoMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruta', models.CharField(max_length=255, unique=True)),
+                ('hash', models.CharField(db_index=True, max_length=64)),
+                ('tamano', models.BigIntegerField(default=0, help_text='Tamaño en bytes')),
+                ('referencias', models.IntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Archivo de Media',
+                'verbose_name_plural': 'Archivos de Media',
+                'indexes': [models.Index(fields=['referencias', 'fecha_actualizacion'], name='api_archivo_referen_5bddcc_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def poblar_categorias(apps, schema_editor):
+    """
+    Crea las categorías y sus contadores desde los resúmenes diarios y las comisiones, sin
+    recorrer productos. La referencia de los productos existentes se completa después, en
+    lotes, con: python manage.py migrate_categories
+    """
+    Categoria = apps.get_model('api', 'Categoria')
+    Comision = apps.get_model('api', 'Comision')
+    ResumenDiarioCategoria = apps.get_model('api', 'ResumenDiarioCategoria')
+
+    activos = dict(
+        ResumenDiarioCategoria.objects.filter(estado='Activo')
+        .values('categoria').annotate(total=Sum('cantidad')).order_by()
+        .values_list('categoria', 'total')
+    )
+    nombres = set(ResumenDiarioCategoria.objects.values_list('categoria', flat=True).distinct())
+    nombres.update(Comision.objects.values_list('categoria', flat=True))
+    Categoria.objects.bulk_create(
+        [Categoria(nombre=nombre, productos_activos=activos.get(nombre) or 0) for nombre in sorted(nombres)],
+        batch_size=1000,
+    )
+
+    ids = dict(Categoria.objects.values_list('nombre', 'id'))
+    comisiones = list(Comision.objects.all())
+    for comision in comisiones:
+        comision.categoria_ref_id = ids[comision.categoria]
+    Comision.objects.bulk_update(comisiones, ['categoria_ref'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_archivos_media'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Categoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('productos_activos', models.IntegerField(default=0, editable=False, help_text='Productos activos de la categoría (sin subcategorías)')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('padre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='subcategorias', to='api.categoria')),
+            ],
+            options={
+                'verbose_name': 'Categoría',
+                'verbose_name_plural': 'Categorías',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='comision',
+            name='categoria_ref',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='comision', to='api.categoria'),
+        ),
+        # Columna nula y sin índice: no reescribe ni bloquea la tabla de productos
+        migrations.AddField(
+            model_name='product',
+            name='categoria_ref',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='productos', to='api.categoria'),
+        ),
+        migrations.RunPython(poblar_categorias, migrations.RunPython.noop),
+    ]
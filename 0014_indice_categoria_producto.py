@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:46
+
+from django.db import migrations, models
+
+
+INDICE = models.Index(fields=['categoria_ref', 'estado'], name='api_product_categor_afefe9_idx')
+
+
+def crear_indice(apps, schema_editor):
+    # En PostgreSQL se crea sin bloquear las escrituras sobre productos
+    Product = apps.get_model('api', 'Product')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{INDICE.name}" '
+            f'ON "{Product._meta.db_table}" ("categoria_ref_id", "estado")'
+        )
+    else:
+        schema_editor.add_index(Product, INDICE)
+
+
+def borrar_indice(apps, schema_editor):
+    Product = apps.get_model('api', 'Product')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{INDICE.name}"')
+    else:
+        schema_editor.remove_index(Product, INDICE)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('api', '0013_categorias'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(crear_indice, borrar_indice)],
+            state_operations=[migrations.AddIndex(model_name='product', index=INDICE)],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_indice_categoria_producto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='fecha_reserva',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Inicio de la ejecución en curso (ver IDEMPOTENCY_LEASE_SECONDS)'),
+        ),
+    ]
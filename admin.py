@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Product, ProductImage, Comision
+from .models import User, Carrier, Categoria, Product, ProductImage, Comision, ModeracionLote
+from .moderacion import moderar_productos
+from .views import invalidar_carriers
 
 
 @admin.register(User)
@@ -42,18 +44,18 @@ class ProductAdmin(admin.ModelAdmin):
     
     
     def aprobar_productos(self, request, queryset):
-        queryset.update(estado='Activo')
-        self.message_user(request, f'{queryset.count()} productos aprobados.')
+        actualizados, _ = moderar_productos(queryset, 'Activo', usuario=request.user, origen='admin')
+        self.message_user(request, f'{actualizados} productos aprobados.')
     aprobar_productos.short_description = 'Aprobar productos seleccionados'
     
     def pausar_productos(self, request, queryset):
-        queryset.update(estado='Pausado')
-        self.message_user(request, f'{queryset.count()} productos pausados.')
+        actualizados, _ = moderar_productos(queryset, 'Pausado', usuario=request.user, origen='admin')
+        self.message_user(request, f'{actualizados} productos pausados.')
     pausar_productos.short_description = 'Pausar productos seleccionados'
     
     def eliminar_productos(self, request, queryset):
-        queryset.update(estado='Eliminado')
-        self.message_user(request, f'{queryset.count()} productos eliminados.')
+        actualizados, _ = moderar_productos(queryset, 'Eliminado', usuario=request.user, origen='admin')
+        self.message_user(request, f'{actualizados} productos eliminados.')
     eliminar_productos.short_description = 'Eliminar productos seleccionados'
 
 
@@ -63,9 +65,54 @@ class ProductImageAdmin(admin.ModelAdmin):
     list_filter = ('fecha_subida',)
 
 
+@admin.register(Categoria)
+class CategoriaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'padre', 'productos_activos', 'fecha_creacion')
+    list_filter = ('padre',)
+    search_fields = ('nombre',)
+    readonly_fields = ('productos_activos', 'fecha_creacion')
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Los productos y comisiones se vinculan por nombre: renombrar los desvincularía
+        if obj is not None:
+            return self.readonly_fields + ('nombre',)
+        return self.readonly_fields
+
+
 @admin.register(Comision)
 class ComisionAdmin(admin.ModelAdmin):
     list_display = ('categoria', 'porcentaje', 'activa', 'fecha_actualizacion')
     list_filter = ('activa', 'fecha_creacion')
     search_fields = ('categoria',)
     list_editable = ('porcentaje', 'activa')
+
+
+@admin.register(Carrier)
+class CarrierAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'codigo', 'activo', 'fecha_creacion')
+    list_filter = ('activo',)
+    search_fields = ('nombre', 'codigo')
+    actions = ['activar_carriers', 'desactivar_carriers']
+    
+    def _cambiar_activo(self, request, queryset, activo):
+        # update() no dispara las señales que invalidan la caché de carriers activos
+        actualizados = queryset.update(activo=activo)
+        invalidar_carriers()
+        return actualizados
+    
+    def activar_carriers(self, request, queryset):
+        actualizados = self._cambiar_activo(request, queryset, True)
+        self.message_user(request, f'{actualizados} proveedores activados.')
+    activar_carriers.short_description = 'Activar proveedores seleccionados'
+    
+    def desactivar_carriers(self, request, queryset):
+        actualizados = self._cambiar_activo(request, queryset, False)
+        self.message_user(request, f'{actualizados} proveedores desactivados.')
+    desactivar_carriers.short_description = 'Desactivar proveedores seleccionados'
+
+
+@admin.register(ModeracionLote)
+class ModeracionLoteAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'usuario', 'estado_nuevo', 'cantidad', 'origen')
+    list_filter = ('estado_nuevo', 'origen', 'fecha')
+    readonly_fields = ('fecha', 'usuario', 'estado_nuevo', 'cantidad', 'productos', 'criterio', 'origen')
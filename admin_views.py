@@ -1,13 +1,29 @@
+import os
+
+from django.conf import settings
 from django.shortcuts import render, redirect
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import user_passes_test, login_required
 from django.contrib.auth import authenticate, login as auth_login
-from django.http import JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
-from django.db.models import Count, Sum, Q
-from django.utils import timezone
-from datetime import timedelta
-from .models import Product, User, Comision
+from django.db.models import Min, Q
+from datetime import date
+from .models import Product, User, Comision, ResumenDiarioCategoria
+from .categorias import nombres_categorias
+from .moderacion import ESTADOS_VALIDOS, moderar_productos
+from .metricas import metricas_panel, metricas_estadisticas
+from .series import serie
+from .presupuestos import presupuesto_consultas
+from . import consultas_lentas, limites, memoria, perfilado
+from .exportaciones import (
+    FORMATOS, EXPORTACIONES, pagina_keyset, respuesta_streaming, decodificar_cursor,
+    filas_exportacion, cursor_siguiente,
+)
+
+
+PRODUCTOS_POR_PAGINA = 50
+MAX_PRODUCTOS_POR_PAGINA = 200
 
 
 def is_superuser(user):
@@ -23,17 +39,28 @@ def admin_login_view(request):
         password = request.POST.get('password')
         
         if email and password:
+            # Se rechaza antes de buscar el usuario y de calcular el hash de la contraseña
+            espera = limites.verificar_login(request, email)
+            if espera:
+                response = render(request, 'admin_login.html', {
+                    'error': 'Demasiados intentos fallidos. Intenta nuevamente más tarde.'
+                }, status=429)
+                response['Retry-After'] = str(espera)
+                return response
             try:
                 user = User.objects.get(email=email)
                 if user.check_password(password) and user.is_superuser:
+                    limites.registrar_exito(request, email)
                     auth_login(request, user)
                     next_url = request.GET.get('next', '/admin-panel/')
                     return redirect(next_url)
                 else:
+                    limites.registrar_fallo(request, email)
                     return render(request, 'admin_login.html', {
                         'error': 'Credenciales inválidas o no tienes permisos de administrador'
                     })
             except User.DoesNotExist:
+                limites.registrar_fallo(request, email)
                 return render(request, 'admin_login.html', {
                     'error': 'Usuario no encontrado'
                 })
@@ -44,132 +71,20 @@ def admin_login_view(request):
 @user_passes_test(is_superuser)
 def admin_panel(request):
     """Panel principal de administración - Backend completo"""
-    user = request.user
-    
-    # Estadísticas generales
-    total_productos = Product.objects.count()
-    productos_activos = Product.objects.filter(estado='Activo').count()
-    productos_pausados = Product.objects.filter(estado='Pausado').count()
-    productos_vendidos = Product.objects.filter(estado='Vendido').count()
-    
-    total_usuarios = User.objects.count()
-    usuarios_activos = User.objects.filter(is_active=True).count()
-    
-    # Productos recientes
-    productos_recientes = Product.objects.select_related('vendedor').order_by('-fecha_publicacion')[:10]
-    
-    # Productos pendientes de revisión (nuevos)
-    productos_pendientes = Product.objects.filter(
-        estado='Activo',
-        fecha_publicacion__gte=timezone.now() - timedelta(days=7)
-    ).count()
-    
-    # Estadísticas por categoría
-    productos_por_categoria = Product.objects.values('categoria').annotate(
-        total=Count('id')
-    ).order_by('-total')[:10]
-    
-    # Comisiones
-    comisiones = Comision.objects.filter(activa=True).order_by('categoria')
-    
-    # ========== MÉTRICAS FINANCIERAS ==========
-    
-    # Valor total de productos activos
-    valor_total_activos = Product.objects.filter(estado='Activo').aggregate(
-        total=Sum('precio')
-    )['total'] or 0
-    
-    # Valor de productos vendidos
-    valor_vendidos = Product.objects.filter(estado='Vendido').aggregate(
-        total=Sum('precio')
-    )['total'] or 0
-    
-    # Calcular comisiones potenciales (si todos los activos se vendieran)
-    comisiones_potenciales = 0
-    for producto in Product.objects.filter(estado='Activo').select_related():
-        try:
-            comision = Comision.objects.get(categoria=producto.categoria, activa=True)
-            comisiones_potenciales += comision.calcular_comision(producto.precio)
-        except Comision.DoesNotExist:
-            pass
-    
-    # Comisiones de productos vendidos
-    comisiones_reales = 0
-    for producto in Product.objects.filter(estado='Vendido').select_related():
-        try:
-            comision = Comision.objects.get(categoria=producto.categoria, activa=True)
-            comisiones_reales += comision.calcular_comision(producto.precio)
-        except Comision.DoesNotExist:
-            pass
-    
-    # Productos vendidos este mes
-    inicio_mes = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    productos_vendidos_mes = Product.objects.filter(
-        estado='Vendido',
-        fecha_publicacion__gte=inicio_mes
-    ).count()
-    
-    valor_vendido_mes = Product.objects.filter(
-        estado='Vendido',
-        fecha_publicacion__gte=inicio_mes
-    ).aggregate(total=Sum('precio'))['total'] or 0
-    
-    comisiones_mes = 0
-    for producto in Product.objects.filter(estado='Vendido', fecha_publicacion__gte=inicio_mes):
-        try:
-            comision = Comision.objects.get(categoria=producto.categoria, activa=True)
-            comisiones_mes += comision.calcular_comision(producto.precio)
-        except Comision.DoesNotExist:
-            pass
-    
-    # Top categorías por valor
-    categorias_valor = []
-    for cat_data in Product.objects.filter(estado='Activo').values('categoria').annotate(
-        valor_total=Sum('precio'),
-        cantidad=Count('id')
-    ).order_by('-valor_total')[:5]:
-        # Calcular comisión potencial para cada categoría
-        try:
-            comision = Comision.objects.get(categoria=cat_data['categoria'], activa=True)
-            cat_data['comision_potencial'] = (cat_data['valor_total'] * comision.porcentaje) / 100
-        except Comision.DoesNotExist:
-            cat_data['comision_potencial'] = 0
-        categorias_valor.append(cat_data)
-    
-    context = {
-        'user': user,  # Pasar el usuario al template
-        'total_productos': total_productos,
-        'productos_activos': productos_activos,
-        'productos_pausados': productos_pausados,
-        'productos_vendidos': productos_vendidos,
-        'total_usuarios': total_usuarios,
-        'usuarios_activos': usuarios_activos,
-        'productos_pendientes': productos_pendientes,
-        'productos_recientes': productos_recientes,
-        'productos_por_categoria': productos_por_categoria,
-        'comisiones': comisiones,
-        # Métricas financieras
-        'valor_total_activos': valor_total_activos,
-        'valor_vendidos': valor_vendidos,
-        'comisiones_potenciales': comisiones_potenciales,
-        'comisiones_reales': comisiones_reales,
-        'productos_vendidos_mes': productos_vendidos_mes,
-        'valor_vendido_mes': valor_vendido_mes,
-        'comisiones_mes': comisiones_mes,
-        'categorias_valor': categorias_valor,
-    }
+    context = metricas_panel()
+    context['user'] = request.user  # Pasar el usuario al template
     
     return render(request, 'admin_panel.html', context)
 
 
-@user_passes_test(is_superuser)
-def gestionar_productos(request):
-    """Gestión de productos"""
-    estado = request.GET.get('estado', 'todos')
-    categoria = request.GET.get('categoria', '')
-    busqueda = request.GET.get('busqueda', '')
+def _filtrar_productos(params):
+    """Aplica los filtros de estado, categoría, vendedor y búsqueda de la gestión de productos"""
+    estado = params.get('estado', 'todos')
+    categoria = params.get('categoria', '')
+    busqueda = params.get('busqueda', '')
+    vendedor = params.get('vendedor', '')
     
-    productos = Product.objects.select_related('vendedor').all()
+    productos = Product.objects.all()
     
     if estado != 'todos':
         productos = productos.filter(estado=estado)
@@ -177,6 +92,9 @@ def gestionar_productos(request):
     if categoria:
         productos = productos.filter(categoria=categoria)
     
+    if vendedor:
+        productos = productos.filter(vendedor__email=vendedor)
+    
     if busqueda:
         productos = productos.filter(
             Q(titulo__icontains=busqueda) | 
@@ -184,30 +102,106 @@ def gestionar_productos(request):
             Q(vendedor__email__icontains=busqueda)
         )
     
-    productos = productos.order_by('-fecha_publicacion')
+    return productos, estado, categoria, busqueda
+
+
+@user_passes_test(is_superuser)
+def gestionar_productos(request):
+    """Gestión de productos (paginada por cursor)"""
+    productos, estado, categoria, busqueda = _filtrar_productos(request.GET)
     
-    categorias = Product.objects.values_list('categoria', flat=True).distinct()
+    try:
+        tamano = min(int(request.GET.get('tamano', PRODUCTOS_POR_PAGINA)), MAX_PRODUCTOS_POR_PAGINA)
+    except ValueError:
+        tamano = PRODUCTOS_POR_PAGINA
+    
+    pagina, siguiente, anterior = pagina_keyset(
+        productos.select_related('vendedor'),
+        'fecha_publicacion',
+        cursor=request.GET.get('cursor'),
+        direccion=request.GET.get('direccion', 'siguiente'),
+        tamano=max(tamano, 1),
+    )
     
     context = {
-        'productos': productos,
-        'categorias': categorias,
+        'productos': pagina,
+        'categorias': nombres_categorias(),
         'estado_actual': estado,
         'categoria_actual': categoria,
         'busqueda_actual': busqueda,
+        'cursor_siguiente': siguiente,
+        'cursor_anterior': anterior,
+        'tamano_pagina': tamano,
     }
     
     return render(request, 'admin_productos.html', context)
 
 
+@presupuesto_consultas(3)
+@user_passes_test(is_superuser)
+def exportar_productos(request):
+    """Exporta en streaming (CSV o NDJSON) los productos que cumplen los filtros"""
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return JsonResponse({'success': False, 'error': 'Formato inválido'}, status=400)
+    
+    productos, _, _, _ = _filtrar_productos(request.GET)
+    campos = (
+        'id', 'titulo', 'categoria', 'condicion', 'precio', 'stock', 'estado',
+        'fecha_publicacion', 'visitas', 'vendedor__email',
+    )
+    filas = productos.order_by('-fecha_publicacion', '-id').values_list(*campos).iterator(chunk_size=2000)
+    return respuesta_streaming(formato, campos, filas, 'productos')
+
+
+@presupuesto_consultas(3)
+@user_passes_test(is_superuser)
+def exportar_contabilidad(request, tipo):
+    """Exportación contable en streaming de órdenes, envíos o eventos de tracking"""
+    if tipo not in EXPORTACIONES:
+        return JsonResponse({'success': False, 'error': 'Exportación inválida'}, status=404)
+    
+    formato = request.GET.get('formato', 'ndjson')
+    if formato not in FORMATOS:
+        return JsonResponse({'success': False, 'error': 'Formato inválido'}, status=400)
+    
+    try:
+        desde = request.GET.get('desde')
+        hasta = request.GET.get('hasta')
+        desde = date.fromisoformat(desde) if desde else None
+        hasta = date.fromisoformat(hasta) if hasta else None
+        limite = int(request.GET['limite']) if request.GET.get('limite') else None
+        if limite is not None and limite < 1:
+            raise ValueError('limite debe ser mayor a cero')
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Parámetros inválidos'}, status=400)
+    
+    cursor = None
+    if request.GET.get('cursor'):
+        cursor = decodificar_cursor(request.GET['cursor'])
+        if cursor is None:
+            return JsonResponse({'success': False, 'error': 'Cursor inválido'}, status=400)
+    
+    filas = filas_exportacion(tipo, desde, hasta, cursor=cursor, limite=limite)
+    response = respuesta_streaming(
+        formato, EXPORTACIONES[tipo]['campos'], filas, tipo,
+        gzip=request.GET.get('gzip') in ('1', 'true'),
+    )
+    # Para exportaciones por partes: el cliente retoma desde este cursor
+    siguiente = cursor_siguiente(tipo, desde, hasta, cursor=cursor, limite=limite)
+    if siguiente:
+        response['X-Export-Cursor'] = siguiente
+    return response
+
+
 @user_passes_test(is_superuser)
 def gestionar_comisiones(request):
     """Gestión de comisiones"""
     comisiones = Comision.objects.all().order_by('categoria')
     
     # Obtener todas las categorías de productos para crear comisiones faltantes
-    categorias_productos = Product.objects.values_list('categoria', flat=True).distinct()
     categorias_con_comision = Comision.objects.values_list('categoria', flat=True)
-    categorias_sin_comision = set(categorias_productos) - set(categorias_con_comision)
+    categorias_sin_comision = set(nombres_categorias()) - set(categorias_con_comision)
     
     if request.method == 'POST':
         categoria = request.POST.get('categoria')
@@ -247,55 +241,152 @@ def gestionar_comisiones(request):
 @require_http_methods(["POST"])
 def cambiar_estado_producto(request, producto_id):
     """Cambiar estado de un producto (AJAX)"""
-    try:
-        producto = Product.objects.get(id=producto_id)
-        nuevo_estado = request.POST.get('estado')
-        
-        if nuevo_estado in ['Activo', 'Pausado', 'Vendido', 'Eliminado']:
-            producto.estado = nuevo_estado
-            producto.save()
-            return JsonResponse({'success': True, 'estado': nuevo_estado})
-        else:
-            return JsonResponse({'success': False, 'error': 'Estado inválido'})
-    except Product.DoesNotExist:
+    nuevo_estado = request.POST.get('estado')
+    
+    if nuevo_estado not in ESTADOS_VALIDOS:
+        return JsonResponse({'success': False, 'error': 'Estado inválido'})
+    
+    actualizados, _ = moderar_productos(
+        Product.objects.filter(id=producto_id), nuevo_estado,
+        usuario=request.user, criterio={'id': producto_id}, origen='panel',
+    )
+    if not actualizados:
         return JsonResponse({'success': False, 'error': 'Producto no encontrado'})
+    return JsonResponse({'success': True, 'estado': nuevo_estado})
 
 
 @user_passes_test(is_superuser)
-def estadisticas(request):
-    """Página de estadísticas"""
+@require_http_methods(["POST"])
+def cambiar_estado_productos_masivo(request):
+    """
+    Cambiar el estado de muchos productos (AJAX). Recibe 'estado' y una lista de 'ids'
+    o los mismos filtros de la gestión de productos (estado_actual, categoria, vendedor, busqueda).
+    """
+    nuevo_estado = request.POST.get('estado')
+    if nuevo_estado not in ESTADOS_VALIDOS:
+        return JsonResponse({'success': False, 'error': 'Estado inválido'}, status=400)
+    
+    ids = [valor for item in request.POST.getlist('ids') for valor in item.split(',') if valor.strip()]
+    if ids:
+        try:
+            ids = [int(valor) for valor in ids]
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'IDs inválidos'}, status=400)
+        productos = Product.objects.filter(id__in=ids)
+        criterio = {'ids': len(ids)}
+    else:
+        filtros = {
+            'estado': request.POST.get('estado_actual', 'todos'),
+            'categoria': request.POST.get('categoria', ''),
+            'vendedor': request.POST.get('vendedor', ''),
+            'busqueda': request.POST.get('busqueda', ''),
+        }
+        if filtros['estado'] == 'todos' and not any(filtros[c] for c in ('categoria', 'vendedor', 'busqueda')):
+            return JsonResponse(
+                {'success': False, 'error': 'Indica ids o al menos un filtro'}, status=400
+            )
+        productos = _filtrar_productos(filtros)[0]
+        criterio = {clave: valor for clave, valor in filtros.items() if valor and valor != 'todos'}
     
-    # Estadísticas de productos
-    productos_por_estado = Product.objects.values('estado').annotate(
-        total=Count('id')
+    actualizados, lotes = moderar_productos(
+        productos, nuevo_estado, usuario=request.user, criterio=criterio, origen='panel-masivo',
     )
+    return JsonResponse({'success': True, 'estado': nuevo_estado, 'actualizados': actualizados, 'lotes': lotes})
+
+
+@presupuesto_consultas(2)
+@user_passes_test(is_superuser)
+def estadisticas_login(request):
+    """Rechazos del límite de intentos de login (JSON)"""
+    return JsonResponse({'rechazos': limites.estadisticas()})
+
+
+@presupuesto_consultas(2)
+@user_passes_test(is_superuser)
+def perfiles(request):
+    """Perfiles de requests guardados por el perfilador (JSON)"""
+    return JsonResponse({
+        'activo': getattr(settings, 'PROFILING_ENABLED', False),
+        'perfiles': perfilado.listar_perfiles(),
+    })
+
+
+@user_passes_test(is_superuser)
+def descargar_perfil(request, nombre):
+    """Descarga un perfil: formato prof (pstats), json (consultas) o texto (resumen)"""
+    formato = request.GET.get('formato', 'prof')
+    if formato not in ('prof', 'json', 'texto'):
+        return JsonResponse({'success': False, 'error': 'Formato inválido'}, status=400)
+    
+    ruta = perfilado.ruta_perfil(nombre, '.json' if formato == 'json' else '.prof')
+    if ruta is None:
+        return JsonResponse({'success': False, 'error': 'Perfil no encontrado'}, status=404)
+    
+    if formato == 'texto':
+        orden = request.GET.get('orden', 'cumulative')
+        if orden not in ('cumulative', 'tottime', 'calls'):
+            return JsonResponse({'success': False, 'error': 'Orden inválido'}, status=400)
+        return HttpResponse(perfilado.resumen_texto(nombre, orden), content_type='text/plain; charset=utf-8')
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=os.path.basename(ruta))
+
+
+@presupuesto_consultas(2)
+@user_passes_test(is_superuser)
+def consultas_lentas_recientes(request):
+    """Últimas consultas lentas y repetidas registradas por este proceso (JSON)"""
+    tipo = request.GET.get('tipo')
+    registros = [registro for registro in reversed(consultas_lentas.ultimos) if not tipo or registro['tipo'] == tipo]
+    return JsonResponse({'registros': registros})
+
+
+@presupuesto_consultas(2)
+@user_passes_test(is_superuser)
+def memoria_reciente(request):
+    """Últimas alarmas de memoria registradas por este proceso (JSON)"""
+    return JsonResponse({
+        'activo': getattr(settings, 'MEMORY_PROFILING_ENABLED', False),
+        'presupuesto_mb': getattr(settings, 'MEMORY_BUDGET_MB', 64),
+        'registros': list(reversed(memoria.ultimos)),
+    })
+
+
+@user_passes_test(is_superuser)
+def estadisticas(request):
+    """Página de estadísticas"""
+    context = metricas_estadisticas()
     
-    productos_por_categoria = Product.objects.values('categoria').annotate(
-        total=Count('id'),
-        total_activos=Count('id', filter=Q(estado='Activo'))
-    ).order_by('-total')
-    
-    # Productos por mes
-    productos_por_mes = Product.objects.extra(
-        select={'mes': "strftime('%%Y-%%m', fecha_publicacion)"}
-    ).values('mes').annotate(total=Count('id')).order_by('mes')
-    
-    # Usuarios más activos
-    usuarios_activos = User.objects.annotate(
-        productos_count=Count('productos_publicados')
-    ).filter(productos_count__gt=0).order_by('-productos_count')[:10]
-    
-    # Valor total de productos activos
-    valor_total = Product.objects.filter(estado='Activo').aggregate(
-        total=Sum('precio')
-    )['total'] or 0
-    
-    context = {
-        'productos_por_estado': productos_por_estado,
-        'productos_por_categoria': productos_por_categoria,
-        'productos_por_mes': productos_por_mes,
-        'usuarios_activos': usuarios_activos,
-        'valor_total': valor_total,
-    }
+    # Productos por mes (desde el primer mes con publicaciones)
+    primera_fecha = ResumenDiarioCategoria.objects.aggregate(primera=Min('fecha'))['primera']
+    context['productos_por_mes'] = [
+        {'mes': punto['periodo'].strftime('%Y-%m'), 'total': punto['total']}
+        for punto in serie('productos', 'mes', desde=primera_fecha)
+    ]
     
     return render(request, 'admin_estadisticas.html', context)
+
+
+@presupuesto_consultas(3)
+@user_passes_test(is_superuser)
+def estadisticas_series(request):
+    """Serie temporal de productos, órdenes o ingresos (JSON)"""
+    metrica = request.GET.get('metrica', 'productos')
+    granularidad = request.GET.get('granularidad', 'mes')
+    
+    try:
+        desde = request.GET.get('desde')
+        hasta = request.GET.get('hasta')
+        desde = date.fromisoformat(desde) if desde else None
+        hasta = date.fromisoformat(hasta) if hasta else None
+        puntos = serie(metrica, granularidad, desde=desde, hasta=hasta)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'metrica': metrica,
+        'granularidad': granularidad,
+        'serie': [
+            {'periodo': punto['periodo'].isoformat(), 'total': punto['total']}
+            for punto in puntos
+        ],
+    })
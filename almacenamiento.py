@@ -0,0 +1,164 @@
+"""
+Almacenamiento direccionado por contenido para las imágenes de productos.
+
+Cada archivo subido se escribe por chunks a un temporal mientras se calcula su SHA-256 y se
+guarda como <carpeta>/<hh>/<sha256><ext>: el mismo contenido se almacena una sola vez. La
+extensión sale del formato detectado en el contenido, nunca del nombre subido. Las
+referencias de ProductImage se cuentan en ArchivoMedia (ver signals.py) y los archivos sin
+referencias se eliminan con el comando purge_media_orphans.
+"""
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from PIL import Image
+
+
+CARPETA_TEMPORAL = 'tmp'
+
+# Formatos de imagen aceptados y la extensión con la que se guardan (y se sirven)
+EXTENSIONES = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+}
+
+
+def _extension(ruta):
+    """Extensión según el formato real del archivo; UnidentifiedImageError si no es una imagen aceptada"""
+    with Image.open(ruta, formats=list(EXTENSIONES)) as imagen:
+        return EXTENSIONES[imagen.format]
+
+
+def _archivos():
+    # Import diferido: models.py usa este storage en la definición de ProductImage
+    return apps.get_model('api', 'ArchivoMedia').objects
+
+
+@deconstructible
+class AlmacenamientoDeduplicado(FileSystemStorage):
+    """FileSystemStorage que nombra los archivos por el hash de su contenido"""
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre definitivo se decide en _save a partir del contenido
+        return name
+
+    def _save(self, name, content):
+        carpeta = os.path.dirname(name)
+
+        directorio_temporal = self.path(CARPETA_TEMPORAL)
+        os.makedirs(directorio_temporal, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=directorio_temporal)
+        digest = hashlib.sha256()
+        tamano = 0
+        try:
+            with os.fdopen(descriptor, 'wb') as destino:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    destino.write(chunk)
+                    tamano += len(chunk)
+            # Un .html o .svg subido como imagen no se sirve nunca con su extensión original
+            extension = _extension(temporal)
+            hash_contenido = digest.hexdigest()
+            nombre = f'{carpeta}/{hash_contenido[:2]}/{hash_contenido}{extension}'.lstrip('/')
+            ruta = self.path(nombre)
+            if os.path.exists(ruta):
+                os.unlink(temporal)
+            else:
+                os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporal, self.file_permissions_mode)
+                os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.unlink(temporal)
+            raise
+
+        # Un archivo deduplicado vuelve a estar en uso: se renueva su período de gracia para que
+        # purge_media_orphans no lo borre antes de que se guarde el ProductImage que lo referencia
+        if not _archivos().filter(ruta=nombre).update(fecha_actualizacion=timezone.now()):
+            _archivos().get_or_create(ruta=nombre, defaults={'hash': hash_contenido, 'tamano': tamano})
+        return nombre
+
+
+def sumar_referencias(ruta, cantidad=1):
+    """Suma (o resta) referencias al archivo; los nombres que no son del storage se ignoran"""
+    if ruta and cantidad:
+        _archivos().filter(ruta=ruta).update(
+            referencias=F('referencias') + cantidad, fecha_actualizacion=timezone.now()
+        )
+
+
+def recontar_referencias():
+    """Recalcula las referencias de todos los archivos desde ProductImage"""
+    from django.db.models import Count, OuterRef, Subquery, Value
+    from django.db.models.functions import Coalesce
+    from .models import ProductImage
+
+    usos = (
+        ProductImage.objects.filter(imagen=OuterRef('ruta')).order_by()
+        .values('imagen').annotate(total=Count('id')).values('total')
+    )
+    return _archivos().update(referencias=Coalesce(Subquery(usos), Value(0)))
+
+
+def _get_gracia():
+    return timedelta(hours=getattr(settings, 'MEDIA_ORPHAN_GRACE_HOURS', 24))
+
+
+def _borrar_variantes(storage, ruta):
+    # Las variantes (ver imagenes.py) se nombran <carpeta variantes>/<ruta sin extensión>_<tamaño>.<formato>
+    from .imagenes import CARPETA_VARIANTES
+
+    base = os.path.join(CARPETA_VARIANTES, os.path.splitext(ruta)[0])
+    directorio, prefijo = os.path.split(base)
+    try:
+        _, archivos = storage.listdir(directorio)
+    except FileNotFoundError:
+        return
+    for archivo in archivos:
+        if archivo.startswith(prefijo + '_'):
+            storage.delete(os.path.join(directorio, archivo))
+
+
+def eliminar_huerfanos(storage, limite=None, simular=False):
+    """
+    Elimina los archivos sin referencias cuya última modificación supera el período de gracia
+    (MEDIA_ORPHAN_GRACE_HOURS), junto con sus variantes. Devuelve (archivos, bytes liberados).
+    """
+    from .models import ProductImage
+
+    candidatos = _archivos().filter(
+        referencias__lte=0, fecha_actualizacion__lt=timezone.now() - _get_gracia()
+    ).order_by('fecha_actualizacion')
+    if limite:
+        candidatos = candidatos[:limite]
+
+    eliminados = 0
+    liberados = 0
+    for archivo in candidatos.iterator():
+        # El contador es una optimización: antes de borrar se confirma que no haya referencias
+        if ProductImage.objects.filter(imagen=archivo.ruta).exists():
+            continue
+        if not simular:
+            # Solo si nadie lo volvió a subir mientras tanto (eso renueva fecha_actualizacion)
+            borrados, _ = _archivos().filter(
+                pk=archivo.pk, referencias__lte=0, fecha_actualizacion=archivo.fecha_actualizacion
+            ).delete()
+            if not borrados:
+                continue
+            storage.delete(archivo.ruta)
+            _borrar_variantes(storage, archivo.ruta)
+        eliminados += 1
+        liberados += archivo.tamano
+    return eliminados, liberados
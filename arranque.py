@@ -0,0 +1,173 @@
+"""
+Arranque de workers: precarga de módulos y calentamiento de cachés y conexiones.
+
+Sin esto, los primeros requests de cada worker después de un deploy pagan la importación de
+DRF, simplejwt, serializers y vistas, la apertura de la conexión a la base de datos y las
+primeras consultas de proveedores logísticos, comisiones y categorías.
+
+    - precargar(): importa los módulos de la aplicación y arma el resolver de URLs. No toca la
+      base de datos, así que puede correr en el master de gunicorn con --preload.
+    - calentar(): abre las conexiones de cada base y llena las cachés de carriers, comisiones
+      y categorías. Corre en cada worker, después del fork.
+    - iniciar_worker(): lo llaman wsgi.py y asgi.py. Precarga y, salvo con WORKER_PRELOAD
+      (el master precarga y calentar() queda para post_worker_init), calienta las cachés. Con
+      WORKER_WARMUP = False no hace nada.
+
+iniciar_worker() corre al importar la aplicación y cierra las conexiones al terminar: ese
+proceso puede ser un master que después hace fork (los workers heredarían el mismo socket).
+Por eso el camino por defecto calienta las cachés pero no deja conexiones abiertas: solo
+quedan abiertas con calentar() desde post_worker_init, que gunicorn llama en el hilo que
+atiende los requests del worker sync. Con uvicorn/ASGI no hay hook que sirva: Django corre
+el código sincrónico de cada request en un hilo propio (ThreadSensitiveContext) y las
+conexiones son por hilo, así que una conexión abierta de antemano nunca se reusaría; el
+primer request de cada worker ASGI sigue pagando la conexión.
+
+Se registran el tiempo de arranque y la latencia del primer request de cada proceso. Con
+gunicorn --preload, en gunicorn.conf.py:
+
+    preload_app = True
+
+    def post_worker_init(worker):
+        from api.arranque import calentar
+        calentar()
+
+Con uvicorn (sin preload) alcanza con iniciar_worker() desde asgi.py, que calienta las cachés
+(no las conexiones, ver arriba).
+El desglose de tiempos de importación se obtiene con: python manage.py report_import_times
+"""
+import importlib
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.urls import get_resolver
+
+
+# Carga de la aplicación: wsgi.py/asgi.py importan este módulo antes de django.setup()
+INICIO = time.perf_counter()
+
+MODULOS_PRECARGA = (
+    'rest_framework.views',
+    'rest_framework.viewsets',
+    'rest_framework.serializers',
+    'rest_framework_simplejwt.tokens',
+    'rest_framework_simplejwt.authentication',
+    'api.autenticacion',
+    'api.serializers',
+    'api.views',
+    'api.admin_views',
+    'api.media_views',
+)
+
+_lock = threading.Lock()
+_primer_request = {}
+
+
+def _get_habilitado():
+    return getattr(settings, 'WORKER_WARMUP', True)
+
+
+def _get_preload():
+    return getattr(settings, 'WORKER_PRELOAD', False)
+
+
+def _ms(desde):
+    return round((time.perf_counter() - desde) * 1000, 1)
+
+
+def precargar():
+    """Importa los módulos de la aplicación y arma el resolver; devuelve los ms por módulo"""
+    tiempos = {}
+    for modulo in MODULOS_PRECARGA:
+        inicio = time.perf_counter()
+        importlib.import_module(modulo)
+        tiempos[modulo] = _ms(inicio)
+
+    # Importa el URLconf (y con él el resto de las vistas) y llena las tablas de reverse()
+    inicio = time.perf_counter()
+    get_resolver().reverse_dict
+    tiempos['urls'] = _ms(inicio)
+
+    # DRF importa sus clases por defecto (autenticación, permisos, paginación) al usarlas
+    from rest_framework.settings import api_settings
+    for nombre in ('DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_PAGINATION_CLASS',
+                   'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES'):
+        getattr(api_settings, nombre)
+
+    total = round(sum(tiempos.values()), 1)
+    lentos = sorted(tiempos.items(), key=lambda item: item[1], reverse=True)[:3]
+    print(f"🔥 Precarga en {total} ms (pid {os.getpid()}): " + ', '.join(f'{modulo} {ms} ms' for modulo, ms in lentos))
+    return tiempos
+
+
+def calentar(conservar_conexiones=True):
+    """
+    Abre las conexiones y llena las cachés que consultan los primeros requests. Con
+    conservar_conexiones=False cierra las conexiones al terminar
+    """
+    from .categorias import arbol, nombres_categorias
+    from .rollups import porcentajes_comision
+    from .views import carriers_activos
+
+    tiempos = {}
+    for alias in connections if conservar_conexiones else ():
+        inicio = time.perf_counter()
+        try:
+            connections[alias].ensure_connection()
+        except Exception as e:
+            print(f"⚠️ No se pudo abrir la conexión '{alias}': {e}")
+            continue
+        tiempos[f'db:{alias}'] = _ms(inicio)
+
+    for nombre, funcion in (('carriers', carriers_activos), ('comisiones', porcentajes_comision),
+                            ('categorias', nombres_categorias), ('arbol de categorias', arbol)):
+        inicio = time.perf_counter()
+        try:
+            funcion()
+        except Exception as e:
+            print(f"⚠️ No se pudo calentar la caché de {nombre}: {e}")
+            continue
+        tiempos[nombre] = _ms(inicio)
+
+    if conservar_conexiones:
+        # Las conexiones abiertas fuera de un request no se cierran solas: que no queden en
+        # una transacción ni vencidas para el primer request
+        for alias in connections:
+            connections[alias].close_if_unusable_or_obsolete()
+    else:
+        connections.close_all()
+
+    print(f"🔥 Worker {os.getpid()} caliente en {round(sum(tiempos.values()), 1)} ms: "
+          + ', '.join(f'{nombre} {ms} ms' for nombre, ms in tiempos.items()))
+    return tiempos
+
+
+def iniciar_worker():
+    """Hook de wsgi.py/asgi.py: precarga, calienta (sin WORKER_PRELOAD) y mide el primer request"""
+    if not _get_habilitado():
+        return
+    precargar()
+    if not _get_preload():
+        calentar(conservar_conexiones=False)
+    request_started.connect(_primer_request_iniciado, dispatch_uid='arranque_primer_request')
+    print(f"🚀 Proceso {os.getpid()} listo en {_ms(INICIO)} ms desde la carga de la aplicación")
+
+
+def _primer_request_iniciado(sender, **kwargs):
+    with _lock:
+        # Con preload el master conecta la señal y cada worker hereda la conexión
+        if _primer_request.get('pid') == os.getpid():
+            return
+        _primer_request['pid'] = os.getpid()
+        _primer_request['inicio'] = time.perf_counter()
+    request_finished.connect(_primer_request_terminado, dispatch_uid='arranque_primer_request')
+
+
+def _primer_request_terminado(sender, **kwargs):
+    request_started.disconnect(dispatch_uid='arranque_primer_request')
+    request_finished.disconnect(dispatch_uid='arranque_primer_request')
+    print(f"⏱️ Primer request del worker {os.getpid()}: {_ms(_primer_request['inicio'])} ms "
+          f"({_ms(INICIO)} ms desde la carga de la aplicación)")
@@ -0,0 +1,209 @@
+"""
+Autenticación JWT con caché de usuarios.
+
+Los tokens emitidos con TokenMandale llevan los claims que usan los chequeos de permisos
+habituales (is_staff, is_superuser) y un sello de credenciales. JWTCacheAuthentication
+devuelve un UsuarioJWT que responde esos atributos desde el token y solo carga el User
+(desde una caché por worker con TTL corto, AUTH_USER_CACHE_TTL) cuando se lo necesita.
+
+El sello cambia al cambiar la contraseña, desactivar la cuenta o modificar los permisos:
+los tokens con un sello viejo se rechazan. El sello vigente se publica en la caché de Django
+al guardar el usuario (ver signals.py), con el mismo TTL: con una caché compartida (Redis,
+Memcached) llega enseguida a todos los workers; con la caché local por proceso (LocMemCache,
+la default) cada worker lo vuelve a leer de la base a más tardar en AUTH_USER_CACHE_TTL.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils.crypto import salted_hmac
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import replicas
+
+
+CLAIMS_PERMISOS = ('is_staff', 'is_superuser')
+CLAIM_SELLO = 'sello'
+
+MAX_USUARIOS_CACHE = 10000
+
+
+def _get_ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+
+def sello_usuario(usuario):
+    """Huella (HMAC con SECRET_KEY) de las credenciales y permisos del usuario"""
+    datos = f'{usuario.pk}|{usuario.password}|{usuario.is_active}|{usuario.is_staff}|{usuario.is_superuser}'
+    return salted_hmac('api.autenticacion.sello', datos, algorithm='sha256').hexdigest()[:16]
+
+
+def _clave_sello(user_id):
+    return f'auth:sello:{user_id}'
+
+
+class TokenMandale(RefreshToken):
+    """Refresh token (y su access token) con los claims de permisos y el sello del usuario"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in CLAIMS_PERMISOS:
+            token[claim] = bool(getattr(user, claim))
+        token[CLAIM_SELLO] = sello_usuario(user)
+        return token
+
+
+class _CacheUsuarios:
+    """Caché en memoria del proceso: user_id -> (vencimiento, sello, (db, campos) o None)"""
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, user_id):
+        entrada = self._datos.get(user_id)
+        if entrada is None or entrada[0] < time.monotonic():
+            return None
+        return entrada
+
+    def guardar(self, user_id, sello, usuario=None, ttl=None):
+        with self._lock:
+            if len(self._datos) >= MAX_USUARIOS_CACHE:
+                self._datos.pop(next(iter(self._datos)), None)
+            self._datos[user_id] = (time.monotonic() + (_get_ttl() if ttl is None else ttl), sello, usuario)
+
+    def descartar(self, user_id):
+        with self._lock:
+            self._datos.pop(user_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+usuarios_cache = _CacheUsuarios()
+
+
+def _publicar_sello(user_id, sello):
+    # Con vencimiento: un worker que no ve la invalidación (caché no compartida) vuelve a la base
+    ttl = _get_ttl()
+    cache.set(_clave_sello(user_id), (sello, time.time() + ttl), ttl)
+
+
+def invalidar_usuario(usuario, eliminado=False):
+    """Descarta el usuario de la caché local y publica su sello vigente para el resto de los workers"""
+    usuarios_cache.descartar(usuario.pk)
+    if eliminado:
+        cache.delete(_clave_sello(usuario.pk))
+    else:
+        _publicar_sello(usuario.pk, sello_usuario(usuario))
+
+
+def cargar_usuario(user_id):
+    """
+    User desde la caché por worker o, si no está, desde la base de datos. Se cachean los
+    valores de los campos y cada llamada arma una instancia nueva, que no comparte estado.
+    """
+    from .models import User
+
+    entrada = usuarios_cache.obtener(user_id)
+    if entrada is None or entrada[2] is None:
+        try:
+            # Desde la primaria: una réplica atrasada devolvería un sello viejo
+            usuario = User.objects.db_manager('default').get(pk=user_id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('Usuario no encontrado', code='user_not_found')
+        sello = sello_usuario(usuario)
+        campos = {campo.attname: getattr(usuario, campo.attname) for campo in User._meta.concrete_fields}
+        usuarios_cache.guardar(user_id, sello, (usuario._state.db, campos))
+        _publicar_sello(user_id, sello)
+        return usuario
+    db, campos = entrada[2]
+    return User.from_db(db, list(campos), list(campos.values()))
+
+
+def sello_vigente(user_id):
+    """Sello actual del usuario sin consultar la base de datos si está en alguna caché"""
+    entrada = usuarios_cache.obtener(user_id)
+    if entrada:
+        return entrada[1]
+    publicado = cache.get(_clave_sello(user_id))
+    restante = publicado[1] - time.time() if isinstance(publicado, tuple) else 0
+    if restante <= 0:
+        return sello_usuario(cargar_usuario(user_id))
+    # La copia local vence junto con la publicada: el sello nunca tiene más de un TTL
+    usuarios_cache.guardar(user_id, publicado[0], ttl=restante)
+    return publicado[0]
+
+
+class UsuarioJWT(SimpleLazyObject):
+    """
+    Usuario autenticado que responde id, permisos y estado desde el token; cualquier otro
+    atributo carga el User (ver cargar_usuario).
+    """
+
+    def __init__(self, user_id, token):
+        self.__dict__['_user_id'] = user_id
+        self.__dict__['_claims'] = {claim: token[claim] for claim in CLAIMS_PERMISOS if claim in token}
+        super().__init__(lambda: cargar_usuario(user_id))
+
+    def _claim(self, nombre):
+        claims = self.__dict__['_claims']
+        if nombre in claims:
+            return claims[nombre]
+        return getattr(self._setup_y_obtener(), nombre)
+
+    def _setup_y_obtener(self):
+        if self._wrapped is empty:
+            self._setup()
+        return self._wrapped
+
+    id = property(lambda self: self.__dict__['_user_id'])
+    pk = property(lambda self: self.__dict__['_user_id'])
+    is_staff = property(lambda self: self._claim('is_staff'))
+    is_superuser = property(lambda self: self._claim('is_superuser'))
+    # Un token con sello vigente implica una cuenta activa (el sello incluye is_active)
+    is_active = property(lambda self: True)
+    is_authenticated = property(lambda self: True)
+    is_anonymous = property(lambda self: False)
+
+    def __bool__(self):
+        return True
+
+
+class JWTCacheAuthentication(JWTAuthentication):
+    """JWTAuthentication que valida el sello del token sin consultar la base de datos"""
+
+    def get_user(self, validated_token):
+        from .models import User
+
+        try:
+            # El claim puede venir como texto: se normaliza al tipo de la clave primaria
+            user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError):
+            raise InvalidToken('El token no contiene la identificación del usuario')
+        # Read-your-writes: un usuario que escribió hace poco lee de la primaria
+        replicas.usuario_autenticado(user_id)
+
+        sello = validated_token.get(CLAIM_SELLO)
+        if sello is None:
+            # Token emitido antes de los claims: se valida contra el User como siempre
+            usuario = cargar_usuario(user_id)
+            if not usuario.is_active:
+                raise AuthenticationFailed('Usuario inactivo', code='user_inactive')
+            return usuario
+
+        if sello != sello_vigente(user_id):
+            raise AuthenticationFailed(
+                'El token ya no es válido: cambiaron las credenciales o permisos del usuario',
+                code='token_not_valid',
+            )
+        return UsuarioJWT(user_id, validated_token)
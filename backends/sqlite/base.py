@@ -0,0 +1,15 @@
+"""
+Backend SQLite del perfil de producción (DB_PROFILE='sqlite').
+
+Las transacciones de transaction.atomic() empiezan con BEGIN IMMEDIATE: el lock de escritura
+se toma al inicio y, si está ocupado, se espera busy_timeout. Con BEGIN (diferido) una
+transacción que lee y después escribe falla con "database is locked" sin esperar cuando
+otra conexión escribió en el medio.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
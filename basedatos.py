@@ -0,0 +1,26 @@
+"""
+Ajustes de las conexiones a la base de datos según el perfil (DB_PROFILE en settings.py).
+
+En el perfil 'sqlite' cada conexión nueva recibe los PRAGMAs de SQLITE_PRAGMAS: WAL permite
+lecturas concurrentes con una escritura, busy_timeout espera al lock en lugar de fallar con
+"database is locked" y synchronous=NORMAL es seguro con WAL. Con CONN_MAX_AGE las conexiones
+se reutilizan y los PRAGMAs se aplican una sola vez por conexión.
+"""
+from django.conf import settings
+
+
+def aplicar_pragmas(conexion_dbapi, pragmas):
+    """Ejecuta los PRAGMAs en una conexión sqlite3"""
+    cursor = conexion_dbapi.cursor()
+    try:
+        for nombre, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+    finally:
+        cursor.close()
+
+
+def configurar_conexion(connection):
+    """Receptor de connection_created (ver signals.py)"""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if connection.vendor == 'sqlite' and pragmas:
+        aplicar_pragmas(connection.connection, pragmas)
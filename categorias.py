@@ -0,0 +1,171 @@
+"""
+Categorías de productos: tabla Categoria con jerarquía (padre) y contador desnormalizado de
+productos activos, para listar y recorrer categorías sin consultar la tabla de productos.
+
+Product.categoria sigue siendo el nombre que usan la API, la importación y los filtros;
+Product.categoria_ref (y Comision.categoria_ref) apuntan a la fila de Categoria y se
+completan al guardar (signals.py), creando la categoría si no existe. La migración no corta
+el servicio:
+    1. 0013 crea la tabla, agrega las columnas nulas y carga categorías y contadores desde los
+       resúmenes diarios y las comisiones; 0014 crea el índice (CONCURRENTLY en PostgreSQL).
+    2. python manage.py migrate_categories completa la referencia de los productos existentes
+       en lotes cortos, con la aplicación andando.
+
+Los contadores los ajusta rollups.aplicar_delta junto con los resúmenes (por nombre, así que
+no dependen de que la referencia ya esté completa) y se recalculan con rebuild_rollups. El
+árbol cacheado se invalida cuando cambia una categoría; sus contadores pueden tener hasta
+ARBOL_CACHE_TTL segundos de atraso.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .invalidacion import invalidar_claves
+from .models import Categoria, Product, ResumenDiarioCategoria
+
+
+IDS_CACHE_KEY = 'categorias:ids'
+IDS_CACHE_TTL = 60 * 5
+ARBOL_CACHE_KEY = 'categorias:arbol'
+ARBOL_CACHE_TTL = 60
+
+
+def _ids():
+    """{nombre: id} de todas las categorías, cacheado. Solo para lecturas (ver ids_categorias)"""
+    return cache.get_or_set(
+        IDS_CACHE_KEY,
+        lambda: dict(Categoria.objects.values_list('nombre', 'id')),
+        IDS_CACHE_TTL,
+    )
+
+
+def ids_categorias(nombres):
+    """
+    {nombre: id} de las categorías `nombres`, creando las que todavía no existen. Se consulta la
+    base y no la caché: en otro proceso la caché puede tener el id de una categoría ya borrada
+    """
+    nombres = set(nombres)
+    ids = dict(Categoria.objects.filter(nombre__in=nombres).values_list('nombre', 'id'))
+    for nombre in nombres - set(ids):
+        ids[nombre] = Categoria.objects.get_or_create(nombre=nombre)[0].pk
+    return ids
+
+
+def id_categoria(nombre):
+    """Id de la categoría `nombre`; la crea si todavía no existe"""
+    return ids_categorias([nombre])[nombre]
+
+
+def asignar(productos):
+    """Completa categoria_ref de productos que se insertan con bulk_create (que no dispara señales)"""
+    ids = ids_categorias(producto.categoria for producto in productos)
+    for producto in productos:
+        producto.categoria_ref_id = ids[producto.categoria]
+
+
+def completar_referencias(desde=0, lote=1000):
+    """
+    Completa categoria_ref en el siguiente lote de productos sin referencia con id > `desde`.
+    Cada lote es una transacción corta. Devuelve (último id revisado o None al terminar, actualizados)
+    """
+    filas = list(
+        Product.objects.filter(pk__gt=desde, categoria_ref__isnull=True)
+        .order_by('pk').values_list('pk', 'categoria')[:lote]
+    )
+    if not filas:
+        return None, 0
+    por_categoria = {}
+    for pk, nombre in filas:
+        por_categoria.setdefault(nombre, []).append(pk)
+    actualizados = 0
+    with transaction.atomic():
+        ids = ids_categorias(por_categoria)
+        for nombre, pks in por_categoria.items():
+            # Si el producto cambió de categoría mientras tanto, ya lo completó signals.py
+            actualizados += Product.objects.filter(pk__in=pks, categoria=nombre, categoria_ref__isnull=True).update(
+                categoria_ref_id=ids[nombre]
+            )
+    return filas[-1][0], actualizados
+
+
+def nombres_categorias():
+    """Nombres de todas las categorías, ordenados (sin recorrer productos)"""
+    return sorted(_ids())
+
+
+def sumar_activos(nombre, cantidad):
+    """Suma (o resta) productos activos al contador de la categoría"""
+    if not cantidad:
+        return
+    Categoria.objects.filter(pk=id_categoria(nombre)).update(
+        productos_activos=F('productos_activos') + cantidad
+    )
+
+
+def recalcular_contadores():
+    """Recalcula los contadores desde los resúmenes diarios, creando las categorías que falten"""
+    activos = dict(
+        ResumenDiarioCategoria.objects.filter(estado='Activo')
+        .values('categoria').annotate(total=Sum('cantidad')).order_by()
+        .values_list('categoria', 'total')
+    )
+    existentes = set(Categoria.objects.values_list('nombre', flat=True))
+    nuevas = set(ResumenDiarioCategoria.objects.values_list('categoria', flat=True).distinct()) - existentes
+    Categoria.objects.bulk_create([Categoria(nombre=nombre) for nombre in sorted(nuevas)])
+
+    categorias = list(Categoria.objects.only('id', 'nombre', 'productos_activos'))
+    for categoria in categorias:
+        categoria.productos_activos = activos.get(categoria.nombre) or 0
+    Categoria.objects.bulk_update(categorias, ['productos_activos'], batch_size=1000)
+    invalidar()
+
+
+def _construir_arbol():
+    nodos = {}
+    hijos = {}
+    for fila in Categoria.objects.values('id', 'nombre', 'padre_id', 'productos_activos').order_by('nombre'):
+        nodos[fila['id']] = {
+            'id': fila['id'],
+            'nombre': fila['nombre'],
+            'productos_activos': fila['productos_activos'],
+            'subcategorias': [],
+        }
+        hijos.setdefault(fila['padre_id'], []).append(fila['id'])
+
+    def armar(id_):
+        nodo = nodos[id_]
+        nodo['subcategorias'] = [armar(hijo) for hijo in hijos.get(id_, [])]
+        nodo['total_activos'] = nodo['productos_activos'] + sum(hijo['total_activos'] for hijo in nodo['subcategorias'])
+        return nodo
+
+    # Las categorías en un ciclo (padre editado fuera de Categoria.clean) quedan afuera
+    return [armar(id_) for id_ in hijos.get(None, [])]
+
+
+def arbol():
+    """
+    Árbol de categorías: [{'id', 'nombre', 'productos_activos', 'total_activos',
+    'subcategorias': [...]}], con total_activos incluyendo las subcategorías. Cacheado.
+    """
+    return cache.get_or_set(ARBOL_CACHE_KEY, _construir_arbol, ARBOL_CACHE_TTL)
+
+
+def subarbol(nombre):
+    """Nombres de la categoría `nombre` y de todas sus subcategorías (según el árbol cacheado)"""
+    pendientes = list(arbol())
+    while pendientes:
+        nodo = pendientes.pop()
+        if nodo['nombre'] == nombre:
+            nombres = []
+            pendientes = [nodo]
+            while pendientes:
+                nodo = pendientes.pop()
+                nombres.append(nodo['nombre'])
+                pendientes.extend(nodo['subcategorias'])
+            return nombres
+        pendientes.extend(nodo['subcategorias'])
+    return [nombre]
+
+
+def invalidar():
+    invalidar_claves(IDS_CACHE_KEY, ARBOL_CACHE_KEY)
@@ -0,0 +1,170 @@
+"""
+Registro de consultas lentas y repetidas.
+
+ConsultasLentasMiddleware envuelve el execute de cada conexión durante el request:
+    - las consultas que tardan más de SLOW_QUERY_THRESHOLD_MS se registran con su SQL, un
+      digest de los parámetros, la duración, la vista y la línea de la aplicación que la
+      ejecutó (por ejemplo serializers.py:120 en get_imagen_principal, o el campo del
+      serializer, ProductListSerializer.imagenes, si la consulta la hace DRF);
+    - las consultas con la misma forma (el SQL sin valores literales) se agrupan; si una
+      forma se repite SLOW_QUERY_REPEAT_THRESHOLD veces o más en un request se registra
+      como posible N+1, con el origen de la ejecución que alcanzó ese umbral.
+
+Los registros se agregan como líneas JSON a SLOW_QUERY_LOG_FILE (o se imprimen si no está
+definido) y los últimos quedan en memoria para admin-panel/consultas-lentas/.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+
+MAX_REGISTROS_MEMORIA = 500
+MAX_SQL = 2000
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+# Módulos de instrumentación que envuelven el execute: no son el origen de las consultas
+ARCHIVOS_IGNORADOS = ('consultas_lentas.py', 'instrumentacion.py', 'perfilado.py')
+
+PATRON_IN = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+PATRON_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+PATRON_TEXTO = re.compile(r"'(?:[^']|'')*'")
+
+ultimos = deque(maxlen=MAX_REGISTROS_MEMORIA)
+_lock_archivo = threading.Lock()
+
+
+def _get_umbral():
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100) / 1000
+
+
+def _get_repeticiones():
+    return getattr(settings, 'SLOW_QUERY_REPEAT_THRESHOLD', 10)
+
+
+@lru_cache(maxsize=4096)
+def forma_consulta(sql):
+    """SQL normalizado: sin literales y con las listas de IN colapsadas"""
+    sql = PATRON_TEXTO.sub('?', sql)
+    sql = PATRON_NUMERO.sub('?', sql)
+    return PATRON_IN.sub('IN (...)', sql)
+
+
+def origen_consulta():
+    """
+    'archivo.py:línea en función' del frame de la aplicación más cercano a la consulta o, si
+    antes aparece un serializer de DRF (campos anidados o relacionados), 'Serializer.campo'.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        codigo = frame.f_code
+        archivo = codigo.co_filename
+        if archivo.startswith(DIRECTORIO_APP) and os.path.basename(archivo) not in ARCHIVOS_IGNORADOS:
+            return f'{os.path.relpath(archivo, DIRECTORIO_APP)}:{frame.f_lineno} en {codigo.co_name}'
+        if codigo.co_name == 'to_representation' and 'rest_framework' in archivo:
+            serializer = frame.f_locals.get('self')
+            campo = frame.f_locals.get('field')
+            if serializer is not None and getattr(campo, 'field_name', None):
+                return f'{type(serializer).__name__}.{campo.field_name}'
+        frame = frame.f_back
+    return None
+
+
+def _digest(params):
+    if params is None:
+        return None
+    return hashlib.sha256(repr(params).encode('utf-8', 'replace')).hexdigest()[:12]
+
+
+def registrar(datos):
+    """Guarda un registro en memoria y en SLOW_QUERY_LOG_FILE (o lo imprime)"""
+    datos['fecha'] = timezone.now().isoformat()
+    ultimos.append(datos)
+    archivo = getattr(settings, 'SLOW_QUERY_LOG_FILE', '')
+    if not archivo:
+        print(f"🐢 {datos['tipo']} {datos['vista']} | {datos['ms']} ms | {datos['origen']} | {datos['sql'][:200]}")
+        return
+    with _lock_archivo, open(archivo, 'a') as salida:
+        salida.write(json.dumps(datos, ensure_ascii=False) + '\n')
+
+
+class RegistroConsultas:
+    """Consultas de un request; se registra como execute_wrapper de cada conexión"""
+
+    def __init__(self, request):
+        self.request = request
+        self.umbral = _get_umbral()
+        self.repeticiones = _get_repeticiones()
+        self.formas = {}
+
+    def _vista(self):
+        resolver_match = getattr(self.request, 'resolver_match', None)
+        return resolver_match.view_name if resolver_match else self.request.path
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            forma = forma_consulta(sql)
+            grupo = self.formas.get(forma)
+            if grupo is None:
+                grupo = self.formas[forma] = [0, 0.0, None, sql]
+            grupo[0] += 1
+            grupo[1] += duracion
+            if grupo[0] == self.repeticiones:
+                # El origen se busca una sola vez por forma, cuando empieza a repetirse
+                grupo[2] = origen_consulta()
+            if duracion >= self.umbral:
+                registrar({
+                    'tipo': 'lenta',
+                    'vista': self._vista(),
+                    'db': context['connection'].alias,
+                    'ms': round(duracion * 1000, 3),
+                    'sql': sql[:MAX_SQL],
+                    'params': _digest(params),
+                    'origen': origen_consulta(),
+                })
+
+    def repetidas(self):
+        """Registra las formas que superan SLOW_QUERY_REPEAT_THRESHOLD (posibles N+1)"""
+        for cantidad, total, origen, sql in self.formas.values():
+            if self.repeticiones and cantidad >= self.repeticiones:
+                registrar({
+                    'tipo': 'repetida',
+                    'vista': self._vista(),
+                    'cantidad': cantidad,
+                    'ms': round(total * 1000, 3),
+                    'sql': sql[:MAX_SQL],
+                    'origen': origen,
+                })
+
+
+class ConsultasLentasMiddleware:
+    """Registra las consultas lentas y las repetidas de cada request (SLOW_QUERY_ENABLED)"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SLOW_QUERY_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        consultas = RegistroConsultas(request)
+        with ExitStack() as envolturas:
+            for alias in connections:
+                envolturas.enter_context(connections[alias].execute_wrapper(consultas))
+            response = self.get_response(request)
+        consultas.repetidas()
+        return response
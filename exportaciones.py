@@ -0,0 +1,225 @@
+"""
+Utilidades para paginar por cursor (keyset) y exportar querysets en streaming (CSV / NDJSON,
+opcionalmente comprimidos con gzip) sin cargar el resultado completo en memoria.
+
+Incluye las exportaciones contables de órdenes (con su comisión), envíos y eventos de tracking,
+usadas por el panel de administración y el comando export_accounting.
+"""
+import base64
+import csv
+import datetime
+import json
+import zlib
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, F, OuterRef, Subquery, Value, DecimalField, ExpressionWrapper
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Order, Shipment, TrackingEvent, Comision
+
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+TAMANO_CHUNK = 2000
+TAMANO_BLOQUE_GZIP = 64 * 1024
+
+
+class _Eco:
+    """Buffer mínimo para que csv.writer devuelva cada línea en lugar de escribirla"""
+    def write(self, valor):
+        return valor
+
+
+def codificar_cursor(fecha, pk):
+    """Cursor opaco a partir de la fecha y el id de la última fila"""
+    crudo = f'{fecha.isoformat()}|{pk}'.encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, id) o None si el cursor es inválido"""
+    try:
+        fecha, pk = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        fecha = parse_datetime(fecha)
+        return (fecha, int(pk)) if fecha else None
+    except (ValueError, UnicodeError):
+        return None
+
+
+def pagina_keyset(queryset, campo_fecha, cursor=None, direccion='siguiente', tamano=50):
+    """
+    Página de `tamano` filas ordenadas por (-campo_fecha, -id) a partir de un cursor.
+
+    Devuelve (filas, cursor_siguiente, cursor_anterior); los cursores son None cuando no hay
+    más filas en esa dirección. Cada página cuesta una sola consulta indexada.
+    """
+    desde = decodificar_cursor(cursor) if cursor else None
+    atras = desde is not None and direccion == 'anterior'
+
+    if desde:
+        fecha, pk = desde
+        comparacion = 'gt' if atras else 'lt'
+        queryset = queryset.filter(
+            Q(**{f'{campo_fecha}__{comparacion}': fecha}) | Q(**{campo_fecha: fecha, f'id__{comparacion}': pk})
+        )
+
+    orden = (campo_fecha, 'id') if atras else (f'-{campo_fecha}', '-id')
+    filas = list(queryset.order_by(*orden)[:tamano + 1])
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if atras:
+        filas.reverse()
+
+    def cursor_de(fila):
+        return codificar_cursor(getattr(fila, campo_fecha), fila.pk)
+
+    siguiente = cursor_de(filas[-1]) if filas and (hay_mas or atras) else None
+    anterior = cursor_de(filas[0]) if filas and (desde and (not atras or hay_mas)) else None
+    return filas, siguiente, anterior
+
+
+def filas_csv(encabezados, filas, encabezado=True):
+    """Genera las líneas CSV (con encabezado, salvo que se indique lo contrario) de un iterable de tuplas"""
+    escritor = csv.writer(_Eco())
+    if encabezado:
+        yield escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def filas_ndjson(encabezados, filas, encabezado=True):
+    """Genera una línea JSON por fila"""
+    for fila in filas:
+        yield json.dumps(dict(zip(encabezados, fila)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def comprimir_gzip(lineas, tamano_bloque=TAMANO_BLOQUE_GZIP):
+    """Comprime en gzip un iterable de líneas de texto, emitiendo bloques de bytes"""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    pendiente = []
+    acumulado = 0
+    for linea in lineas:
+        datos = linea.encode('utf-8')
+        pendiente.append(datos)
+        acumulado += len(datos)
+        if acumulado >= tamano_bloque:
+            bloque = compresor.compress(b''.join(pendiente))
+            pendiente, acumulado = [], 0
+            if bloque:
+                yield bloque
+    yield compresor.compress(b''.join(pendiente)) + compresor.flush()
+
+
+def lineas_exportacion(formato, encabezados, filas, gzip=False, encabezado=True):
+    """Líneas (o bloques gzip) de una exportación en el formato pedido"""
+    generador = filas_csv if formato == 'csv' else filas_ndjson
+    lineas = generador(encabezados, filas, encabezado=encabezado)
+    return comprimir_gzip(lineas) if gzip else lineas
+
+
+def respuesta_streaming(formato, encabezados, filas, nombre_archivo, gzip=False):
+    """StreamingHttpResponse en CSV o NDJSON (opcionalmente gzip) a partir de un iterable de tuplas"""
+    contenido = lineas_exportacion(formato, encabezados, filas, gzip=gzip)
+    if gzip:
+        response = StreamingHttpResponse(contenido, content_type='application/gzip')
+        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.{formato}.gz"'
+    else:
+        response = StreamingHttpResponse(contenido, content_type=FORMATOS[formato])
+        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.{formato}"'
+    return response
+
+
+# ==================== EXPORTACIONES CONTABLES ====================
+
+def _ordenes():
+    porcentaje = Coalesce(
+        Subquery(
+            Comision.objects.filter(categoria=OuterRef('producto__categoria'), activa=True).values('porcentaje')[:1]
+        ),
+        Value(0),
+        output_field=DecimalField(max_digits=5, decimal_places=2),
+    )
+    return Order.objects.annotate(comision_pct=porcentaje).annotate(
+        comision_importe=ExpressionWrapper(
+            F('precio_total') * F('comision_pct') * Value(Decimal('0.01')),
+            output_field=DecimalField(max_digits=14, decimal_places=4),
+        ),
+    )
+
+
+EXPORTACIONES = {
+    'ordenes': {
+        'queryset': _ordenes,
+        'campo_fecha': 'fecha_creacion',
+        'campos': (
+            'id', 'fecha_creacion', 'fecha_actualizacion', 'estado', 'comprador__email',
+            'vendedor__email', 'producto_id', 'producto__titulo', 'producto__categoria',
+            'cantidad', 'precio_unitario', 'precio_total', 'metodo_pago', 'transaccion_id',
+            'comision_pct', 'comision_importe',
+        ),
+    },
+    'envios': {
+        'queryset': Shipment.objects.all,
+        'campo_fecha': 'fecha_creacion',
+        'campos': (
+            'id', 'fecha_creacion', 'fecha_actualizacion', 'order_id', 'carrier__codigo', 'estado',
+            'costo', 'moneda', 'tracking_number', 'dias_estimados', 'proveedor_envio_id',
+        ),
+    },
+    'tracking': {
+        'queryset': TrackingEvent.objects.all,
+        'campo_fecha': 'fecha_evento',
+        'campos': ('id', 'fecha_evento', 'shipment_id', 'shipment__order_id', 'estado', 'descripcion'),
+    },
+}
+
+
+def _inicio_dia(fecha):
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
+
+
+def queryset_exportacion(tipo, desde=None, hasta=None, cursor=None):
+    """
+    Queryset de la exportación `tipo` entre las fechas locales `desde` y `hasta` (incluidas),
+    ordenado por (fecha, id) ascendente y, si hay cursor, posterior a él.
+    """
+    definicion = EXPORTACIONES[tipo]
+    campo = definicion['campo_fecha']
+    queryset = definicion['queryset']()
+    if desde:
+        queryset = queryset.filter(**{f'{campo}__gte': _inicio_dia(desde)})
+    if hasta:
+        queryset = queryset.filter(**{f'{campo}__lt': _inicio_dia(hasta + datetime.timedelta(days=1))})
+    if cursor:
+        fecha, pk = cursor
+        queryset = queryset.filter(Q(**{f'{campo}__gt': fecha}) | Q(**{campo: fecha, 'id__gt': pk}))
+    return queryset.order_by(campo, 'id')
+
+
+def filas_exportacion(tipo, desde=None, hasta=None, cursor=None, limite=None, chunk_size=TAMANO_CHUNK):
+    """Iterador de tuplas (en el orden de EXPORTACIONES[tipo]['campos']) leído por chunks del servidor"""
+    queryset = queryset_exportacion(tipo, desde, hasta, cursor)
+    if limite is not None:
+        queryset = queryset[:limite]
+    return queryset.values_list(*EXPORTACIONES[tipo]['campos']).iterator(chunk_size=chunk_size)
+
+
+def cursor_siguiente(tipo, desde=None, hasta=None, cursor=None, limite=None):
+    """Cursor de la última fila de una exportación limitada, o None si no quedan más filas"""
+    if limite is None:
+        return None
+    campo = EXPORTACIONES[tipo]['campo_fecha']
+    queryset = queryset_exportacion(tipo, desde, hasta, cursor)
+    ultima = queryset.values_list(campo, 'id')[limite - 1:limite].first()
+    if ultima is None or not queryset.filter(
+        Q(**{f'{campo}__gt': ultima[0]}) | Q(**{campo: ultima[0], 'id__gt': ultima[1]})
+    ).exists():
+        return None
+    return codificar_cursor(*ultima)
@@ -0,0 +1,182 @@
+"""
+Soporte de claves de idempotencia (header Idempotency-Key) para endpoints que modifican datos
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def _get_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+
+
+def _get_wait_timeout():
+    return getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 10)
+
+
+def _get_lease():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LEASE_SECONDS', 60))
+
+
+def _alcance_usuario(request):
+    return request.user.pk if request.user and request.user.is_authenticated else 0
+
+
+def _calcular_clave(request, clave_cliente, alcance):
+    """Clave única por alcance (el usuario, por defecto), método, ruta y valor del header"""
+    base = f"{alcance(request)}:{request.method}:{request.path}:{clave_cliente}"
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()
+
+
+def _calcular_huella(request):
+    """Huella del cuerpo para detectar reutilización de la clave con otros datos"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {k: v for k, v in data.lists() if k not in request.FILES}
+    contenido = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def _reservar(request, clave, huella):
+    """Intenta registrar la clave como 'En proceso'. Devuelve (registro, creado)"""
+    ahora = timezone.now()
+    try:
+        with transaction.atomic():
+            registro = IdempotencyKey.objects.create(
+                clave=clave,
+                usuario=request.user if request.user.is_authenticated else None,
+                metodo=request.method,
+                ruta=request.path,
+                huella=huella,
+                fecha_expiracion=ahora + _get_ttl(),
+            )
+        return registro, True
+    except IntegrityError:
+        pass
+
+    registro = IdempotencyKey.objects.filter(clave=clave).first()
+    if registro is None or registro.fecha_expiracion <= ahora:
+        # La clave expiró (o se liberó entre medio): se descarta y se vuelve a reservar
+        IdempotencyKey.objects.filter(clave=clave, fecha_expiracion__lte=ahora).delete()
+        return _reservar(request, clave, huella)
+    if _abandonada(registro, ahora) and registro.huella == huella:
+        # El worker que la reservó no terminó dentro del lease: este request toma la ejecución
+        tomada = IdempotencyKey.objects.filter(
+            pk=registro.pk, estado='En proceso', fecha_reserva=registro.fecha_reserva,
+        ).update(fecha_reserva=ahora)
+        if tomada:
+            registro.fecha_reserva = ahora
+            return registro, True
+        return _reservar(request, clave, huella)
+    return registro, False
+
+
+def _abandonada(registro, ahora=None):
+    """Una clave 'En proceso' cuyo lease venció: el worker que la reservó murió o se colgó"""
+    return registro.estado == 'En proceso' and registro.fecha_reserva <= (ahora or timezone.now()) - _get_lease()
+
+
+def _esperar_resultado(registro):
+    """Espera a que la solicitud original termine (sondeo con backoff)"""
+    limite = time.monotonic() + _get_wait_timeout()
+    intervalo = 0.05
+    while time.monotonic() < limite:
+        time.sleep(intervalo)
+        intervalo = min(intervalo * 2, 0.5)
+        registro = IdempotencyKey.objects.filter(pk=registro.pk).first()
+        if registro is None or registro.estado == 'Completada':
+            return registro
+        if _abandonada(registro):
+            return None
+    return registro
+
+
+def _respuesta_guardada(registro):
+    response = Response(registro.respuesta, status=registro.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotente(view_func=None, *, alcance=_alcance_usuario):
+    """
+    Decorador para vistas @api_view que modifican datos.
+
+    Si el cliente envía el header Idempotency-Key, la primera respuesta se guarda y
+    los reintentos con la misma clave la reciben sin volver a ejecutar la vista.
+    Los reintentos concurrentes esperan a que termine la solicitud original; si no termina
+    dentro de IDEMPOTENCY_LEASE_SECONDS (el worker murió), un reintento la ejecuta de nuevo.
+
+    Las claves son propias de cada usuario; `alcance(request)` permite otro dueño para
+    vistas sin usuario (por ejemplo el remitente ya verificado de un webhook).
+    """
+    if view_func is None:
+        return lambda vista: idempotente(vista, alcance=alcance)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        clave_cliente = request.headers.get(IDEMPOTENCY_HEADER)
+        if not clave_cliente:
+            return view_func(request, *args, **kwargs)
+
+        if len(clave_cliente) > 255:
+            return Response(
+                {'message': f'El header {IDEMPOTENCY_HEADER} no puede superar los 255 caracteres'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        clave = _calcular_clave(request, clave_cliente, alcance)
+        huella = _calcular_huella(request)
+        registro, creado = _reservar(request, clave, huella)
+
+        if not creado:
+            if registro.huella != huella:
+                return Response(
+                    {'message': f'{IDEMPOTENCY_HEADER} ya fue utilizada con otros datos'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if registro.estado != 'Completada':
+                registro = _esperar_resultado(registro)
+                if registro is None:
+                    # La solicitud original falló (o quedó abandonada): se ejecuta de nuevo
+                    return wrapper(request, *args, **kwargs)
+                if registro.estado != 'Completada':
+                    return Response(
+                        {'message': 'Hay una solicitud con la misma clave en proceso, reintenta más tarde'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+            return _respuesta_guardada(registro)
+
+        # Si otro request tomó la clave por lease vencido, su resultado es el que queda
+        propia = IdempotencyKey.objects.filter(pk=registro.pk, fecha_reserva=registro.fecha_reserva)
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            propia.delete()
+            raise
+
+        if response.status_code >= 500:
+            # Los errores del servidor no se guardan para permitir reintentos
+            propia.delete()
+            return response
+
+        propia.update(
+            estado='Completada',
+            status_code=response.status_code,
+            respuesta=response.data,
+        )
+        return response
+
+    return wrapper
@@ -0,0 +1,236 @@
+"""
+Variantes redimensionadas (miniatura, tarjeta y detalle) en WebP y JPEG de las imágenes
+de productos y banners de usuario.
+
+Las variantes se generan fuera del request en un pool de procesos (IMAGE_DERIVATIVES_WORKERS)
+una vez confirmada la transacción que guardó la imagen; con 0 workers se generan en línea.
+Los modelos se importan dentro de las funciones para que los procesos del pool puedan
+importar este módulo sin inicializar Django.
+"""
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+
+# Ancho máximo (px) de cada variante
+TAMANOS_PRODUCTO = {
+    'miniatura': 160,
+    'tarjeta': 480,
+    'detalle': 1200,
+}
+
+TAMANOS_BANNER = {
+    'tarjeta': 640,
+    'detalle': 1600,
+}
+
+FORMATOS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+CARPETA_VARIANTES = 'variantes'
+
+_pool = None
+
+
+def _get_workers():
+    return getattr(settings, 'IMAGE_DERIVATIVES_WORKERS', 2)
+
+
+def _pool_procesos():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_get_workers())
+    return _pool
+
+
+def _codificar(imagen, formato):
+    opciones = dict(FORMATOS[formato])
+    if formato == 'jpeg' and imagen.mode != 'RGB':
+        imagen = imagen.convert('RGB')
+    buffer = io.BytesIO()
+    imagen.save(buffer, **opciones)
+    return buffer.getvalue()
+
+
+def generar_variantes(nombre, tamanos):
+    """
+    Genera las variantes de la imagen `nombre` del storage. Devuelve
+    {tamaño: {'ancho': px, 'alto': px, 'webp': nombre, 'jpeg': nombre}}.
+
+    No se amplía la imagen: se omiten los tamaños mayores al original, salvo el más chico.
+    """
+    with default_storage.open(nombre, 'rb') as archivo:
+        original = ImageOps.exif_transpose(Image.open(archivo))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+
+    base = os.path.join(CARPETA_VARIANTES, os.path.splitext(nombre)[0])
+    variantes = {}
+    for i, (tamano, ancho) in enumerate(sorted(tamanos.items(), key=lambda t: t[1])):
+        if i and ancho > original.width:
+            break
+        imagen = original.copy()
+        imagen.thumbnail((ancho, ancho * 4), Image.LANCZOS)
+        variante = {'ancho': imagen.width, 'alto': imagen.height}
+        for formato in FORMATOS:
+            variante[formato] = default_storage.save(
+                f'{base}_{tamano}.{formato}', ContentFile(_codificar(imagen, formato))
+            )
+        variantes[tamano] = variante
+    return variantes
+
+
+def borrar_variantes(variantes):
+    for variante in (variantes or {}).values():
+        for formato in FORMATOS:
+            if variante.get(formato):
+                default_storage.delete(variante[formato])
+
+
+def _objetivo(tipo):
+    """(queryset, campo de imagen, campo de variantes, tamaños) de cada tipo de imagen"""
+    from .models import ProductImage, User
+    if tipo == 'producto':
+        return ProductImage.objects.all(), 'imagen', 'variantes', TAMANOS_PRODUCTO
+    return User.objects.all(), 'banner_imagen', 'banner_variantes', TAMANOS_BANNER
+
+
+def guardar_variantes(tipo, nombre, variantes):
+    """
+    Guarda las variantes en todas las filas que usan la imagen `nombre` (las imágenes de
+    productos se deduplican por contenido). Si ya ninguna la usa, descarta las variantes.
+    """
+    queryset, campo, campo_variantes, _ = _objetivo(tipo)
+    if not queryset.filter(**{campo: nombre}).update(**{campo_variantes: variantes}):
+        borrar_variantes(variantes)
+
+
+def _variantes_existentes(tipo, nombre):
+    queryset, campo, campo_variantes, _ = _objetivo(tipo)
+    return (
+        queryset.filter(**{campo: nombre}).exclude(**{campo_variantes: {}})
+        .values_list(campo_variantes, flat=True).first()
+    )
+
+
+def _al_terminar(tipo, nombre, futuro):
+    # Corre en un hilo del pool: se cierra la conexión que abre este hilo
+    try:
+        guardar_variantes(tipo, nombre, futuro.result())
+    except Exception as e:
+        print(f"❌ Error generando variantes de {nombre}: {e}")
+    finally:
+        connection.close()
+
+
+def procesar(tipo, nombre):
+    """
+    Genera las variantes de una imagen en el pool de procesos (o en línea sin workers).
+    Si otra fila ya usa el mismo archivo, reutiliza sus variantes.
+    """
+    existentes = _variantes_existentes(tipo, nombre)
+    if existentes:
+        guardar_variantes(tipo, nombre, existentes)
+        return
+    tamanos = _objetivo(tipo)[3]
+    if _get_workers() <= 0:
+        guardar_variantes(tipo, nombre, generar_variantes(nombre, tamanos))
+        return
+    futuro = _pool_procesos().submit(generar_variantes, nombre, tamanos)
+    futuro.add_done_callback(partial(_al_terminar, tipo, nombre))
+
+
+def encolar(tipo, nombre):
+    """Programa la generación de variantes para cuando se confirme la transacción actual"""
+    if nombre:
+        transaction.on_commit(partial(procesar, tipo, nombre))
+
+
+def generar_pendientes(tipo, workers=None, tamano_lote=200, forzar=False):
+    """
+    Genera las variantes faltantes (o todas, con `forzar`) de un tipo de imagen usando el
+    pool de procesos. Devuelve (procesadas, errores) con errores como [(pk, nombre, mensaje)].
+    """
+    queryset, campo, campo_variantes, tamanos = _objetivo(tipo)
+    queryset = queryset.exclude(**{f'{campo}__isnull': True}).exclude(**{campo: ''})
+    if not forzar:
+        queryset = queryset.filter(**{campo_variantes: {}})
+    workers = _get_workers() if workers is None else workers
+
+    procesadas = 0
+    errores = []
+    ultimo_id = 0
+    vistos = set()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    try:
+        while True:
+            lote = list(
+                queryset.filter(pk__gt=ultimo_id).order_by('pk')
+                .values_list('pk', campo, campo_variantes)[:tamano_lote]
+            )
+            if not lote:
+                break
+            ultimo_id = lote[-1][0]
+            # Un archivo compartido por varias filas se procesa una sola vez
+            pendientes = {}
+            for pk, nombre, variantes in lote:
+                if nombre not in vistos:
+                    vistos.add(nombre)
+                    pendientes[nombre] = (pk, variantes)
+            if executor:
+                futuros = [(nombre, executor.submit(generar_variantes, nombre, tamanos)) for nombre in pendientes]
+            else:
+                futuros = [(nombre, partial(generar_variantes, nombre, tamanos)) for nombre in pendientes]
+            for nombre, futuro in futuros:
+                pk, anteriores = pendientes[nombre]
+                try:
+                    variantes = futuro.result() if executor else futuro()
+                except Exception as e:
+                    errores.append((pk, nombre, str(e)))
+                    continue
+                guardar_variantes(tipo, nombre, variantes)
+                if forzar:
+                    # Los nombres nuevos no pisan a los anteriores: se borran los reemplazados
+                    vigentes = {v[f] for v in variantes.values() for f in FORMATOS}
+                    borrar_variantes({
+                        t: {f: v[f] for f in FORMATOS if v.get(f) not in vigentes}
+                        for t, v in anteriores.items()
+                    })
+                procesadas += 1
+    finally:
+        if executor:
+            executor.shutdown()
+    return procesadas, errores
+
+
+# ==================== URLs PARA SERIALIZERS ====================
+
+def _url(nombre, request=None):
+    url = default_storage.url(nombre)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def url_variante(variantes, tamano, formato='webp', request=None):
+    """URL de la variante pedida (o la más cercana disponible), o None si no hay variantes"""
+    if not variantes:
+        return None
+    variante = variantes.get(tamano) or max(variantes.values(), key=lambda v: v['ancho'])
+    return _url(variante[formato], request)
+
+
+def srcset(variantes, formato='webp', request=None):
+    """Atributo srcset ('url 160w, url 480w, ...') de las variantes en un formato"""
+    return ', '.join(
+        f"{_url(variante[formato], request)} {variante['ancho']}w"
+        for variante in sorted((variantes or {}).values(), key=lambda v: v['ancho'])
+    )
@@ -0,0 +1,284 @@
+"""
+Importación masiva de productos desde CSV o NDJSON.
+
+Las filas se validan con un validador liviano (sin serializers de DRF), los productos se
+insertan con bulk_create por lotes y las imágenes (rutas locales o miembros de un .zip) se
+leen y guardan en paralelo. Los errores se informan por número de fila.
+
+Antes de insertar el primer lote el archivo se recorre una vez para verificar la codificación,
+que se pueda parsear y la cantidad de filas: un archivo inválido no deja productos a medias.
+"""
+import csv
+import io
+import json
+import os
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from .models import Product, ProductImage
+from . import categorias, rollups
+from .almacenamiento import sumar_referencias
+from .imagenes import encolar as encolar_variantes
+
+
+MAX_IMAGENES_POR_PRODUCTO = 5
+TAMANO_LOTE = 1000
+
+CONDICIONES = dict(Product.CONDICION_CHOICES)
+VALORES_VERDADEROS = ('true', '1', 'on', 'si', 'sí')
+
+
+def _get_max_filas():
+    return getattr(settings, 'IMPORT_MAX_ROWS', 50000)
+
+
+def _get_max_bytes_archivo():
+    return getattr(settings, 'IMPORT_MAX_FILE_BYTES', 20 * 1024 * 1024)
+
+
+def _get_max_bytes_zip():
+    return getattr(settings, 'IMPORT_MAX_ZIP_BYTES', 200 * 1024 * 1024)
+
+
+def _get_max_bytes_imagen():
+    return getattr(settings, 'IMPORT_MAX_IMAGE_BYTES', 10 * 1024 * 1024)
+
+
+def tamano_excedido(archivo, archivo_zip=None):
+    """Mensaje de error si el archivo de datos o el .zip de imágenes superan el tamaño máximo"""
+    if archivo.size > _get_max_bytes_archivo():
+        return f'El archivo supera el máximo de {_get_max_bytes_archivo() // (1024 * 1024)} MB'
+    if archivo_zip is not None and archivo_zip.size > _get_max_bytes_zip():
+        return f'El archivo de imágenes supera el máximo de {_get_max_bytes_zip() // (1024 * 1024)} MB'
+    return None
+
+
+def leer_filas(archivo, formato):
+    """Itera las filas (dicts) de un archivo de texto CSV o NDJSON sin cargarlo completo"""
+    if formato == 'csv':
+        yield from csv.DictReader(archivo)
+        return
+    for linea in archivo:
+        linea = linea.strip()
+        if linea:
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                yield {'_error': 'JSON inválido'}
+                continue
+            yield fila if isinstance(fila, dict) else {'_error': 'Cada línea debe ser un objeto JSON'}
+
+
+def verificar_archivo(binario, formato):
+    """
+    Recorre el archivo (binario) completo sin insertar nada: lanza ValueError si no es UTF-8,
+    no se puede parsear o supera IMPORT_MAX_ROWS filas. Deja el archivo al principio.
+    """
+    max_filas = _get_max_filas()
+    texto = io.TextIOWrapper(binario, encoding='utf-8-sig', newline='')
+    try:
+        for numero, _ in enumerate(leer_filas(texto, formato), start=1):
+            if numero > max_filas:
+                raise ValueError(f'El archivo supera el máximo de {max_filas} filas')
+    except UnicodeDecodeError:
+        raise ValueError('El archivo debe estar codificado en UTF-8')
+    except csv.Error as e:
+        raise ValueError(f'CSV inválido: {e}')
+    finally:
+        # detach() evita que el wrapper cierre el archivo subido
+        texto.detach()
+        binario.seek(0)
+
+
+def _decimal(valor, campo, errores, requerido=False, max_digitos=10):
+    if valor in (None, ''):
+        if requerido:
+            errores[campo] = 'Este campo es requerido.'
+        return None
+    try:
+        numero = Decimal(str(valor).replace(',', '.'))
+    except InvalidOperation:
+        errores[campo] = 'Debe ser un número.'
+        return None
+    if not numero.is_finite() or numero < 0:
+        errores[campo] = 'Debe ser un número mayor o igual a 0.'
+        return None
+    numero = numero.quantize(Decimal('0.01'))
+    if len(numero.as_tuple().digits) > max_digitos:
+        errores[campo] = f'No puede tener más de {max_digitos} dígitos.'
+        return None
+    return numero
+
+
+def _texto(valor, campo, errores, requerido=False, max_largo=None):
+    if valor is None:
+        valor = ''
+    if not isinstance(valor, str):
+        errores[campo] = 'Debe ser texto.'
+        return ''
+    valor = valor.strip()
+    if requerido and not valor:
+        errores[campo] = 'Este campo es requerido.'
+    elif max_largo and len(valor) > max_largo:
+        errores[campo] = f'No puede superar los {max_largo} caracteres.'
+    return valor
+
+
+def validar_fila(fila):
+    """Devuelve (datos, imagenes, errores) para una fila de importación"""
+    errores = {}
+    if '_error' in fila:
+        return None, [], {'fila': fila['_error']}
+
+    titulo = _texto(fila.get('titulo'), 'titulo', errores, requerido=True, max_largo=200)
+    categoria = _texto(fila.get('categoria'), 'categoria', errores, requerido=True, max_largo=100)
+
+    condicion = _texto(fila.get('condicion'), 'condicion', errores) or 'Nuevo'
+    if 'condicion' not in errores and condicion not in CONDICIONES:
+        errores['condicion'] = f'Debe ser una de: {", ".join(CONDICIONES)}.'
+
+    stock = fila.get('stock')
+    if stock in (None, ''):
+        stock = 1
+    else:
+        try:
+            stock = int(stock)
+            if stock < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errores['stock'] = 'Debe ser un entero mayor o igual a 0.'
+
+    envio_gratis = fila.get('envio_gratis', False)
+    if isinstance(envio_gratis, str):
+        envio_gratis = envio_gratis.strip().lower() in VALORES_VERDADEROS
+
+    datos = {
+        'titulo': titulo,
+        'descripcion': _texto(fila.get('descripcion'), 'descripcion', errores),
+        'precio': _decimal(fila.get('precio'), 'precio', errores, requerido=True),
+        'categoria': categoria,
+        'condicion': condicion,
+        'stock': stock,
+        'envio_gratis': bool(envio_gratis),
+    }
+    for campo in ('peso_kg', 'alto_cm', 'ancho_cm', 'largo_cm'):
+        datos[campo] = _decimal(fila.get(campo), campo, errores, max_digitos=6)
+
+    imagenes = fila.get('imagenes') or []
+    if isinstance(imagenes, str):
+        imagenes = [ruta.strip() for ruta in imagenes.split(';') if ruta.strip()]
+    if not isinstance(imagenes, list) or not all(isinstance(ruta, str) for ruta in imagenes):
+        errores['imagenes'] = 'Debe ser una lista de rutas.'
+        imagenes = []
+    elif len(imagenes) > MAX_IMAGENES_POR_PRODUCTO:
+        errores['imagenes'] = f'Máximo {MAX_IMAGENES_POR_PRODUCTO} imágenes por producto.'
+
+    return datos, imagenes, errores
+
+
+class FuenteImagenes:
+    """Lee imágenes desde un directorio local y/o un archivo .zip"""
+
+    def __init__(self, directorio=None, archivo_zip=None):
+        self.directorio = os.path.realpath(directorio) if directorio else None
+        self.zip = zipfile.ZipFile(archivo_zip) if archivo_zip else None
+        self.nombres_zip = set(self.zip.namelist()) if self.zip else set()
+
+    def leer(self, ruta):
+        maximo = _get_max_bytes_imagen()
+        if ruta in self.nombres_zip:
+            # zipfile no descomprime más de file_size bytes, así que el tamaño declarado es confiable
+            if self.zip.getinfo(ruta).file_size > maximo:
+                raise OSError(f'la imagen supera el máximo de {maximo} bytes')
+            return self.zip.read(ruta)
+        if self.directorio:
+            completa = os.path.realpath(os.path.join(self.directorio, ruta))
+            # No se permite salir del directorio indicado
+            if completa.startswith(self.directorio + os.sep) and os.path.isfile(completa):
+                if os.path.getsize(completa) > maximo:
+                    raise OSError(f'la imagen supera el máximo de {maximo} bytes')
+                with open(completa, 'rb') as archivo:
+                    return archivo.read()
+        raise FileNotFoundError(ruta)
+
+    def cerrar(self):
+        if self.zip:
+            self.zip.close()
+
+
+def _guardar_imagen(fuente, ruta):
+    contenido = fuente.leer(ruta)
+    storage = ProductImage._meta.get_field('imagen').storage
+    return storage.save(f'productos/{os.path.basename(ruta)}', ContentFile(contenido))
+
+
+def _adjuntar_imagenes(pendientes, fuente, workers):
+    """Guarda en paralelo las imágenes de un lote y crea los ProductImage con bulk_create"""
+    errores = {}
+    if not pendientes or fuente is None:
+        for numero, _, rutas in pendientes:
+            if rutas:
+                errores[numero] = {'imagenes': 'No se indicó directorio ni archivo de imágenes.'}
+        return errores
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futuros = [
+            (numero, producto, ruta, executor.submit(_guardar_imagen, fuente, ruta))
+            for numero, producto, rutas in pendientes
+            for ruta in rutas
+        ]
+        imagenes = []
+        for numero, producto, ruta, futuro in futuros:
+            try:
+                imagenes.append(ProductImage(product=producto, imagen=futuro.result()))
+            except (OSError, KeyError, zipfile.BadZipFile) as e:
+                errores.setdefault(numero, {})['imagenes'] = f'No se pudo leer {ruta}: {e}'
+    ProductImage.objects.bulk_create(imagenes)
+    # bulk_create no dispara señales: se cuentan las referencias y se programan las variantes
+    usos = Counter(imagen.imagen.name for imagen in imagenes)
+    for nombre, cantidad in usos.items():
+        sumar_referencias(nombre, cantidad)
+        encolar_variantes('producto', nombre)
+    return errores
+
+
+def importar_productos(filas, vendedor, fuente_imagenes=None, tamano_lote=TAMANO_LOTE, workers=4):
+    """
+    Importa productos a nombre de `vendedor`. Devuelve {'creados': int, 'errores': [...]},
+    con un elemento por fila rechazada o con imágenes que no se pudieron adjuntar.
+    """
+    creados = 0
+    errores = []
+    lote = []
+
+    def procesar(lote):
+        productos = [Product(vendedor=vendedor, **datos) for _, datos, _ in lote]
+        categorias.asignar(productos)
+        with transaction.atomic():
+            Product.objects.bulk_create(productos, batch_size=tamano_lote)
+            # bulk_create no dispara señales: se actualizan los resúmenes del lote
+            rollups.productos_creados(productos)
+        pendientes = [(numero, producto, rutas) for (numero, _, rutas), producto in zip(lote, productos) if rutas]
+        for numero, error in _adjuntar_imagenes(pendientes, fuente_imagenes, workers).items():
+            errores.append({'fila': numero, 'errores': error})
+        return len(productos)
+
+    for numero, fila in enumerate(filas, start=1):
+        datos, imagenes, errores_fila = validar_fila(fila)
+        if errores_fila:
+            errores.append({'fila': numero, 'errores': errores_fila})
+            continue
+        lote.append((numero, datos, imagenes))
+        if len(lote) >= tamano_lote:
+            creados += procesar(lote)
+            lote = []
+    if lote:
+        creados += procesar(lote)
+
+    return {'creados': creados, 'errores': errores}
@@ -0,0 +1,324 @@
+"""
+Instrumentación de rendimiento por vista.
+
+MetricasMiddleware mide en cada request el tiempo total, la cantidad y el tiempo de las
+consultas a la base de datos (con connection.execute_wrapper, sin DEBUG), el tiempo de los
+serializers de DRF y el tamaño de la respuesta. Los valores se acumulan en histogramas en
+memoria del proceso, etiquetados por nombre de vista, y se exponen en formato de texto de
+Prometheus en /metrics. Las respuestas llevan además un header Server-Timing: para todos, solo
+para el staff o para nadie según METRICS_SERVER_TIMING ('todos', 'staff' o 'no').
+
+Con varios procesos (gunicorn) se define METRICS_MULTIPROC_DIR: cada worker vuelca sus
+histogramas a <pid>.json como máximo cada METRICS_FLUSH_SECONDS y /metrics suma los archivos
+de todos. El directorio se vacía al iniciar el master, por ejemplo en gunicorn.conf.py:
+
+    def on_starting(server):
+        from api.instrumentacion import limpiar_directorio_multiproceso
+        limpiar_directorio_multiproceso()
+"""
+import atexit
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .limites import obtener_ip
+
+
+PREFIJO = 'mandale_http'
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+BUCKETS_MEMORIA = tuple(mb * 1024 * 1024 for mb in (1, 4, 16, 32, 64, 128, 256, 512, 1024))
+
+# nombre -> (buckets, descripción)
+HISTOGRAMAS = {
+    'request_duration_seconds': (BUCKETS_SEGUNDOS, 'Tiempo total del request'),
+    'db_queries': (BUCKETS_CONSULTAS, 'Consultas a la base de datos por request'),
+    'db_duration_seconds': (BUCKETS_SEGUNDOS, 'Tiempo en consultas a la base de datos por request'),
+    'serializer_duration_seconds': (BUCKETS_SEGUNDOS, 'Tiempo en serializers de DRF por request'),
+    'response_size_bytes': (BUCKETS_BYTES, 'Tamaño del cuerpo de la respuesta'),
+    # Solo con MEMORY_PROFILING_ENABLED (ver memoria.py)
+    'memory_peak_bytes': (BUCKETS_MEMORIA, 'Pico de memoria del request (tracemalloc, requests muestreados)'),
+}
+CONTADOR_REQUESTS = 'requests_total'
+# nombre -> (etiquetas, descripción)
+CONTADORES = {
+    CONTADOR_REQUESTS: (('vista', 'estado'), 'Requests atendidos por vista y clase de estado'),
+    'memory_alarms_total': (('vista',), 'Requests que superaron MEMORY_BUDGET_MB'),
+}
+
+SIN_RUTA = 'sin_ruta'
+
+# Medición del request en curso (None fuera de un request instrumentado)
+_medicion = ContextVar('medicion_request', default=None)
+
+
+def _get_directorio():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', '')
+
+
+def _get_intervalo_volcado():
+    return getattr(settings, 'METRICS_FLUSH_SECONDS', 5)
+
+
+class Registro:
+    """Histogramas y contadores del proceso, indexados por (nombre, etiquetas)"""
+
+    def __init__(self):
+        self._histogramas = {}
+        self._contadores = {}
+        self._lock = threading.Lock()
+        self._ultimo_volcado = time.monotonic()
+
+    def observar(self, nombre, vista, valor):
+        buckets = HISTOGRAMAS[nombre][0]
+        with self._lock:
+            valores = self._histogramas.get((nombre, vista))
+            if valores is None:
+                # Un conteo por bucket (el último es +Inf) y la suma
+                valores = self._histogramas[(nombre, vista)] = [0] * (len(buckets) + 1) + [0]
+            valores[bisect_left(buckets, valor)] += 1
+            valores[-1] += valor
+
+    def sumar(self, nombre, etiquetas, cantidad=1):
+        with self._lock:
+            self._contadores[(nombre, etiquetas)] = self._contadores.get((nombre, etiquetas), 0) + cantidad
+
+    def exportar(self):
+        with self._lock:
+            return {
+                'histogramas': [[nombre, vista, list(valores)] for (nombre, vista), valores in self._histogramas.items()],
+                'contadores': [[nombre, list(etiquetas), total] for (nombre, etiquetas), total in self._contadores.items()],
+            }
+
+    def combinar(self, datos):
+        """Suma al registro los datos exportados por otro proceso"""
+        with self._lock:
+            for nombre, vista, valores in datos.get('histogramas', []):
+                if nombre not in HISTOGRAMAS or len(valores) != len(HISTOGRAMAS[nombre][0]) + 2:
+                    continue
+                actuales = self._histogramas.setdefault((nombre, vista), [0] * len(valores))
+                for indice, valor in enumerate(valores):
+                    actuales[indice] += valor
+            for nombre, etiquetas, total in datos.get('contadores', []):
+                clave = (nombre, tuple(etiquetas))
+                self._contadores[clave] = self._contadores.get(clave, 0) + total
+
+    def volcar(self, forzar=False):
+        """Escribe los datos del proceso en METRICS_MULTIPROC_DIR (si está configurado)"""
+        directorio = _get_directorio()
+        if not directorio:
+            return
+        ahora = time.monotonic()
+        if not forzar and ahora - self._ultimo_volcado < _get_intervalo_volcado():
+            return
+        self._ultimo_volcado = ahora
+        os.makedirs(directorio, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as archivo:
+            json.dump(self.exportar(), archivo)
+        os.replace(temporal, os.path.join(directorio, f'{os.getpid()}.json'))
+
+    def texto(self):
+        """Formato de exposición de texto de Prometheus"""
+        with self._lock:
+            histogramas = sorted(self._histogramas.items())
+            contadores = sorted(self._contadores.items())
+
+        lineas = []
+        for nombre, (etiquetas, descripcion) in CONTADORES.items():
+            lineas.append(f'# HELP {PREFIJO}_{nombre} {descripcion}')
+            lineas.append(f'# TYPE {PREFIJO}_{nombre} counter')
+            for (nombre_serie, valores), total in contadores:
+                if nombre_serie != nombre:
+                    continue
+                etiqueta = ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in zip(etiquetas, valores))
+                lineas.append(f'{PREFIJO}_{nombre}{{{etiqueta}}} {total}')
+
+        for nombre, (buckets, descripcion) in HISTOGRAMAS.items():
+            metrica = f'{PREFIJO}_{nombre}'
+            lineas.append(f'# HELP {metrica} {descripcion}')
+            lineas.append(f'# TYPE {metrica} histogram')
+            for (nombre_serie, vista), valores in histogramas:
+                if nombre_serie != nombre:
+                    continue
+                etiqueta = f'vista="{_escapar(vista)}"'
+                acumulado = 0
+                for limite, conteo in zip(list(buckets) + ['+Inf'], valores[:-1]):
+                    acumulado += conteo
+                    lineas.append(f'{metrica}_bucket{{{etiqueta},le="{limite}"}} {acumulado}')
+                lineas.append(f'{metrica}_sum{{{etiqueta}}} {round(valores[-1], 6)}')
+                lineas.append(f'{metrica}_count{{{etiqueta}}} {acumulado}')
+        return '\n'.join(lineas) + '\n'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registro = Registro()
+
+
+def limpiar_directorio_multiproceso():
+    """Borra los archivos de los workers anteriores (llamar al iniciar el servidor)"""
+    directorio = _get_directorio()
+    if not directorio or not os.path.isdir(directorio):
+        return
+    for archivo in os.listdir(directorio):
+        if archivo.endswith(('.json', '.tmp')):
+            os.unlink(os.path.join(directorio, archivo))
+
+
+def registro_combinado():
+    """Registro con los datos de todos los workers (o solo los de este proceso)"""
+    directorio = _get_directorio()
+    if not directorio:
+        return registro
+    registro.volcar(forzar=True)
+    combinado = Registro()
+    for archivo in os.listdir(directorio):
+        if not archivo.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directorio, archivo)) as datos:
+                combinado.combinar(json.load(datos))
+        except (OSError, ValueError):
+            # Archivo de un worker que se está reemplazando o que quedó incompleto
+            continue
+    return combinado
+
+
+class Medicion:
+    """Tiempos acumulados de un request; se registra como execute_wrapper de cada conexión"""
+
+    __slots__ = ('consultas', 'db', 'serializacion', 'serializando')
+
+    def __init__(self):
+        self.consultas = 0
+        self.db = 0.0
+        self.serializacion = 0.0
+        self.serializando = False
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def _medir_serializacion(funcion):
+    @functools.wraps(funcion)
+    def medida(*args, **kwargs):
+        medicion = _medicion.get()
+        if medicion is None or medicion.serializando:
+            # Los serializers anidados ya se cuentan en el del nivel superior
+            return funcion(*args, **kwargs)
+        medicion.serializando = True
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            medicion.serializacion += time.perf_counter() - inicio
+            medicion.serializando = False
+    return medida
+
+
+def _instalar_medicion_serializers():
+    """Mide serializer.data e is_valid() de todos los serializers de DRF"""
+    from rest_framework.serializers import BaseSerializer, ListSerializer
+
+    if getattr(BaseSerializer, '_medicion_instalada', False):
+        return
+    BaseSerializer.data = property(_medir_serializacion(BaseSerializer.data.fget))
+    for clase in (BaseSerializer, ListSerializer):
+        clase.is_valid = _medir_serializacion(clase.__dict__['is_valid'])
+    BaseSerializer._medicion_instalada = True
+
+
+def _nombre_vista(request):
+    resolver_match = getattr(request, 'resolver_match', None)
+    return resolver_match.view_name if resolver_match else SIN_RUTA
+
+
+def _ver_server_timing(request, modo):
+    if modo == 'staff':
+        # DRF deja en el request original el usuario autenticado por JWT
+        usuario = getattr(request, 'user', None)
+        return bool(usuario is not None and usuario.is_authenticated and usuario.is_staff)
+    return modo == 'todos'
+
+
+def _tamano_respuesta(response):
+    if not response.streaming:
+        return len(response.content)
+    return int(response.get('Content-Length') or 0)
+
+
+class MetricasMiddleware:
+    """Registra duración, consultas, serialización y tamaño de cada request (METRICS_ENABLED)"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', 'staff')
+        _instalar_medicion_serializers()
+        if _get_directorio():
+            atexit.register(registro.volcar, forzar=True)
+
+    def __call__(self, request):
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as envolturas:
+                for alias in connections:
+                    envolturas.enter_context(connections[alias].execute_wrapper(medicion))
+                response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        duracion = time.perf_counter() - inicio
+
+        vista = _nombre_vista(request)
+        registro.observar('request_duration_seconds', vista, duracion)
+        registro.observar('db_queries', vista, medicion.consultas)
+        registro.observar('db_duration_seconds', vista, medicion.db)
+        registro.observar('serializer_duration_seconds', vista, medicion.serializacion)
+        registro.observar('response_size_bytes', vista, _tamano_respuesta(response))
+        registro.sumar(CONTADOR_REQUESTS, (vista, f'{response.status_code // 100}xx'))
+        registro.volcar()
+
+        if _ver_server_timing(request, self.server_timing):
+            response['Server-Timing'] = (
+                f'total;dur={duracion * 1000:.1f}, '
+                f'db;dur={medicion.db * 1000:.1f};desc="{medicion.consultas} consultas", '
+                f'serializacion;dur={medicion.serializacion * 1000:.1f}'
+            )
+        return response
+
+
+def vista_metricas(request):
+    """Métricas en formato Prometheus; acceso por IP (METRICS_ALLOWED_IPS) o token (METRICS_TOKEN)"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        autorizado = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        autorizado = obtener_ip(request) in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1'])
+    if not autorizado:
+        return HttpResponseForbidden('No autorizado')
+    return HttpResponse(registro_combinado().texto(), content_type='text/plain; version=0.0.4; charset=utf-8')
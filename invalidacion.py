@@ -0,0 +1,15 @@
+"""
+Invalidación de las cachés que se arman a partir de la base de datos (comisiones, categorías,
+proveedores logísticos).
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+
+def invalidar_claves(*claves):
+    """
+    Borra las claves de la caché ahora y de nuevo cuando se confirma la transacción en curso:
+    mientras seguía abierta, otro proceso pudo volver a cachear los valores anteriores
+    """
+    cache.delete_many(claves)
+    transaction.on_commit(lambda: cache.delete_many(claves))
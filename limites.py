@@ -0,0 +1,204 @@
+"""
+Límites de intentos de login con ventana deslizante, por IP y por cuenta.
+
+Se cuentan los intentos fallidos; cuando una IP o una cuenta supera su límite, los intentos
+siguientes se rechazan antes de buscar el usuario y de calcular el hash de la contraseña.
+Una cuenta bloqueada sigue pudiendo entrar desde las IPs en las que ya inició sesión.
+
+Backends (LOGIN_THROTTLE_BACKEND):
+    'memoria': contadores en memoria de cada worker.
+    'cache':   contadores compartidos en la caché de Django (cache.incr).
+    'mixto':   rechaza con los contadores locales sin ir a la caché y, si no alcanzan el
+               límite, consulta los compartidos. Los intentos se registran en ambos.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+MAX_CLAVES_MEMORIA = 50000
+TTL_IP_CONOCIDA = 60 * 60 * 24 * 30
+
+
+def _get_ventana():
+    return getattr(settings, 'LOGIN_THROTTLE_WINDOW', 900)
+
+
+def _get_limites():
+    return {
+        'ip': getattr(settings, 'LOGIN_THROTTLE_IP_LIMIT', 20),
+        'cuenta': getattr(settings, 'LOGIN_THROTTLE_ACCOUNT_LIMIT', 10),
+    }
+
+
+def _estimar(actual, anterior, ahora, ventana):
+    """Ventana deslizante aproximada: el período anterior pesa según cuánto falta del actual"""
+    transcurrido = (ahora % ventana) / ventana
+    return actual + anterior * (1 - transcurrido)
+
+
+class BackendMemoria:
+    """Contadores por período en memoria del proceso"""
+
+    def __init__(self):
+        self._contadores = {}
+        self._marcas = {}
+        self._totales = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, clave, ahora, ventana):
+        periodo = int(ahora // ventana)
+        with self._lock:
+            if len(self._contadores) >= MAX_CLAVES_MEMORIA:
+                self._purgar(periodo)
+            periodos = self._contadores.setdefault(clave, {})
+            periodos[periodo] = periodos.get(periodo, 0) + 1
+            for viejo in [p for p in periodos if p < periodo - 1]:
+                del periodos[viejo]
+
+    def _purgar(self, periodo):
+        for clave in [c for c, p in self._contadores.items() if max(p, default=0) < periodo - 1]:
+            del self._contadores[clave]
+        if len(self._contadores) >= MAX_CLAVES_MEMORIA:
+            self._contadores.clear()
+
+    def estimar(self, clave, ahora, ventana):
+        periodo = int(ahora // ventana)
+        periodos = self._contadores.get(clave, {})
+        return _estimar(periodos.get(periodo, 0), periodos.get(periodo - 1, 0), ahora, ventana)
+
+    def marcar(self, clave, ttl):
+        with self._lock:
+            if len(self._marcas) >= MAX_CLAVES_MEMORIA:
+                self._marcas.clear()
+            self._marcas[clave] = time.time() + ttl
+
+    def marcado(self, clave):
+        return self._marcas.get(clave, 0) > time.time()
+
+    def sumar(self, clave):
+        with self._lock:
+            self._totales[clave] = self._totales.get(clave, 0) + 1
+
+    def total(self, clave):
+        return self._totales.get(clave, 0)
+
+
+class BackendCache:
+    """Contadores por período en la caché compartida de Django"""
+
+    def _clave(self, clave, periodo):
+        return f'rl:{clave}:{periodo}'
+
+    def registrar(self, clave, ahora, ventana):
+        clave_periodo = self._clave(clave, int(ahora // ventana))
+        # add + incr es atómico en memcached/redis; el TTL cubre el período siguiente
+        if not cache.add(clave_periodo, 1, ventana * 2):
+            try:
+                cache.incr(clave_periodo)
+            except ValueError:
+                cache.set(clave_periodo, 1, ventana * 2)
+
+    def estimar(self, clave, ahora, ventana):
+        periodo = int(ahora // ventana)
+        valores = cache.get_many([self._clave(clave, periodo), self._clave(clave, periodo - 1)])
+        return _estimar(valores.get(self._clave(clave, periodo), 0),
+                        valores.get(self._clave(clave, periodo - 1), 0), ahora, ventana)
+
+    def marcar(self, clave, ttl):
+        cache.set(f'rl:{clave}', True, ttl)
+
+    def marcado(self, clave):
+        return bool(cache.get(f'rl:{clave}'))
+
+    def sumar(self, clave):
+        if not cache.add(f'rl:{clave}', 1, None):
+            try:
+                cache.incr(f'rl:{clave}')
+            except ValueError:
+                cache.set(f'rl:{clave}', 1, None)
+
+    def total(self, clave):
+        return cache.get(f'rl:{clave}', 0)
+
+
+memoria = BackendMemoria()
+compartido = BackendCache()
+
+
+def _backends():
+    modo = getattr(settings, 'LOGIN_THROTTLE_BACKEND', 'mixto')
+    if modo == 'memoria':
+        return [memoria]
+    if modo == 'cache':
+        return [compartido]
+    return [memoria, compartido]
+
+
+def obtener_ip(request):
+    """IP del cliente; con TRUSTED_PROXY_COUNT > 0 se toma de X-Forwarded-For"""
+    proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    reenviadas = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and reenviadas:
+        ips = [ip.strip() for ip in reenviadas.split(',') if ip.strip()]
+        if ips:
+            return ips[-min(proxies, len(ips))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _claves(request, email):
+    cuenta = hashlib.sha256((email or '').strip().lower().encode('utf-8')).hexdigest()[:32]
+    ip = obtener_ip(request)
+    return {'ip': f'login:ip:{ip}', 'cuenta': f'login:cuenta:{cuenta}'}, f'login:conocida:{cuenta}:{ip}'
+
+
+def verificar_login(request, email):
+    """
+    Devuelve None si el intento puede continuar, o los segundos de espera sugeridos
+    (para Retry-After) si la IP o la cuenta superaron su límite de intentos fallidos.
+    """
+    ahora = time.time()
+    ventana = _get_ventana()
+    limites = _get_limites()
+    claves, conocida = _claves(request, email)
+    backends = _backends()
+
+    for ambito in ('ip', 'cuenta'):
+        if not any(backend.estimar(claves[ambito], ahora, ventana) >= limites[ambito] for backend in backends):
+            continue
+        if ambito == 'cuenta' and any(backend.marcado(conocida) for backend in backends):
+            # IP desde la que la cuenta ya inició sesión: no se bloquea al dueño durante un ataque
+            continue
+        for backend in backends:
+            backend.sumar(f'login:rechazos:{ambito}')
+        return max(1, int(ventana - ahora % ventana))
+    return None
+
+
+def registrar_fallo(request, email):
+    ahora = time.time()
+    ventana = _get_ventana()
+    claves, _ = _claves(request, email)
+    for backend in _backends():
+        for clave in claves.values():
+            backend.registrar(clave, ahora, ventana)
+
+
+def registrar_exito(request, email):
+    _, conocida = _claves(request, email)
+    for backend in _backends():
+        backend.marcar(conocida, TTL_IP_CONOCIDA)
+
+
+def estadisticas():
+    """Rechazos por ámbito: 'worker' cuenta los de este proceso y 'total' los compartidos"""
+    return {
+        ambito: {
+            'worker': memoria.total(f'login:rechazos:{ambito}'),
+            'total': compartido.total(f'login:rechazos:{ambito}'),
+        }
+        for ambito in ('ip', 'cuenta')
+    }
@@ -0,0 +1,78 @@
+"""
+Benchmark de regresión del panel de administración: verifica que la cantidad de
+consultas no crece con el tamaño del catálogo
+"""
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.metricas import metricas_panel
+from api.rollups import reconstruir_resumenes
+from api.models import Product, User, Comision
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas y tiempo de las métricas del panel con catálogos de distinto tamaño (los datos se descartan al terminar)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', nargs='+', type=int, default=[100, 1000, 100000],
+                            help='Cantidades de productos a medir (acumulativas)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        tamanos = sorted(options['tamanos'])
+        resultados = []
+
+        with transaction.atomic():
+            vendedor = User.objects.create(
+                email='benchmark-panel@mandale.local', username='benchmark-panel', nombre='Benchmark',
+            )
+            categorias = [f'Categoría {i}' for i in range(20)]
+            Comision.objects.bulk_create(
+                [Comision(categoria=c, porcentaje=Decimal('5.00') + i) for i, c in enumerate(categorias[:15])],
+                ignore_conflicts=True,
+            )
+
+            existentes = 0
+            for tamano in tamanos:
+                self._crear_productos(vendedor, categorias, tamano - existentes, options['batch_size'])
+                existentes = tamano
+                reconstruir_resumenes()
+
+                with CaptureQueriesContext(connection) as contexto:
+                    inicio = time.perf_counter()
+                    metricas_panel()
+                    duracion = time.perf_counter() - inicio
+                resultados.append((tamano, len(contexto.captured_queries), duracion))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'productos':>10}  {'consultas':>9}  {'tiempo (ms)':>11}")
+        for tamano, consultas, duracion in resultados:
+            self.stdout.write(f"{tamano:>10}  {consultas:>9}  {duracion * 1000:>11.1f}")
+
+        if len({consultas for _, consultas, _ in resultados}) > 1:
+            raise CommandError('La cantidad de consultas del panel depende del tamaño del catálogo')
+        self.stdout.write(self.style.SUCCESS('Cantidad de consultas constante'))
+
+    def _crear_productos(self, vendedor, categorias, cantidad, batch_size):
+        estados = ['Activo', 'Activo', 'Activo', 'Pausado', 'Vendido']
+        lote = []
+        for _ in range(max(cantidad, 0)):
+            lote.append(Product(
+                titulo='Producto de benchmark',
+                descripcion='',
+                precio=Decimal(random.randint(100, 100000)),
+                categoria=random.choice(categorias),
+                estado=random.choice(estados),
+                vendedor=vendedor,
+            ))
+            if len(lote) >= batch_size:
+                Product.objects.bulk_create(lote)
+                lote = []
+        if lote:
+            Product.objects.bulk_create(lote)
@@ -0,0 +1,351 @@
+"""
+Benchmark de carga de la API: throughput y latencias p50/p95/p99 por endpoint, en proceso
+(django.test.Client) o contra un servidor local, con comparación contra una corrida anterior
+"""
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import get_resolver, reverse
+
+from api import views
+from api.autenticacion import TokenMandale
+from api.models import Carrier, Message, Order, Product, Rating, Shipment, User
+
+
+DOMINIO_BENCHMARK = 'benchmark-api.local'
+PALABRAS_BUSQUEDA = ['zapatillas', 'mesa', 'celular', 'remera', 'bici', 'auriculares']
+PRODUCTOS_CARRITO = 5
+
+
+def _vista_productos(accion):
+    """Vista del ProductViewSet para la acción pedida, tomada del URLconf"""
+    for vista in get_resolver().reverse_dict.keys():
+        if getattr(vista, 'cls', None) is views.ProductViewSet and accion in getattr(vista, 'actions', {}).values():
+            return vista
+    raise CommandError(f'El URLconf no expone la acción {accion} de ProductViewSet')
+
+
+class ClienteLocal:
+    """Requests en el mismo proceso, sin red"""
+
+    def __init__(self, token):
+        self.client = Client(raise_request_exception=False)
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def pedir(self, metodo, ruta, datos=None, headers=None):
+        extra = {**self.headers, **{f"HTTP_{k.upper().replace('-', '_')}": v for k, v in (headers or {}).items()}}
+        if metodo == 'GET':
+            return self.client.get(ruta, **extra).status_code
+        return self.client.post(ruta, data=json.dumps(datos or {}), content_type='application/json', **extra).status_code
+
+    def cerrar(self):
+        connections.close_all()
+
+
+class ClienteHTTP:
+    """Requests HTTP con keep-alive contra un servidor (runserver, gunicorn...)"""
+
+    def __init__(self, token, url):
+        partes = urlsplit(url)
+        clase = http.client.HTTPSConnection if partes.scheme == 'https' else http.client.HTTPConnection
+        self.conexion = clase(partes.hostname, partes.port, timeout=30)
+        self.headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+
+    def pedir(self, metodo, ruta, datos=None, headers=None):
+        cuerpo = json.dumps(datos).encode() if datos is not None else None
+        self.conexion.request(metodo, ruta, body=cuerpo, headers={**self.headers, **(headers or {})})
+        respuesta = self.conexion.getresponse()
+        respuesta.read()
+        return respuesta.status
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+# Escenarios: nombre -> función(cliente, datos, azar) que devuelve los códigos de estado obtenidos
+
+def productos_lista(cliente, datos, azar):
+    return [cliente.pedir('GET', datos['rutas']['lista'])]
+
+
+def productos_busqueda(cliente, datos, azar):
+    return [cliente.pedir('GET', f"{datos['rutas']['lista']}?busqueda={azar.choice(PALABRAS_BUSQUEDA)}")]
+
+
+def producto_detalle(cliente, datos, azar):
+    return [cliente.pedir('GET', azar.choice(datos['rutas']['detalles']))]
+
+
+def carrito(cliente, datos, azar):
+    # La página del carrito pide el detalle de cada producto
+    return [
+        cliente.pedir('GET', ruta)
+        for ruta in azar.sample(datos['rutas']['detalles'], min(PRODUCTOS_CARRITO, len(datos['rutas']['detalles'])))
+    ]
+
+
+def checkout(cliente, datos, azar):
+    return [cliente.pedir('POST', datos['rutas']['crear_orden'], {
+        'producto_id': azar.choice(datos['productos_propios']),
+        'cantidad': 1,
+        'metodo_pago': 'mercadopago',
+        'direccion_entrega': 'Av. Siempreviva 742',
+    }, headers={'Idempotency-Key': uuid.uuid4().hex})]
+
+
+def mensajes(cliente, datos, azar):
+    return [cliente.pedir('POST', datos['rutas']['enviar_mensaje'], {
+        'destinatario_id': datos['vendedor'],
+        'asunto': 'Consulta',
+        'mensaje': '¿Está disponible?',
+    })]
+
+
+def calificaciones(cliente, datos, azar):
+    return [cliente.pedir('GET', datos['rutas']['calificaciones'])]
+
+
+def cotizacion_envio(cliente, datos, azar):
+    return [cliente.pedir('POST', datos['rutas']['cotizar_envio'], {
+        'producto_id': azar.choice(datos['productos_propios']),
+        'cantidad': 1,
+        'origen_cp': '1425',
+        'destino_cp': '5000',
+    })]
+
+
+def webhook_envio(cliente, datos, azar):
+    return [cliente.pedir('POST', datos['rutas']['webhook_envio'], {
+        'tracking_number': datos['tracking'],
+        'estado': azar.choice(['En camino', 'En sucursal', 'Entregado']),
+        'descripcion': 'Evento de benchmark',
+    }, headers={'X-Webhook-Secret': getattr(settings, 'SHIPPING_WEBHOOK_SECRET', '')})]
+
+
+ESCENARIOS = {
+    'productos_lista': productos_lista,
+    'productos_busqueda': productos_busqueda,
+    'producto_detalle': producto_detalle,
+    'carrito': carrito,
+    'checkout': checkout,
+    'mensajes': mensajes,
+    'calificaciones': calificaciones,
+    'cotizacion_envio': cotizacion_envio,
+    'webhook_envio': webhook_envio,
+}
+
+
+def _percentil(latencias, p):
+    return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000 if latencias else 0
+
+
+class Command(BaseCommand):
+    help = 'Mide throughput y latencias p50/p95/p99 de los endpoints principales de la API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='',
+                            help='Servidor a medir (http://localhost:8000); sin --url se mide en proceso')
+        parser.add_argument('--endpoints', nargs='+', choices=list(ESCENARIOS), default=list(ESCENARIOS))
+        parser.add_argument('--requests', type=int, default=200, help='Operaciones por endpoint')
+        parser.add_argument('--concurrencia', type=int, default=1, help='Clientes simultáneos')
+        parser.add_argument('--warmup', type=int, default=10, help='Operaciones descartadas por endpoint')
+        parser.add_argument('--productos', type=int, default=200,
+                            help='Productos propios del benchmark (el catálogo existente también se usa)')
+        parser.add_argument('--salida', default='', help='Archivo JSON donde guardar los resultados')
+        parser.add_argument('--comparar', default='', help='Resultados JSON de una corrida anterior')
+        parser.add_argument('--umbral', type=float, default=0.10,
+                            help='Regresión tolerada en p95 y throughput (fracción) al comparar')
+        parser.add_argument('--conservar', action='store_true', help='No borrar los datos creados por el benchmark')
+
+    def handle(self, *args, **options):
+        datos = self._preparar_datos(options['productos'])
+        try:
+            resultados = {}
+            for nombre in options['endpoints']:
+                resultados[nombre] = self._medir(ESCENARIOS[nombre], datos, options)
+        finally:
+            if not options['conservar']:
+                User.objects.filter(email__endswith=f'@{DOMINIO_BENCHMARK}').delete()
+
+        self.stdout.write(f"{'endpoint':<20} {'req/s':>9} {'errores':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for nombre, resultado in resultados.items():
+            self.stdout.write(
+                f"{nombre:<20} {resultado['throughput']:>9.1f} {resultado['errores']:>8} "
+                f"{resultado['p50_ms']:>8.2f} {resultado['p95_ms']:>8.2f} {resultado['p99_ms']:>8.2f}"
+            )
+
+        corrida = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'modo': options['url'] or 'proceso',
+            'concurrencia': options['concurrencia'],
+            'requests': options['requests'],
+            'endpoints': resultados,
+        }
+        if options['salida']:
+            with open(options['salida'], 'w') as archivo:
+                json.dump(corrida, archivo, indent=2)
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+        if options['comparar']:
+            self._comparar(corrida, options['comparar'], options['umbral'])
+
+    def _preparar_datos(self, cantidad):
+        """Usuarios, productos, una orden con envío y calificaciones propias del benchmark"""
+        User.objects.filter(email__endswith=f'@{DOMINIO_BENCHMARK}').delete()
+        vendedor = User.objects.create_user(
+            email=f'vendedor@{DOMINIO_BENCHMARK}', username='benchmark-api-vendedor',
+            nombre='Vendedor benchmark', password=uuid.uuid4().hex,
+        )
+        comprador = User.objects.create_user(
+            email=f'comprador@{DOMINIO_BENCHMARK}', username='benchmark-api-comprador',
+            nombre='Comprador benchmark', password=uuid.uuid4().hex, mercadopago_activa=True,
+        )
+        # create() y no bulk_create(): las señales mantienen los resúmenes diarios al crear y al borrar
+        propios = [
+            Product.objects.create(
+                titulo=f'{random.choice(PALABRAS_BUSQUEDA).capitalize()} de benchmark {i}',
+                descripcion='Producto creado por benchmark_api',
+                precio=Decimal(random.randint(1000, 100000)),
+                categoria='Benchmark',
+                stock=10 ** 9,
+                peso_kg=Decimal('1.50'),
+                vendedor=vendedor,
+            ).id
+            for i in range(cantidad)
+        ]
+        catalogo = list(Product.objects.filter(estado='Activo').order_by('?').values_list('id', flat=True)[:5000])
+
+        ordenes = [
+            Order.objects.create(
+                comprador=comprador, vendedor=vendedor, producto_id=producto, cantidad=1,
+                precio_unitario=Decimal('1000'), metodo_pago='mercadopago',
+            )
+            for producto in propios[:10]
+        ]
+        Rating.objects.bulk_create([
+            Rating(calificador=comprador, calificado=vendedor, orden=orden, estrellas=random.randint(3, 5))
+            for orden in ordenes
+        ])
+        Message.objects.create(remitente=vendedor, destinatario=comprador, mensaje='Gracias por tu compra')
+        views._asegurar_proveedores_default()
+        carrier = Carrier.objects.filter(activo=True).first()
+        tracking = f'BENCH-{uuid.uuid4().hex[:12]}'
+        Shipment.objects.create(order=ordenes[0], carrier=carrier, estado='Creado', tracking_number=tracking)
+
+        # Las rutas se resuelven acá: recorrer el URLconf en cada operación sumaría a la latencia medida
+        detalle = _vista_productos('retrieve')
+        return {
+            'token': str(TokenMandale.for_user(comprador).access_token),
+            'vendedor': vendedor.id,
+            'productos_propios': propios,
+            'tracking': tracking,
+            'rutas': {
+                'lista': reverse(_vista_productos('list')),
+                'detalles': [reverse(detalle, args=[producto]) for producto in catalogo or propios],
+                'crear_orden': reverse(views.crear_orden),
+                'enviar_mensaje': reverse(views.enviar_mensaje),
+                'calificaciones': reverse(views.calificaciones_usuario, args=[vendedor.id]),
+                'cotizar_envio': reverse(views.shipping_quote),
+                'webhook_envio': reverse(views.shipping_webhook),
+            },
+        }
+
+    def _cliente(self, datos, options):
+        if options['url']:
+            return ClienteHTTP(datos['token'], options['url'])
+        return ClienteLocal(datos['token'])
+
+    def _medir(self, escenario, datos, options):
+        concurrencia = max(options['concurrencia'], 1)
+        por_cliente = max(options['requests'] // concurrencia, 1)
+        latencias = []
+        errores = []
+        lock = threading.Lock()
+        listos = threading.Barrier(concurrencia + 1)
+
+        def trabajador(semilla):
+            azar = random.Random(semilla)
+            cliente = self._cliente(datos, options)
+            propias = []
+            fallidas = 0
+            try:
+                for _ in range(options['warmup']):
+                    escenario(cliente, datos, azar)
+                listos.wait()
+                for _ in range(por_cliente):
+                    inicio = time.perf_counter()
+                    estados = escenario(cliente, datos, azar)
+                    propias.append(time.perf_counter() - inicio)
+                    if any(estado >= 400 for estado in estados):
+                        fallidas += 1
+            except BaseException:
+                # Libera al resto de los hilos y al principal si falla la preparación
+                listos.abort()
+                raise
+            finally:
+                cliente.cerrar()
+                with lock:
+                    latencias.extend(propias)
+                    errores.append(fallidas)
+
+        hilos = [threading.Thread(target=trabajador, args=(i,)) for i in range(concurrencia)]
+        for hilo in hilos:
+            hilo.start()
+        try:
+            listos.wait()
+        except threading.BrokenBarrierError:
+            for hilo in hilos:
+                hilo.join()
+            raise CommandError(f'Falló la preparación del escenario {escenario.__name__}')
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        latencias.sort()
+        return {
+            'requests': len(latencias),
+            'errores': sum(errores),
+            'throughput': round(len(latencias) / duracion, 2) if duracion else 0,
+            'media_ms': round(sum(latencias) / len(latencias) * 1000, 3) if latencias else 0,
+            'p50_ms': round(_percentil(latencias, 0.50), 3),
+            'p95_ms': round(_percentil(latencias, 0.95), 3),
+            'p99_ms': round(_percentil(latencias, 0.99), 3),
+        }
+
+    def _comparar(self, corrida, archivo, umbral):
+        with open(archivo) as entrada:
+            anterior = json.load(entrada)
+        if (anterior.get('modo'), anterior.get('concurrencia')) != (corrida['modo'], corrida['concurrencia']):
+            self.stdout.write(self.style.WARNING(
+                f"La corrida anterior usó modo {anterior.get('modo')} y concurrencia {anterior.get('concurrencia')}: "
+                'los resultados no son directamente comparables'
+            ))
+        anterior = anterior['endpoints']
+
+        regresiones = []
+        self.stdout.write(f"\n{'endpoint':<20} {'Δ req/s':>9} {'Δ p95':>8}")
+        for nombre, actual in corrida['endpoints'].items():
+            base = anterior.get(nombre)
+            if not base or not base['throughput'] or not base['p95_ms']:
+                continue
+            delta_throughput = actual['throughput'] / base['throughput'] - 1
+            delta_p95 = actual['p95_ms'] / base['p95_ms'] - 1
+            self.stdout.write(f"{nombre:<20} {delta_throughput:>+9.1%} {delta_p95:>+8.1%}")
+            if delta_throughput < -umbral or delta_p95 > umbral:
+                regresiones.append(nombre)
+
+        if regresiones:
+            raise CommandError(f'Regresión mayor a {umbral:.0%} en: {", ".join(regresiones)}')
+        self.stdout.write(self.style.SUCCESS(f'Sin regresiones mayores a {umbral:.0%}'))
@@ -0,0 +1,143 @@
+"""
+Compara los perfiles de SQLite bajo escrituras concurrentes (visitas y checkouts)
+"""
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.basedatos import aplicar_pragmas
+
+
+# Timeout por defecto de sqlite3.connect, el que usa Django si no se configura OPTIONS['timeout']
+TIMEOUT_DESARROLLO = 5.0
+
+
+def _perfiles():
+    """perfil -> (PRAGMAs, timeout de conexión, sentencia que abre las transacciones)"""
+    return {
+        'desarrollo': ({}, TIMEOUT_DESARROLLO, 'BEGIN'),
+        'sqlite': (settings.SQLITE_PRAGMAS_PRODUCCION, 20.0, 'BEGIN IMMEDIATE'),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mide throughput, latencia y errores "database is locked" de cada perfil de SQLite con hilos concurrentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfiles', nargs='+', default=['desarrollo', 'sqlite'])
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--duracion', type=float, default=5.0, help='Segundos por perfil')
+        parser.add_argument('--productos', type=int, default=1000)
+        parser.add_argument('--escrituras', type=float, default=0.3,
+                            help='Fracción de operaciones que escriben (2/3 visitas, 1/3 checkouts)')
+
+    def handle(self, *args, **options):
+        perfiles = _perfiles()
+        for perfil in options['perfiles']:
+            if perfil not in perfiles:
+                raise CommandError(f'Perfil desconocido: {perfil}. Opciones: {", ".join(perfiles)}')
+
+        self.stdout.write(f"{'perfil':<12} {'ops/s':>9} {'escr/s':>9} {'locked':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for perfil in options['perfiles']:
+            pragmas, timeout, begin = perfiles[perfil]
+            with tempfile.TemporaryDirectory() as directorio:
+                ruta = os.path.join(directorio, 'contencion.sqlite3')
+                self._crear_base(ruta, pragmas, options['productos'])
+                resultado = self._medir(ruta, pragmas, timeout, begin, options)
+            self.stdout.write(
+                f"{perfil:<12} {resultado['ops']:>9.0f} {resultado['escrituras']:>9.0f} {resultado['bloqueos']:>7} "
+                f"{resultado['p50']:>8.2f} {resultado['p95']:>8.2f} {resultado['p99']:>8.2f}"
+            )
+
+    def _conectar(self, ruta, pragmas, timeout):
+        # Modo autocommit, como las conexiones de Django
+        conexion = sqlite3.connect(ruta, timeout=timeout, isolation_level=None)
+        aplicar_pragmas(conexion, pragmas)
+        return conexion
+
+    def _crear_base(self, ruta, pragmas, productos):
+        conexion = self._conectar(ruta, pragmas, TIMEOUT_DESARROLLO)
+        conexion.executescript('''
+            CREATE TABLE producto (id INTEGER PRIMARY KEY, titulo TEXT, precio REAL, stock INTEGER, visitas INTEGER);
+            CREATE TABLE orden (id INTEGER PRIMARY KEY, producto_id INTEGER, cantidad INTEGER, fecha REAL);
+            CREATE INDEX orden_producto ON orden (producto_id);
+        ''')
+        conexion.execute('BEGIN')
+        conexion.executemany(
+            'INSERT INTO producto (id, titulo, precio, stock, visitas) VALUES (?, ?, ?, ?, 0)',
+            ((i, f'Producto {i}', 100.0 + i, 1000000) for i in range(1, productos + 1)),
+        )
+        conexion.execute('COMMIT')
+        conexion.close()
+
+    def _medir(self, ruta, pragmas, timeout, begin, options):
+        fin = time.perf_counter() + options['duracion']
+        latencias = []
+        totales = {'ops': 0, 'escrituras': 0, 'bloqueos': 0}
+        lock = threading.Lock()
+
+        def trabajador(semilla):
+            azar = random.Random(semilla)
+            conexion = self._conectar(ruta, pragmas, timeout)
+            propias = []
+            ops = escrituras = bloqueos = 0
+            while time.perf_counter() < fin:
+                producto = azar.randint(1, options['productos'])
+                tirada = azar.random()
+                inicio = time.perf_counter()
+                try:
+                    if tirada < options['escrituras'] * 2 / 3:
+                        # Visita (retrieve): UPDATE atómico en autocommit
+                        conexion.execute('UPDATE producto SET visitas = visitas + 1 WHERE id = ?', (producto,))
+                        escrituras += 1
+                    elif tirada < options['escrituras']:
+                        # Checkout: transacción que lee y luego escribe, como transaction.atomic()
+                        conexion.execute(begin)
+                        try:
+                            conexion.execute('SELECT stock FROM producto WHERE id = ?', (producto,)).fetchone()
+                            conexion.execute('INSERT INTO orden (producto_id, cantidad, fecha) VALUES (?, 1, ?)',
+                                             (producto, time.time()))
+                            conexion.execute('UPDATE producto SET stock = stock - 1 WHERE id = ?', (producto,))
+                            conexion.execute('COMMIT')
+                        except sqlite3.Error:
+                            conexion.execute('ROLLBACK')
+                            raise
+                        escrituras += 1
+                    else:
+                        conexion.execute('SELECT * FROM producto WHERE id = ?', (producto,)).fetchone()
+                    ops += 1
+                    propias.append(time.perf_counter() - inicio)
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e) and 'busy' not in str(e):
+                        raise
+                    bloqueos += 1
+            conexion.close()
+            with lock:
+                latencias.extend(propias)
+                totales['ops'] += ops
+                totales['escrituras'] += escrituras
+                totales['bloqueos'] += bloqueos
+
+        hilos = [threading.Thread(target=trabajador, args=(i,)) for i in range(options['hilos'])]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        latencias.sort()
+        percentil = lambda p: latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000 if latencias else 0
+        return {
+            'ops': totales['ops'] / options['duracion'],
+            'escrituras': totales['escrituras'] / options['duracion'],
+            'bloqueos': totales['bloqueos'],
+            'p50': statistics.median(latencias) * 1000 if latencias else 0,
+            'p95': percentil(0.95),
+            'p99': percentil(0.99),
+        }
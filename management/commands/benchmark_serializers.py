@@ -0,0 +1,461 @@
+"""
+Micro-benchmark de los serializers: tiempo y memoria (tracemalloc) de UserSerializer,
+ProductSerializer, ProductListSerializer, OrderSerializer y ShipmentSerializer con instancias
+en memoria (sin base de datos), comparados con representaciones alternativas escritas a mano
+"""
+import functools
+import gc
+import json
+import random
+import statistics
+import timeit
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.imagenes import url_variante, srcset
+from api.models import Carrier, Order, Product, ProductImage, Shipment, TrackingEvent, User
+from api.serializers import (
+    OrderSerializer, ProductListSerializer, ProductSerializer, ShipmentSerializer, UserSerializer,
+)
+
+
+CENTAVOS = Decimal('0.01')
+USUARIOS_DISTINTOS = 100
+IMAGENES_POR_PRODUCTO = 3
+EVENTOS_POR_ENVIO = 5
+
+
+# ==================== REPRESENTACIONES A MANO ====================
+# Candidatas a reemplazar a DRF en los listados: deben producir el mismo JSON
+
+def _fecha(valor):
+    if valor is None:
+        return None
+    valor = timezone.localtime(valor).isoformat()
+    return valor[:-6] + 'Z' if valor.endswith('+00:00') else valor
+
+
+def _decimal(valor):
+    return None if valor is None else f'{valor.quantize(CENTAVOS):f}'
+
+
+def _archivo(valor):
+    return valor.url if valor else None
+
+
+def usuario_manual(usuario):
+    return {
+        'id': usuario.id,
+        'email': usuario.email,
+        'nombre': usuario.nombre,
+        'username': usuario.username,
+        'telefono': usuario.telefono,
+        'calle': usuario.calle,
+        'ciudad': usuario.ciudad,
+        'provincia': usuario.provincia,
+        'codigo_postal': usuario.codigo_postal,
+        'fecha_creacion': _fecha(usuario.fecha_creacion),
+        'mercadopago_activa': usuario.mercadopago_activa,
+        'mercadopago_cuenta': usuario.mercadopago_cuenta,
+        'lemon_activa': usuario.lemon_activa,
+        'lemon_cuenta': usuario.lemon_cuenta,
+        'brubank_activa': usuario.brubank_activa,
+        'brubank_cuenta': usuario.brubank_cuenta,
+        'nombre_tienda': usuario.nombre_tienda,
+        'banner_imagen': _archivo(usuario.banner_imagen),
+        'banner_srcset': srcset(usuario.banner_variantes) or None,
+        'is_superuser': bool(usuario.is_superuser),
+        'is_staff': bool(usuario.is_staff),
+        'reputacion': usuario.calcular_reputacion(),
+        'total_calificaciones': usuario.total_calificaciones(),
+    }
+
+
+def _imagen_manual(imagen):
+    return {
+        'id': imagen.id,
+        'imagen': _archivo(imagen.imagen),
+        'srcset': srcset(imagen.variantes, 'webp') or None,
+        'srcset_jpeg': srcset(imagen.variantes, 'jpeg') or None,
+        'fecha_subida': _fecha(imagen.fecha_subida),
+    }
+
+
+def _imagen_lista_manual(imagen):
+    return {
+        'id': imagen.id,
+        'imagen': url_variante(imagen.variantes, 'tarjeta', 'jpeg') or _archivo(imagen.imagen),
+        'original': _archivo(imagen.imagen),
+        'srcset': srcset(imagen.variantes, 'webp') or None,
+        'srcset_jpeg': srcset(imagen.variantes, 'jpeg') or None,
+        'fecha_subida': _fecha(imagen.fecha_subida),
+    }
+
+
+def producto_manual(producto, usuario=usuario_manual):
+    return {
+        'id': producto.id,
+        'titulo': producto.titulo,
+        'descripcion': producto.descripcion,
+        'precio': _decimal(producto.precio),
+        'categoria': producto.categoria,
+        'condicion': producto.condicion,
+        'stock': producto.stock,
+        'envio_gratis': producto.envio_gratis,
+        'vendedor': usuario(producto.vendedor),
+        'estado': producto.estado,
+        'fecha_publicacion': _fecha(producto.fecha_publicacion),
+        'visitas': producto.visitas,
+        'imagenes': [_imagen_manual(imagen) for imagen in producto.imagenes.all()],
+        'peso_kg': _decimal(producto.peso_kg),
+        'alto_cm': _decimal(producto.alto_cm),
+        'ancho_cm': _decimal(producto.ancho_cm),
+        'largo_cm': _decimal(producto.largo_cm),
+    }
+
+
+def producto_lista_manual(producto):
+    return {
+        'id': producto.id,
+        'titulo': producto.titulo,
+        'precio': _decimal(producto.precio),
+        'categoria': producto.categoria,
+        'condicion': producto.condicion,
+        'envio_gratis': producto.envio_gratis,
+        'vendedor_nombre': producto.vendedor.nombre,
+        'estado': producto.estado,
+        'fecha_publicacion': _fecha(producto.fecha_publicacion),
+        'visitas': producto.visitas,
+        'imagenes': [_imagen_lista_manual(imagen) for imagen in producto.imagenes.all()],
+    }
+
+
+def orden_manual(orden, usuario=usuario_manual):
+    return {
+        'id': orden.id,
+        'comprador': usuario(orden.comprador),
+        'vendedor': usuario(orden.vendedor),
+        'producto': producto_manual(orden.producto, usuario),
+        'cantidad': orden.cantidad,
+        'precio_unitario': _decimal(orden.precio_unitario),
+        'precio_total': _decimal(orden.precio_total),
+        'metodo_pago': orden.metodo_pago,
+        'estado': orden.estado,
+        'direccion_entrega': orden.direccion_entrega,
+        'fecha_creacion': _fecha(orden.fecha_creacion),
+        'fecha_actualizacion': _fecha(orden.fecha_actualizacion),
+        'transaccion_id': orden.transaccion_id,
+    }
+
+
+def envio_manual(envio, usuario=usuario_manual):
+    carrier = envio.carrier
+    return {
+        'id': envio.id,
+        'order': orden_manual(envio.order, usuario),
+        'carrier': carrier and {'id': carrier.id, 'codigo': carrier.codigo, 'nombre': carrier.nombre, 'activo': carrier.activo},
+        'costo': _decimal(envio.costo),
+        'moneda': envio.moneda,
+        'estado': envio.estado,
+        'tracking_number': envio.tracking_number,
+        'tracking_url': envio.tracking_url,
+        'etiqueta_url': envio.etiqueta_url,
+        'dias_estimados': envio.dias_estimados,
+        'proveedor_envio_id': envio.proveedor_envio_id,
+        'metadata': envio.metadata,
+        'fecha_creacion': _fecha(envio.fecha_creacion),
+        'fecha_actualizacion': _fecha(envio.fecha_actualizacion),
+        'tracking': [
+            {'id': evento.id, 'estado': evento.estado, 'descripcion': evento.descripcion,
+             'fecha_evento': _fecha(evento.fecha_evento)}
+            for evento in envio.tracking.all()
+        ],
+    }
+
+
+def _con_memo(representar):
+    """Variante que representa cada usuario una sola vez por listado (se repiten entre filas)"""
+    def listado(objetos):
+        memo = {}
+
+        def usuario(instancia):
+            datos = memo.get(instancia.pk)
+            if datos is None:
+                datos = memo[instancia.pk] = usuario_manual(instancia)
+            return datos
+        return [representar(objeto, usuario) for objeto in objetos]
+    return listado
+
+
+# serializer -> (serializer de DRF, {variante: función del listado})
+SERIALIZERS = {
+    'usuario': (UserSerializer, {
+        'manual': lambda objetos: [usuario_manual(objeto) for objeto in objetos],
+    }),
+    'producto': (ProductSerializer, {
+        'manual': lambda objetos: [producto_manual(objeto) for objeto in objetos],
+        'manual_memo': _con_memo(producto_manual),
+    }),
+    'producto_lista': (ProductListSerializer, {
+        'manual': lambda objetos: [producto_lista_manual(objeto) for objeto in objetos],
+    }),
+    'orden': (OrderSerializer, {
+        'manual': lambda objetos: [orden_manual(objeto) for objeto in objetos],
+        'manual_memo': _con_memo(orden_manual),
+    }),
+    'envio': (ShipmentSerializer, {
+        'manual': lambda objetos: [envio_manual(objeto) for objeto in objetos],
+        'manual_memo': _con_memo(envio_manual),
+    }),
+}
+
+
+# ==================== INSTANCIAS EN MEMORIA ====================
+
+def _precargar(instancia, relacion, objetos):
+    """Deja `objetos` como resultado de instancia.<relacion>.all(), como un prefetch_related"""
+    queryset = getattr(instancia, relacion).all()
+    queryset._result_cache = list(objetos)
+    queryset._prefetch_done = True
+    instancia._prefetched_objects_cache = {**getattr(instancia, '_prefetched_objects_cache', {}), relacion: queryset}
+
+
+class Fabrica:
+    """Grafo de instancias sin guardar, con ids asignados y relaciones precargadas"""
+
+    def __init__(self, semilla):
+        self.azar = random.Random(semilla)
+        self.ids = {}
+        self.fecha = timezone.make_aware(datetime(2024, 3, 1, 12, 0))
+        self.usuarios = [self.usuario() for _ in range(USUARIOS_DISTINTOS)]
+        self.carrier = Carrier(id=1, codigo='andreani', nombre='Andreani', activo=True)
+
+    def _id(self, modelo):
+        self.ids[modelo] = self.ids.get(modelo, 0) + 1
+        return self.ids[modelo]
+
+    def _variantes(self, base, tamanos):
+        return {
+            tamano: {'ancho': ancho, 'alto': ancho * 3 // 4,
+                     'webp': f'variantes/{base}_{tamano}.webp', 'jpeg': f'variantes/{base}_{tamano}.jpeg'}
+            for tamano, ancho in tamanos.items()
+        }
+
+    def usuario(self):
+        numero = self._id(User)
+        usuario = User(
+            id=numero, email=f'usuario{numero}@mandale.local', username=f'usuario{numero}',
+            nombre=f'Usuario {numero}', telefono='1144445555', calle='Av. Siempre Viva 742',
+            ciudad='CABA', provincia='Buenos Aires', codigo_postal='1425',
+            mercadopago_activa=True, mercadopago_cuenta=f'usuario{numero}.mp',
+            nombre_tienda=f'Tienda {numero}' if numero % 3 == 0 else None,
+            banner_imagen=f'banners/banner{numero}.jpg' if numero % 2 == 0 else None,
+            banner_variantes=self._variantes(f'banners/banner{numero}', {'tarjeta': 640, 'detalle': 1600}) if numero % 2 == 0 else {},
+            fecha_creacion=self.fecha,
+        )
+        # El resumen de calificaciones ya calculado, como con User.precargar_calificaciones
+        total = self.azar.randint(0, 50)
+        usuario._calificaciones = {'promedio': self.azar.uniform(3, 5) if total else None, 'total': total}
+        return usuario
+
+    def producto(self):
+        numero = self._id(Product)
+        producto = Product(
+            id=numero, titulo=f'Producto {numero}', descripcion='Descripción del producto ' * 10,
+            precio=Decimal(self.azar.randint(1000, 500000)) / 100, categoria='Electrónica',
+            stock=self.azar.randint(1, 20), envio_gratis=numero % 2 == 0,
+            vendedor=self.azar.choice(self.usuarios), fecha_publicacion=self.fecha,
+            visitas=self.azar.randint(0, 5000), peso_kg=Decimal('1.50'), alto_cm=Decimal('10'),
+            ancho_cm=Decimal('20'), largo_cm=None,
+        )
+        imagenes = []
+        for _ in range(IMAGENES_POR_PRODUCTO):
+            imagen = self._id(ProductImage)
+            imagenes.append(ProductImage(
+                id=imagen, product=producto, imagen=f'productos/imagen{imagen}.jpg',
+                variantes=self._variantes(f'productos/imagen{imagen}', {'miniatura': 160, 'tarjeta': 480, 'detalle': 1200}),
+                fecha_subida=self.fecha,
+            ))
+        _precargar(producto, 'imagenes', imagenes)
+        return producto
+
+    def orden(self):
+        producto = self.producto()
+        orden = Order(
+            id=self._id(Order), comprador=self.azar.choice(self.usuarios), vendedor=producto.vendedor,
+            producto=producto, cantidad=1, precio_unitario=producto.precio, precio_total=producto.precio,
+            metodo_pago='mercadopago', estado='Confirmada', direccion_entrega='Av. Siempre Viva 742',
+            fecha_creacion=self.fecha, fecha_actualizacion=self.fecha,
+        )
+        return orden
+
+    def envio(self):
+        envio = Shipment(
+            id=self._id(Shipment), order=self.orden(), carrier=self.carrier, costo=Decimal('3500.00'),
+            estado='En camino', tracking_number=f'TRK{self._id("tracking"):08d}', tracking_url='https://seguimiento.local/',
+            dias_estimados=3, proveedor_envio_id='andreani', metadata={'servicio': 'estandar', 'sucursal': None},
+            fecha_creacion=self.fecha, fecha_actualizacion=self.fecha,
+        )
+        _precargar(envio, 'tracking', [
+            TrackingEvent(id=self._id(TrackingEvent), shipment=envio, estado='En camino',
+                          descripcion='En tránsito', fecha_evento=self.fecha + timedelta(hours=i))
+            for i in range(EVENTOS_POR_ENVIO)
+        ])
+        return envio
+
+    def objetos(self, serializer, cantidad):
+        if serializer == 'usuario':
+            return [self.usuario() for _ in range(cantidad)]
+        if serializer in ('producto', 'producto_lista'):
+            return [self.producto() for _ in range(cantidad)]
+        return [getattr(self, serializer)() for _ in range(cantidad)]
+
+
+# ==================== MEDICIÓN ====================
+
+class _SinConsultas:
+    """execute_wrapper que falla si un serializer consulta la base"""
+
+    def __call__(self, execute, sql, params, many, context):
+        raise CommandError(f'El serializer consultó la base de datos: {sql[:200]}')
+
+
+def _memoria(funcion, top):
+    """(pico, retenido) en bytes de una llamada y los `top` sitios que más memoria reservaron"""
+    gc.collect()
+    tracemalloc.start(10 if top else 1)
+    try:
+        antes = tracemalloc.take_snapshot() if top else None
+        inicial, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        resultado = funcion()
+        actual, pico = tracemalloc.get_traced_memory()
+        sitios = tracemalloc.take_snapshot().compare_to(antes, 'lineno')[:top] if top else []
+    finally:
+        tracemalloc.stop()
+    del resultado
+    return pico - inicial, actual - inicial, sitios
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark de serializers con instancias en memoria: tiempo, memoria y alternativas escritas a mano'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--serializers', nargs='+', choices=list(SERIALIZERS), default=list(SERIALIZERS))
+        parser.add_argument('--tamanos', nargs='+', type=int, default=[1, 100, 10000], help='Objetos por listado')
+        parser.add_argument('--repeticiones', type=int, default=3,
+                            help='Repeticiones de cada medición (se informa la mejor y la mediana)')
+        parser.add_argument('--top', type=int, default=0,
+                            help='Sitios que más memoria reservan en cada medición con DRF')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--salida', default='', help='Archivo JSON donde guardar los resultados')
+        parser.add_argument('--comparar', default='', help='Resultados JSON de una corrida anterior')
+        parser.add_argument('--umbral', type=float, default=0.10,
+                            help='Regresión tolerada en tiempo por objeto (fracción) al comparar')
+
+    def handle(self, *args, **options):
+        resultados = {}
+        with ExitStack() as envolturas:
+            for alias in connections:
+                envolturas.enter_context(connections[alias].execute_wrapper(_SinConsultas()))
+            for nombre in options['serializers']:
+                self._verificar_equivalencia(nombre, options['semilla'])
+                resultados[nombre] = self._medir(nombre, options)
+
+        self.stdout.write(
+            f"\n{'serializer':<15} {'variante':<12} {'objetos':>8} {'mejor ms':>10} {'mediana ms':>11} "
+            f"{'µs/objeto':>10} {'vs drf':>7} {'pico KB':>10} {'retenido KB':>12}"
+        )
+        for nombre, mediciones in resultados.items():
+            for medicion in mediciones:
+                self.stdout.write(
+                    f"{nombre:<15} {medicion['variante']:<12} {medicion['objetos']:>8} {medicion['mejor_ms']:>10.3f} "
+                    f"{medicion['mediana_ms']:>11.3f} {medicion['us_por_objeto']:>10.2f} {medicion['vs_drf']:>6.2f}x "
+                    f"{medicion['pico_kb']:>10.1f} {medicion['retenido_kb']:>12.1f}"
+                )
+
+        corrida = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'semilla': options['semilla'],
+            'serializers': resultados,
+        }
+        if options['salida']:
+            with open(options['salida'], 'w') as archivo:
+                json.dump(corrida, archivo, indent=2)
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+        if options['comparar']:
+            self._comparar(corrida, options['comparar'], options['umbral'])
+
+    def _verificar_equivalencia(self, nombre, semilla):
+        """Las variantes a mano tienen que producir el mismo JSON que el serializer de DRF"""
+        serializer, variantes = SERIALIZERS[nombre]
+        objetos = Fabrica(semilla).objetos(nombre, 20)
+        esperado = json.loads(JSONRenderer().render(serializer(objetos, many=True).data))
+        for variante, funcion in variantes.items():
+            if json.loads(JSONRenderer().render(funcion(objetos))) != esperado:
+                raise CommandError(f'La variante {variante} de {nombre} no produce el mismo JSON que {serializer.__name__}')
+
+    def _medir(self, nombre, options):
+        serializer, variantes = SERIALIZERS[nombre]
+        funciones = {'drf': lambda objetos: serializer(objetos, many=True).data, **variantes}
+        mediciones = []
+        for cantidad in sorted(options['tamanos']):
+            objetos = Fabrica(options['semilla']).objetos(nombre, cantidad)
+            base = None
+            for variante, funcion in funciones.items():
+                llamada = functools.partial(funcion, objetos)
+                # Con el GC activo: las asignaciones de los serializers también le cuestan al GC
+                temporizador = timeit.Timer(llamada, setup='import gc; gc.enable()')
+                numero, _ = temporizador.autorange()
+                tiempos = [tiempo / numero for tiempo in temporizador.repeat(repeat=options['repeticiones'], number=numero)]
+                mejor = min(tiempos)
+                base = base or mejor
+                pico, retenido, sitios = _memoria(llamada, options['top'] if variante == 'drf' else 0)
+
+                mediciones.append({
+                    'variante': variante,
+                    'objetos': cantidad,
+                    'mejor_ms': mejor * 1000,
+                    'mediana_ms': statistics.median(tiempos) * 1000,
+                    'us_por_objeto': mejor * 1e6 / cantidad,
+                    'vs_drf': base / mejor,
+                    'pico_kb': pico / 1024,
+                    'retenido_kb': retenido / 1024,
+                })
+                if sitios:
+                    self.stdout.write(f'\n{nombre} ({cantidad} objetos, drf): sitios con más memoria reservada')
+                    for sitio in sitios:
+                        self.stdout.write(f'  {sitio}')
+        return mediciones
+
+    def _comparar(self, corrida, archivo, umbral):
+        with open(archivo) as entrada:
+            anterior = json.load(entrada)['serializers']
+
+        regresiones = []
+        self.stdout.write(f"\n{'serializer':<15} {'variante':<12} {'objetos':>8} {'Δ µs/objeto':>12} {'Δ pico':>8}")
+        for nombre, mediciones in corrida['serializers'].items():
+            previas = {(m['variante'], m['objetos']): m for m in anterior.get(nombre, [])}
+            for medicion in mediciones:
+                base = previas.get((medicion['variante'], medicion['objetos']))
+                if not base or not base['us_por_objeto'] or not base['pico_kb']:
+                    continue
+                delta_tiempo = medicion['us_por_objeto'] / base['us_por_objeto'] - 1
+                delta_pico = medicion['pico_kb'] / base['pico_kb'] - 1
+                self.stdout.write(
+                    f"{nombre:<15} {medicion['variante']:<12} {medicion['objetos']:>8} {delta_tiempo:>+12.1%} {delta_pico:>+8.1%}"
+                )
+                if delta_tiempo > umbral:
+                    regresiones.append(f"{nombre}/{medicion['variante']}/{medicion['objetos']}")
+
+        if regresiones:
+            raise CommandError(f'Regresión mayor a {umbral:.0%} en: {", ".join(regresiones)}')
+        self.stdout.write(self.style.SUCCESS(f'Sin regresiones mayores a {umbral:.0%}'))
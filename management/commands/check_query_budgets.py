@@ -0,0 +1,249 @@
+"""
+Presupuestos de consultas de la API: recorre todas las rutas GET del URLconf contra una base
+de prueba con 10 y 100 filas relacionadas y falla si la cantidad de consultas de una vista
+crece con los datos (N+1) o supera el presupuesto declarado junto a la vista (presupuestos.py)
+"""
+import re
+from contextlib import ExitStack
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from django.urls import get_resolver
+
+from api.autenticacion import TokenMandale, usuarios_cache
+from api.exportaciones import EXPORTACIONES
+from api.models import Message, Offer, Order, Product, ProductImage, Question, Rating, User
+from api.presupuestos import presupuesto_vista
+from api.rollups import productos_creados
+
+
+CATEGORIA = 'Presupuestos'
+EXCLUIR_DEFAULT = ['admin/']
+FALLAS = {'ERROR', 'CRECE', 'EXCEDE', 'SIN PRESUPUESTO'}
+
+# Caché en memoria del proceso: cada medición empieza con la caché vacía sin tocar la real
+CACHE_MEDICION = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'presupuestos'}}
+
+
+def plantillas_medicion():
+    """TEMPLATES con PlantillasFaltantes al final: una plantilla que no está no da un 500"""
+    return [*settings.TEMPLATES, {'BACKEND': 'api.presupuestos.PlantillasFaltantes', 'NAME': 'presupuestos'}]
+
+
+def _rutas():
+    """(ruta con %(parámetro)s, parámetros, vista) de cada vista del URLconf sin namespace"""
+    reverse_dict = get_resolver().reverse_dict
+    for vista in list(reverse_dict.keys()):
+        if not callable(vista):
+            continue
+        for posibilidades, _, _, _ in reverse_dict.getlist(vista):
+            ruta, parametros = posibilidades[0]
+            # Las variantes con sufijo de formato (.json) de DRF son la misma vista
+            if 'format' not in parametros:
+                yield '/' + ruta, parametros, vista
+                break
+
+
+def _ruta_legible(ruta):
+    """/api/productos/%(pk)s/ -> /api/productos/<pk>/"""
+    return re.sub(r'%\((\w+)\)s', r'<\1>', ruta)
+
+
+def _nombre_vista(vista):
+    clase = getattr(vista, 'cls', None) or getattr(vista, 'view_class', None)
+    acciones = getattr(vista, 'actions', None) or {}
+    if clase is None:
+        return f'{vista.__module__}.{vista.__name__}'
+    if 'get' in acciones:
+        return f"{clase.__name__}.{acciones['get']}"
+    return clase.__name__
+
+
+class Command(BaseCommand):
+    help = 'Verifica los presupuestos de consultas de todas las rutas GET con datos de distinto tamaño (en una base de prueba)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', nargs='+', type=int, default=[10, 100],
+                            help='Filas relacionadas por usuario y producto (acumulativas)')
+        parser.add_argument('--excluir', nargs='*', default=EXCLUIR_DEFAULT,
+                            help='Prefijos de rutas a omitir')
+        parser.add_argument('--exigir', action='store_true',
+                            help='Falla también si una vista no declara presupuesto')
+
+    def handle(self, *args, **options):
+        tamanos = sorted(set(options['tamanos']))
+        if len(tamanos) < 2:
+            raise CommandError('Se necesitan al menos dos tamaños para detectar consultas que crecen')
+
+        setup_test_environment()
+        bases = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(CACHES=CACHE_MEDICION, TEMPLATES=plantillas_medicion(),
+                                   SLOW_QUERY_ENABLED=False, PROFILING_ENABLED=False):
+                mediciones, omitidas = self._medir(tamanos, options['excluir'])
+        finally:
+            teardown_databases(bases, verbosity=0)
+            teardown_test_environment()
+
+        fallas = self._reportar(mediciones, omitidas, tamanos, options['exigir'])
+        if fallas:
+            raise CommandError(f"{len(fallas)} vista(s) fuera de presupuesto: {', '.join(fallas)}")
+        self.stdout.write(self.style.SUCCESS('Todas las vistas dentro de su presupuesto'))
+
+    def _medir(self, tamanos, excluir):
+        actor = User.objects.create_user(
+            email='actor@presupuestos.local', username='presupuestos-actor', nombre='Actor',
+            password='presupuestos', is_staff=True, is_superuser=True, mercadopago_activa=True,
+        )
+        otro = User.objects.create_user(
+            email='otro@presupuestos.local', username='presupuestos-otro', nombre='Otro',
+            password='presupuestos',
+        )
+        client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f'Bearer {TokenMandale.for_user(actor).access_token}')
+        client.force_login(actor)
+
+        rutas = [
+            (ruta, parametros, vista) for ruta, parametros, vista in _rutas()
+            if not any(ruta.lstrip('/').startswith(prefijo) for prefijo in excluir)
+        ]
+        mediciones = {}
+        omitidas = {}
+        existentes = 0
+        valores = {}
+        for tamano in tamanos:
+            valores = self._crear_datos(actor, otro, tamano - existentes, valores)
+            existentes = tamano
+
+            for ruta, parametros, vista in rutas:
+                faltantes = [parametro for parametro in parametros if parametro not in valores]
+                if faltantes:
+                    omitidas[ruta] = f"sin valor para {', '.join(faltantes)}"
+                    continue
+                url = ruta % {parametro: valores[parametro] for parametro in parametros}
+                estado, consultas = self._contar(client, url)
+                if estado == 405:
+                    omitidas[ruta] = 'sin GET'
+                    continue
+                medicion = mediciones.setdefault(ruta, {
+                    'nombre': _ruta_legible(ruta), 'vista': vista, 'estados': set(), 'consultas': {},
+                })
+                medicion['estados'].add(estado)
+                medicion['consultas'][tamano] = consultas
+        return mediciones, omitidas
+
+    def _contar(self, client, url):
+        """Estado y cantidad de consultas (en todas las bases) de un GET con la caché vacía"""
+        from django.core.cache import cache
+
+        cache.clear()
+        usuarios_cache.limpiar()
+        with ExitStack() as contextos:
+            capturas = [contextos.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            response = client.get(url, secure=True)
+            # Las exportaciones consultan mientras se genera el contenido
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response.status_code, sum(len(captura.captured_queries) for captura in capturas)
+
+    def _crear_datos(self, actor, otro, cantidad, valores):
+        """
+        Agrega `cantidad` productos propios (con imagen), compras, ventas, calificaciones y
+        mensajes del actor, y preguntas y ofertas en su primer producto
+        """
+        propios = Product.objects.bulk_create([
+            Product(titulo=f'Producto {i}', descripcion='', precio=Decimal('1000'), categoria=CATEGORIA,
+                    stock=10, vendedor=actor)
+            for i in range(cantidad)
+        ])
+        ajenos = Product.objects.bulk_create([
+            Product(titulo=f'Comprado {i}', descripcion='', precio=Decimal('500'), categoria=CATEGORIA,
+                    estado='Vendido', stock=0, vendedor=otro)
+            for i in range(cantidad)
+        ])
+        productos_creados(propios + ajenos)
+        ProductImage.objects.bulk_create([ProductImage(product=producto, imagen='productos/presupuesto.jpg') for producto in propios])
+
+        compras = Order.objects.bulk_create([
+            Order(comprador=actor, vendedor=otro, producto=producto, precio_unitario=producto.precio,
+                  precio_total=producto.precio, metodo_pago='mercadopago', estado='Entregada')
+            for producto in ajenos
+        ])
+        ventas = Order.objects.bulk_create([
+            Order(comprador=otro, vendedor=actor, producto=producto, precio_unitario=producto.precio,
+                  precio_total=producto.precio, metodo_pago='mercadopago', estado='Entregada')
+            for producto in propios
+        ])
+        Rating.objects.bulk_create([
+            Rating(calificador=otro, calificado=actor, orden=orden, estrellas=5) for orden in ventas
+        ])
+        mensajes = Message.objects.bulk_create([
+            Message(remitente=otro, destinatario=actor, orden=orden, mensaje='Consulta') for orden in ventas
+        ])
+
+        principal = valores.get('producto_id') or propios[0].pk
+        preguntas = Question.objects.bulk_create([
+            Question(producto_id=principal, usuario=otro, pregunta='¿Tiene stock?') for _ in range(cantidad)
+        ])
+        ofertas = Offer.objects.bulk_create([
+            Offer(producto_id=principal, comprador=otro, precio_ofertado=Decimal('900')) for _ in range(cantidad)
+        ])
+
+        if valores:
+            return valores
+        # Los detalles usan siempre los mismos objetos: lo que crece son sus filas relacionadas
+        return {
+            'pk': principal,
+            'producto_id': principal,
+            'user_id': actor.pk,
+            'orden_id': (compras or ventas)[0].pk,
+            'pregunta_id': preguntas[0].pk,
+            'oferta_id': ofertas[0].pk,
+            'mensaje_id': mensajes[0].pk,
+            'tipo': next(iter(EXPORTACIONES)),
+        }
+
+    def _reportar(self, mediciones, omitidas, tamanos, exigir):
+        """Imprime la tabla de resultados; devuelve {ruta: resultado} de las rutas que fallan"""
+        columnas = [f'@{tamano}' for tamano in tamanos]
+        filas = []
+        fallas = {}
+        for medicion in sorted(mediciones.values(), key=lambda medicion: medicion['nombre']):
+            consultas = [medicion['consultas'].get(tamano) for tamano in tamanos]
+            presupuesto = presupuesto_vista(medicion['vista'])
+            estado = max(medicion['estados'])
+
+            if estado >= 500:
+                resultado = 'ERROR'
+            elif len(set(consultas)) > 1:
+                resultado = 'CRECE'
+            elif presupuesto is not None and max(consultas) > presupuesto:
+                resultado = 'EXCEDE'
+            elif presupuesto is None:
+                resultado = 'SIN PRESUPUESTO' if exigir else 'sin presupuesto'
+            else:
+                resultado = 'ok'
+            if resultado in FALLAS:
+                fallas[medicion['nombre']] = resultado
+            filas.append([medicion['nombre'], _nombre_vista(medicion['vista']), str(estado), *map(str, consultas),
+                          '-' if presupuesto is None else str(presupuesto), resultado])
+
+        encabezado = ['ruta', 'vista', 'estado', *columnas, 'presupuesto', 'resultado']
+        anchos = [max(len(fila[i]) for fila in filas + [encabezado]) for i in range(len(encabezado))]
+        self.stdout.write('  '.join(titulo.ljust(ancho) for titulo, ancho in zip(encabezado, anchos)))
+        for fila in filas:
+            linea = '  '.join(valor.ljust(ancho) for valor, ancho in zip(fila, anchos))
+            self.stdout.write(self.style.ERROR(linea) if fila[-1] in FALLAS else linea)
+
+        if omitidas:
+            self.stdout.write('')
+            self.stdout.write('Rutas omitidas:')
+            for ruta in sorted(omitidas):
+                self.stdout.write(f'  {_ruta_legible(ruta)}  ({omitidas[ruta]})')
+        return fallas
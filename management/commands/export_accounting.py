@@ -0,0 +1,83 @@
+"""
+Exportación contable en streaming (órdenes, envíos o eventos de tracking) a archivo o stdout
+"""
+import gzip
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exportaciones import (
+    EXPORTACIONES, FORMATOS, TAMANO_CHUNK, codificar_cursor, decodificar_cursor,
+    filas_exportacion, lineas_exportacion,
+)
+
+
+class Command(BaseCommand):
+    help = 'Exporta órdenes, envíos o eventos de tracking en NDJSON/CSV (opcionalmente gzip) sin cargarlos en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(EXPORTACIONES))
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help='Comprime la salida con gzip')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial (AAAA-MM-DD, incluida)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final (AAAA-MM-DD, incluida)')
+        parser.add_argument('--cursor', help='Retoma una exportación interrumpida desde este cursor')
+        parser.add_argument('--salida', help='Archivo de salida (por defecto stdout)')
+        parser.add_argument('--chunk-size', type=int, default=TAMANO_CHUNK)
+
+    def handle(self, *args, **options):
+        tipo = options['tipo']
+        cursor = None
+        if options['cursor']:
+            cursor = decodificar_cursor(options['cursor'])
+            if cursor is None:
+                raise CommandError('Cursor inválido')
+
+        campos = EXPORTACIONES[tipo]['campos']
+        indice_fecha = campos.index(EXPORTACIONES[tipo]['campo_fecha'])
+        # leida: última fila tomada de la consulta; escrita: última fila ya volcada a la salida
+        leida = {'fila': None}
+        ultima = {'fila': None, 'total': 0}
+
+        def registrar(filas):
+            for fila in filas:
+                leida['fila'] = fila
+                yield fila
+
+        filas = registrar(filas_exportacion(
+            tipo, options['desde'], options['hasta'], cursor=cursor, chunk_size=options['chunk_size'],
+        ))
+        # Al retomar no se repite el encabezado y se agrega al archivo existente
+        # (gzip admite miembros concatenados)
+        lineas = lineas_exportacion(options['formato'], campos, filas, encabezado=cursor is None)
+        modo = 'ab' if cursor else 'wb'
+        destino = open(options['salida'], modo) if options['salida'] else sys.stdout.buffer
+        salida = gzip.GzipFile(fileobj=destino, mode=modo) if options['gzip'] else destino
+        try:
+            for linea in lineas:
+                salida.write(linea.encode('utf-8'))
+                # El encabezado se genera antes de leer filas: solo cuentan las líneas de datos
+                if leida['fila'] is not ultima['fila']:
+                    ultima['fila'] = leida['fila']
+                    ultima['total'] += 1
+        except BaseException as error:
+            fila = ultima['fila']
+            if fila is not None:
+                self.stderr.write(
+                    f"Exportación interrumpida tras {ultima['total']} filas. "
+                    f"Retomar con --cursor {codificar_cursor(fila[indice_fecha], fila[0])}"
+                )
+            if isinstance(error, KeyboardInterrupt):
+                raise CommandError('Exportación interrumpida')
+            raise
+        finally:
+            # Cerrar el GzipFile vuelca todas las filas ya escritas, también al interrumpir
+            if options['gzip']:
+                salida.close()
+            if options['salida']:
+                destino.close()
+            else:
+                destino.flush()
+
+        self.stderr.write(self.style.SUCCESS(f"{ultima['total']} filas exportadas ({tipo})"))
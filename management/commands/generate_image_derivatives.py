@@ -0,0 +1,34 @@
+"""
+Genera las variantes redimensionadas de imágenes de productos y banners ya existentes
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.imagenes import generar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Genera (o regenera con --forzar) las variantes WebP/JPEG de imágenes de productos y banners'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', choices=['producto', 'banner'], action='append',
+                            help='Por defecto se procesan ambos tipos')
+        parser.add_argument('--workers', type=int, help='Procesos del pool (0 = en línea)')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--forzar', action='store_true', help='Regenera también las imágenes con variantes')
+
+    def handle(self, *args, **options):
+        for tipo in options['tipo'] or ['producto', 'banner']:
+            inicio = time.perf_counter()
+            procesadas, errores = generar_pendientes(
+                tipo, workers=options['workers'], tamano_lote=options['batch_size'], forzar=options['forzar'],
+            )
+            duracion = time.perf_counter() - inicio
+            for pk, nombre, error in errores[:20]:
+                self.stderr.write(f'{tipo} {pk} ({nombre}): {error}')
+            if len(errores) > 20:
+                self.stderr.write(f'... y {len(errores) - 20} errores más')
+            self.stdout.write(self.style.SUCCESS(
+                f'{tipo}: {procesadas} imágenes procesadas en {duracion:.1f}s, {len(errores)} con errores'
+            ))
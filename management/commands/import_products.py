@@ -0,0 +1,70 @@
+"""
+Importación masiva de productos para un vendedor desde CSV o NDJSON
+"""
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importacion import FuenteImagenes, TAMANO_LOTE, importar_productos, leer_filas, verificar_archivo
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = 'Importa productos desde un archivo CSV o NDJSON usando inserciones por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Archivo CSV o NDJSON con los productos')
+        parser.add_argument('--vendedor', required=True, help='Email del vendedor')
+        parser.add_argument('--formato', choices=['csv', 'ndjson'],
+                            help='Por defecto se deduce de la extensión del archivo')
+        parser.add_argument('--imagenes-dir', help='Directorio base de las rutas de imágenes')
+        parser.add_argument('--imagenes-zip', help='Archivo .zip con las imágenes')
+        parser.add_argument('--batch-size', type=int, default=TAMANO_LOTE)
+        parser.add_argument('--workers', type=int, default=4, help='Hilos para copiar imágenes')
+        parser.add_argument('--errores', help='Guarda los errores por fila en este archivo NDJSON')
+
+    def handle(self, *args, **options):
+        try:
+            vendedor = User.objects.get(email=options['vendedor'])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe un usuario con el email {options['vendedor']}")
+
+        formato = options['formato'] or ('csv' if options['archivo'].lower().endswith('.csv') else 'ndjson')
+        fuente = None
+        if options['imagenes_dir'] or options['imagenes_zip']:
+            fuente = FuenteImagenes(options['imagenes_dir'], options['imagenes_zip'])
+
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as binario:
+                # Se valida el archivo completo antes de insertar el primer lote
+                try:
+                    verificar_archivo(binario, formato)
+                except ValueError as e:
+                    raise CommandError(str(e))
+                archivo = io.TextIOWrapper(binario, encoding='utf-8-sig', newline='')
+                resultado = importar_productos(
+                    leer_filas(archivo, formato), vendedor, fuente_imagenes=fuente,
+                    tamano_lote=options['batch_size'], workers=options['workers'],
+                )
+        finally:
+            if fuente:
+                fuente.cerrar()
+        duracion = time.perf_counter() - inicio
+
+        errores = resultado['errores']
+        if options['errores']:
+            with open(options['errores'], 'w', encoding='utf-8') as salida:
+                for error in errores:
+                    salida.write(json.dumps(error, ensure_ascii=False) + '\n')
+        else:
+            for error in errores[:20]:
+                self.stderr.write(f"Fila {error['fila']}: {error['errores']}")
+            if len(errores) > 20:
+                self.stderr.write(f'... y {len(errores) - 20} errores más (usa --errores para guardarlos)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['creados']} productos importados en {duracion:.1f}s, {len(errores)} filas con errores"
+        ))
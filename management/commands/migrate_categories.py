@@ -0,0 +1,47 @@
+"""
+Completa la referencia a Categoria de los productos existentes (segundo paso de la migración
+de categorías, ver categorias.py), en lotes cortos y con la aplicación andando
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.categorias import completar_referencias, recalcular_contadores
+from api.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Completa Product.categoria_ref en lotes a partir del nombre de la categoría'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Productos por transacción')
+        parser.add_argument('--pausa', type=float, default=0.05,
+                            help='Segundos de espera entre lotes, para no competir con el tráfico')
+        parser.add_argument('--recontar', action='store_true',
+                            help='Recalcula al final los contadores de productos activos desde los resúmenes')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        desde = 0
+        total = 0
+        lotes = 0
+        while True:
+            desde, actualizados = completar_referencias(desde, options['lote'])
+            if desde is None:
+                break
+            total += actualizados
+            lotes += 1
+            if lotes % 100 == 0:
+                self.stdout.write(f'{total} productos actualizados (hasta el id {desde})')
+            time.sleep(options['pausa'])
+
+        if options['recontar']:
+            recalcular_contadores()
+            self.stdout.write('Contadores de productos activos recalculados')
+
+        pendientes = Product.objects.filter(categoria_ref__isnull=True).count()
+        mensaje = f'{total} productos actualizados en {time.perf_counter() - inicio:.1f}s'
+        if pendientes:
+            self.stdout.write(self.style.WARNING(f'{mensaje}; {pendientes} siguen sin categoría (volver a correr)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(mensaje))
@@ -0,0 +1,15 @@
+"""
+Elimina las claves de idempotencia expiradas
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Elimina las claves de idempotencia cuyo TTL ya venció'
+
+    def handle(self, *args, **options):
+        eliminadas, _ = IdempotencyKey.objects.filter(fecha_expiracion__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'{eliminadas} claves de idempotencia eliminadas'))
@@ -0,0 +1,29 @@
+"""
+Elimina las imágenes de productos deduplicadas que ya no usa ningún ProductImage
+"""
+from django.core.management.base import BaseCommand
+
+from api.almacenamiento import eliminar_huerfanos, recontar_referencias
+from api.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = 'Elimina los archivos de imágenes sin referencias (y sus variantes) pasado el período de gracia'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recontar', action='store_true',
+                            help='Recalcula antes los contadores de referencias desde ProductImage')
+        parser.add_argument('--limite', type=int, help='Máximo de archivos a eliminar en esta pasada')
+        parser.add_argument('--simular', action='store_true', help='Solo informa lo que se eliminaría')
+
+    def handle(self, *args, **options):
+        if options['recontar']:
+            recontados = recontar_referencias()
+            self.stdout.write(f'{recontados} contadores de referencias recalculados')
+
+        storage = ProductImage._meta.get_field('imagen').storage
+        eliminados, liberados = eliminar_huerfanos(storage, limite=options['limite'], simular=options['simular'])
+        accion = 'se eliminarían' if options['simular'] else 'eliminados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{eliminados} archivos huérfanos {accion} ({liberados / 1024 / 1024:.1f} MB)'
+        ))
@@ -0,0 +1,131 @@
+"""
+Desglose del tiempo de importación del arranque de un worker: corre django.setup() y
+arranque.precargar() en un proceso nuevo con python -X importtime y reporta los módulos más
+lentos (acumulado y propio) y el total por paquete
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+CODIGO_ARRANQUE = (
+    'import django; django.setup(); '
+    'from api import arranque; arranque.precargar()'
+)
+# import time:       self [us] |  cumulative | imported package
+LINEA_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def _medir_arranque():
+    """{módulo: (propio_us, acumulado_us, profundidad)} de un arranque en un proceso nuevo"""
+    entorno = {**os.environ, 'PYTHONPATH': os.pathsep.join(ruta for ruta in sys.path if ruta)}
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CODIGO_ARRANQUE],
+        capture_output=True, text=True, env=entorno,
+    )
+    if proceso.returncode != 0:
+        raise CommandError(f'El arranque falló:\n{proceso.stderr[-2000:]}')
+
+    modulos = {}
+    for linea in proceso.stderr.splitlines():
+        coincidencia = LINEA_IMPORTTIME.match(linea)
+        if coincidencia:
+            propio, acumulado, sangria, modulo = coincidencia.groups()
+            modulos[modulo] = (int(propio), int(acumulado), len(sangria) // 2)
+    if not modulos:
+        raise CommandError('python -X importtime no reportó módulos')
+    return modulos
+
+
+class Command(BaseCommand):
+    help = 'Reporta el desglose del tiempo de importación del arranque de un worker (python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help='Módulos a listar')
+        parser.add_argument('--repeticiones', type=int, default=3,
+                            help='Arranques a medir; se toma el mínimo de cada módulo')
+        parser.add_argument('--salida', default='', help='Archivo JSON donde guardar los resultados')
+        parser.add_argument('--comparar', default='', help='Resultados JSON de una corrida anterior')
+        parser.add_argument('--umbral', type=float, default=0.10,
+                            help='Aumento relativo del total que se considera regresión (0.10 = 10%%)')
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1')
+
+        # El primer arranque puede incluir la compilación de los .pyc: el mínimo lo descarta
+        corridas = [_medir_arranque() for _ in range(options['repeticiones'])]
+        modulos = {}
+        for modulo in set().union(*corridas):
+            mediciones = [corrida[modulo] for corrida in corridas if modulo in corrida]
+            modulos[modulo] = (
+                min(propio for propio, _, _ in mediciones),
+                min(acumulado for _, acumulado, _ in mediciones),
+                mediciones[0][2],
+            )
+
+        total_us = sum(propio for propio, _, _ in modulos.values())
+        paquetes = {}
+        for modulo, (propio, _, _) in modulos.items():
+            paquete = modulo.split('.')[0]
+            cantidad, tiempo = paquetes.get(paquete, (0, 0))
+            paquetes[paquete] = (cantidad + 1, tiempo + propio)
+
+        top = options['top']
+        self.stdout.write(f'Importación total: {total_us / 1000:.1f} ms en {len(modulos)} módulos\n')
+        self._tabla('Por tiempo acumulado (incluye lo que importa cada módulo)', modulos, top, indice=1)
+        self._tabla('Por tiempo propio', modulos, top, indice=0)
+
+        self.stdout.write(f"\n{'paquete':<40} {'módulos':>8} {'propio ms':>10} {'%':>6}")
+        for paquete, (cantidad, tiempo) in sorted(paquetes.items(), key=lambda item: item[1][1], reverse=True)[:top]:
+            self.stdout.write(f'{paquete:<40} {cantidad:>8} {tiempo / 1000:>10.1f} {tiempo / total_us:>6.1%}')
+
+        corrida = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'total_ms': round(total_us / 1000, 1),
+            'paquetes': {paquete: round(tiempo / 1000, 1) for paquete, (_, tiempo) in paquetes.items()},
+            'modulos': {modulo: round(acumulado / 1000, 1) for modulo, (_, acumulado, profundidad) in modulos.items()
+                        if profundidad == 1},
+        }
+        if options['salida']:
+            with open(options['salida'], 'w') as archivo:
+                json.dump(corrida, archivo, indent=2)
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+        if options['comparar']:
+            self._comparar(corrida, options['comparar'], options['umbral'])
+
+    def _tabla(self, titulo, modulos, top, indice):
+        self.stdout.write(f"\n{titulo}\n{'módulo':<60} {'propio ms':>10} {'acumulado ms':>13}")
+        for modulo, tiempos in sorted(modulos.items(), key=lambda item: item[1][indice], reverse=True)[:top]:
+            self.stdout.write(f'{modulo:<60} {tiempos[0] / 1000:>10.1f} {tiempos[1] / 1000:>13.1f}')
+
+    def _comparar(self, corrida, archivo, umbral):
+        with open(archivo) as entrada:
+            anterior = json.load(entrada)
+        if anterior.get('python') != corrida['python']:
+            self.stdout.write(self.style.WARNING(
+                f"La corrida anterior usó Python {anterior.get('python')}: los resultados no son directamente comparables"
+            ))
+
+        self.stdout.write(f"\n{'paquete':<40} {'antes ms':>9} {'ahora ms':>9} {'Δ':>8}")
+        for paquete, actual in sorted(corrida['paquetes'].items(), key=lambda item: item[1], reverse=True):
+            base = anterior.get('paquetes', {}).get(paquete)
+            # Los paquetes de menos de 1 ms son ruido de medición
+            if not base or max(base, actual) < 1:
+                continue
+            self.stdout.write(f'{paquete:<40} {base:>9.1f} {actual:>9.1f} {actual / base - 1:>+8.1%}')
+        nuevos = set(corrida['paquetes']) - set(anterior.get('paquetes', {}))
+        if nuevos:
+            self.stdout.write(f"Paquetes nuevos en el arranque: {', '.join(sorted(nuevos))}")
+
+        delta = corrida['total_ms'] / anterior['total_ms'] - 1
+        if delta > umbral:
+            raise CommandError(f"El arranque importa {delta:.1%} más lento ({anterior['total_ms']} -> {corrida['total_ms']} ms)")
+        self.stdout.write(self.style.SUCCESS(f"Total {delta:+.1%} ({anterior['total_ms']} -> {corrida['total_ms']} ms)"))
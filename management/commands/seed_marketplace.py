@@ -0,0 +1,342 @@
+"""
+Genera un marketplace sintético para pruebas de escala: usuarios, productos, órdenes,
+calificaciones, mensajes, envíos y eventos de tracking con distribuciones sesgadas
+(vendedores grandes, productos populares y categorías de cola larga)
+"""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api import views
+from api.categorias import id_categoria
+from api.models import Carrier, Message, Order, Product, Rating, Shipment, TrackingEvent, User
+from api.rollups import reconstruir_resumenes
+
+
+DOMINIO_SEED = 'seed.mandale.local'
+
+# preset -> (usuarios, productos, órdenes, mensajes)
+TAMANOS = {
+    'chico': (2000, 20000, 20000, 10000),
+    'mediano': (20000, 200000, 200000, 100000),
+    'grande': (100000, 1000000, 1000000, 500000),
+}
+
+CATEGORIAS = [
+    'Celulares', 'Computación', 'Electrónica', 'Hogar', 'Muebles', 'Ropa', 'Calzado', 'Deportes',
+    'Herramientas', 'Juguetes', 'Bebés', 'Belleza', 'Libros', 'Música', 'Videojuegos', 'Autos',
+    'Motos', 'Repuestos', 'Jardín', 'Mascotas', 'Oficina', 'Arte', 'Antigüedades', 'Cámaras',
+    'Relojes', 'Joyas', 'Camping', 'Pesca', 'Bicicletas', 'Instrumentos', 'Colecciones', 'Electrodomésticos',
+    'Iluminación', 'Construcción', 'Industria', 'Salud', 'Alimentos', 'Bebidas', 'Fiestas', 'Souvenirs',
+]
+SUSTANTIVOS = [
+    'Zapatillas', 'Mesa', 'Celular', 'Remera', 'Bici', 'Auriculares', 'Silla', 'Notebook', 'Campera',
+    'Lámpara', 'Mochila', 'Parlante', 'Monitor', 'Teclado', 'Heladera', 'Taladro', 'Pelota', 'Reloj',
+    'Cafetera', 'Guitarra', 'Carpa', 'Cámara', 'Libro', 'Sillón', 'Vestido', 'Cuna', 'Perfume', 'Casco',
+]
+ADJETIVOS = ['nuevo', 'usado', 'premium', 'clásico', 'original', 'importado', 'compacto', 'profesional',
+             'vintage', 'liviano', 'reforzado', 'de colección']
+
+ESTADOS_PRODUCTO = (['Activo', 'Pausado', 'Vendido', 'Eliminado'], [0.85, 0.07, 0.06, 0.02])
+CONDICIONES = (['Nuevo', 'Usado', 'Reacondicionado'], [0.70, 0.25, 0.05])
+ESTADOS_ORDEN = (['Pendiente', 'Confirmada', 'Enviada', 'Entregada', 'Cancelada', 'Rechazada'],
+                 [0.05, 0.08, 0.12, 0.65, 0.07, 0.03])
+METODOS_PAGO = (['mercadopago', 'lemon', 'brubank'], [0.70, 0.18, 0.12])
+ESTRELLAS = ([1, 2, 3, 4, 5], [0.03, 0.04, 0.08, 0.25, 0.60])
+ETAPAS_ENVIO = ['Creado', 'Despachado', 'En camino', 'Entregado']
+
+FRACCION_VENDEDORES = 0.15
+FRACCION_CALIFICADAS = 0.6
+DIAS_HISTORIA = 730
+
+
+def _pesos_zipf(np, azar, cantidad, exponente):
+    """Pesos de una ley de potencias asignados en orden aleatorio (quién es 'popular' es al azar)"""
+    pesos = 1.0 / np.arange(1, cantidad + 1) ** exponente
+    azar.shuffle(pesos)
+    return pesos / pesos.sum()
+
+
+def _elegir(np, azar, opciones, cantidad):
+    valores, probabilidades = opciones
+    return np.asarray(valores, dtype=object)[azar.choice(len(valores), size=cantidad, p=probabilidades)]
+
+
+@contextmanager
+def _fechas_manuales(*modelos):
+    """Desactiva auto_now / auto_now_add para poder insertar fechas históricas"""
+    campos = [
+        (campo, campo.auto_now, campo.auto_now_add)
+        for modelo in modelos for campo in modelo._meta.concrete_fields
+        if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False)
+    ]
+    for campo, _, _ in campos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in campos:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos realistas (determinísticos según --semilla) para pruebas de escala'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamano', choices=list(TAMANOS), default='chico')
+        parser.add_argument('--usuarios', type=int, help='Reemplaza la cantidad del preset')
+        parser.add_argument('--productos', type=int, help='Reemplaza la cantidad del preset')
+        parser.add_argument('--ordenes', type=int, help='Reemplaza la cantidad del preset')
+        parser.add_argument('--mensajes', type=int, help='Reemplaza la cantidad del preset')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--password', default='mandale123',
+                            help='Contraseña de todos los usuarios generados (se hashea una sola vez)')
+        parser.add_argument('--limpiar', action='store_true',
+                            help='Borra antes los datos generados por una corrida anterior')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CommandError('seed_marketplace necesita NumPy: pip install numpy')
+
+        usuarios, productos, ordenes, mensajes = TAMANOS[options['tamano']]
+        usuarios = options['usuarios'] or usuarios
+        productos = options['productos'] or productos
+        ordenes = options['ordenes'] or ordenes
+        mensajes = options['mensajes'] or mensajes
+        if usuarios < 2:
+            raise CommandError('Se necesitan al menos 2 usuarios')
+
+        self.np = np
+        self.azar = np.random.default_rng(options['semilla'])
+        self.semilla = options['semilla']
+        self.batch_size = options['batch_size']
+        self.ahora = timezone.now()
+
+        if options['limpiar']:
+            self._etapa('Limpieza', self._limpiar)
+        elif User.objects.filter(email__endswith=f'@{DOMINIO_SEED}', username__startswith=f'seed{self.semilla}_').exists():
+            raise CommandError(f'Ya hay datos generados con la semilla {self.semilla}: usar --limpiar u otra --semilla')
+
+        with _fechas_manuales(User, Product, Order, Rating, Message, Shipment, TrackingEvent):
+            self._etapa('Usuarios', self._usuarios, usuarios, options['password'])
+            self._etapa('Productos', self._productos, productos)
+            self._etapa('Órdenes', self._ordenes, ordenes)
+            self._etapa('Calificaciones', self._calificaciones)
+            self._etapa('Mensajes', self._mensajes, mensajes)
+            self._etapa('Envíos', self._envios)
+        self._etapa('Resúmenes', reconstruir_resumenes)
+
+    def _etapa(self, nombre, funcion, *args):
+        inicio = time.perf_counter()
+        cantidad = funcion(*args)
+        detalle = f'{cantidad} filas ' if isinstance(cantidad, int) else ''
+        self.stdout.write(f'{nombre}: {detalle}en {time.perf_counter() - inicio:.1f}s')
+
+    def _insertar(self, modelo, filas):
+        """bulk_create por lotes dentro de una transacción; devuelve los ids generados"""
+        ids = []
+        lote = []
+        with transaction.atomic():
+            for fila in filas:
+                lote.append(fila)
+                if len(lote) >= self.batch_size:
+                    ids.extend(objeto.pk for objeto in modelo.objects.bulk_create(lote))
+                    lote = []
+            if lote:
+                ids.extend(objeto.pk for objeto in modelo.objects.bulk_create(lote))
+        return self.np.asarray(ids, dtype=self.np.int64)
+
+    def _fechas(self, segundos):
+        return [self.ahora - timedelta(seconds=valor) for valor in segundos.tolist()]
+
+    def _limpiar(self):
+        generados = User.objects.filter(email__endswith=f'@{DOMINIO_SEED}')
+        # Borrado directo (sin señales ni cascada en Python) de las tablas grandes
+        borrados = 0
+        for queryset in (
+            TrackingEvent.objects.filter(shipment__order__vendedor__in=generados),
+            Shipment.objects.filter(order__vendedor__in=generados),
+            Rating.objects.filter(calificador__in=generados),
+            Message.objects.filter(remitente__in=generados),
+            Order.objects.filter(vendedor__in=generados),
+            Product.objects.filter(vendedor__in=generados),
+        ):
+            borrados += queryset._raw_delete(queryset.db)
+        borrados += generados.delete()[0]
+        return borrados
+
+    def _usuarios(self, cantidad, password):
+        np, azar = self.np, self.azar
+        # Un solo hash para todos: hashear cada contraseña llevaría minutos
+        hash_password = make_password(password)
+        antiguedad = azar.uniform(0, DIAS_HISTORIA * 86400, cantidad)
+        fechas = self._fechas(antiguedad)
+        billeteras = azar.random((cantidad, 3)) < np.array([0.6, 0.2, 0.1])
+        provincias = ['Buenos Aires', 'CABA', 'Córdoba', 'Santa Fe', 'Mendoza', 'Tucumán', 'Salta', 'Neuquén']
+        provincia = azar.choice(len(provincias), size=cantidad, p=[0.35, 0.25, 0.12, 0.1, 0.06, 0.05, 0.04, 0.03])
+
+        prefijo = f'seed{self.semilla}_'
+        self.usuarios = self._insertar(User, (
+            User(
+                username=f'{prefijo}{i}', email=f'{prefijo}{i}@{DOMINIO_SEED}', password=hash_password,
+                nombre=f'Usuario {i}', provincia=provincias[provincia[i]],
+                mercadopago_activa=bool(billeteras[i, 0]), lemon_activa=bool(billeteras[i, 1]),
+                brubank_activa=bool(billeteras[i, 2]), date_joined=fechas[i], fecha_creacion=fechas[i],
+            )
+            for i in range(cantidad)
+        ))
+
+        # Vendedores con actividad según una ley de potencias: pocos concentran la mayoría
+        vendedores = max(int(cantidad * FRACCION_VENDEDORES), 1)
+        self.vendedores = azar.choice(cantidad, size=vendedores, replace=False)
+        self.pesos_vendedores = _pesos_zipf(np, azar, vendedores, 1.1)
+        self.pesos_compradores = _pesos_zipf(np, azar, cantidad, 0.6)
+        return len(self.usuarios)
+
+    def _productos(self, cantidad):
+        np, azar = self.np, self.azar
+        self.producto_vendedor = self.vendedores[azar.choice(len(self.vendedores), size=cantidad, p=self.pesos_vendedores)]
+        categoria = azar.choice(len(CATEGORIAS), size=cantidad, p=_pesos_zipf(np, azar, len(CATEGORIAS), 1.2))
+        # Precio log-normal con una mediana distinta por categoría
+        medianas = azar.uniform(np.log(2000), np.log(200000), len(CATEGORIAS))
+        self.producto_precio = np.round(np.exp(azar.normal(medianas[categoria], 0.8)), 2).clip(100, 9999999)
+        # Más publicaciones recientes que viejas
+        self.producto_antiguedad = (1 - azar.power(2.0, cantidad)) * DIAS_HISTORIA * 86400
+        fechas = self._fechas(self.producto_antiguedad)
+        self.pesos_productos = _pesos_zipf(np, azar, cantidad, 1.2)
+        visitas = azar.poisson(self.pesos_productos * cantidad * 40)
+        estado = _elegir(np, azar, ESTADOS_PRODUCTO, cantidad)
+        condicion = _elegir(np, azar, CONDICIONES, cantidad)
+        stock = azar.geometric(0.3, cantidad)
+        peso = np.round(azar.lognormal(0, 1, cantidad), 2).clip(0.05, 999)
+        sustantivo = azar.choice(len(SUSTANTIVOS), size=cantidad)
+        adjetivo = azar.choice(len(ADJETIVOS), size=cantidad)
+
+        categoria_ids = [id_categoria(nombre) for nombre in CATEGORIAS]
+        self.productos = self._insertar(Product, (
+            Product(
+                titulo=f'{SUSTANTIVOS[sustantivo[i]]} {ADJETIVOS[adjetivo[i]]} {i}',
+                descripcion=f'{SUSTANTIVOS[sustantivo[i]]} en excelente estado. Envíos a todo el país.',
+                precio=str(self.producto_precio[i]), categoria=CATEGORIAS[categoria[i]],
+                categoria_ref_id=categoria_ids[categoria[i]],
+                condicion=condicion[i], stock=int(stock[i]), estado=estado[i], visitas=int(visitas[i]),
+                peso_kg=str(peso[i]), vendedor_id=int(self.usuarios[self.producto_vendedor[i]]),
+                fecha_publicacion=fechas[i],
+            )
+            for i in range(cantidad)
+        ))
+        return len(self.productos)
+
+    def _ordenes(self, cantidad):
+        np, azar = self.np, self.azar
+        producto = azar.choice(len(self.productos), size=cantidad, p=self.pesos_productos)
+        vendedor = self.producto_vendedor[producto]
+        comprador = azar.choice(len(self.usuarios), size=cantidad, p=self.pesos_compradores)
+        propias = comprador == vendedor
+        comprador[propias] = (comprador[propias] + 1) % len(self.usuarios)
+        unidades = azar.geometric(0.75, cantidad).clip(1, 10)
+        estado = _elegir(np, azar, ESTADOS_ORDEN, cantidad)
+        metodo = _elegir(np, azar, METODOS_PAGO, cantidad)
+        # La orden es posterior a la publicación del producto
+        antiguedad = self.producto_antiguedad[producto] * azar.random(cantidad)
+        fechas = self._fechas(antiguedad)
+
+        self.ordenes = self._insertar(Order, (
+            Order(
+                comprador_id=int(self.usuarios[comprador[i]]), vendedor_id=int(self.usuarios[vendedor[i]]),
+                producto_id=int(self.productos[producto[i]]), cantidad=int(unidades[i]),
+                precio_unitario=str(self.producto_precio[producto[i]]),
+                precio_total=str(round(self.producto_precio[producto[i]] * unidades[i], 2)),
+                metodo_pago=metodo[i], estado=estado[i], direccion_entrega='Calle Falsa 123',
+                fecha_creacion=fechas[i], fecha_actualizacion=fechas[i],
+            )
+            for i in range(cantidad)
+        ))
+        self.orden_comprador = comprador
+        self.orden_vendedor = vendedor
+        self.orden_estado = estado
+        self.orden_antiguedad = antiguedad
+        return len(self.ordenes)
+
+    def _calificaciones(self):
+        np, azar = self.np, self.azar
+        entregadas = np.flatnonzero(self.orden_estado == 'Entregada')
+        calificadas = entregadas[azar.random(len(entregadas)) < FRACCION_CALIFICADAS]
+        estrellas = _elegir(np, azar, ESTRELLAS, len(calificadas))
+        fechas = self._fechas(self.orden_antiguedad[calificadas] * azar.uniform(0.5, 1, len(calificadas)))
+
+        return len(self._insertar(Rating, (
+            Rating(
+                calificador_id=int(self.usuarios[self.orden_comprador[orden]]),
+                calificado_id=int(self.usuarios[self.orden_vendedor[orden]]),
+                orden_id=int(self.ordenes[orden]), estrellas=int(estrellas[i]),
+                comentario='Todo perfecto' if estrellas[i] >= 4 else 'Podría mejorar', fecha_creacion=fechas[i],
+            )
+            for i, orden in enumerate(calificadas.tolist())
+        )))
+
+    def _mensajes(self, cantidad):
+        np, azar = self.np, self.azar
+        # Conversaciones sobre órdenes (más mensajes en las órdenes de productos populares)
+        orden = azar.choice(len(self.ordenes), size=cantidad)
+        del_comprador = azar.random(cantidad) < 0.6
+        con_orden = azar.random(cantidad) < 0.6
+        leido = azar.random(cantidad) < 0.8
+        fechas = self._fechas(self.orden_antiguedad[orden] * azar.random(cantidad))
+
+        def fila(i):
+            comprador = int(self.usuarios[self.orden_comprador[orden[i]]])
+            vendedor = int(self.usuarios[self.orden_vendedor[orden[i]]])
+            remitente, destinatario = (comprador, vendedor) if del_comprador[i] else (vendedor, comprador)
+            return Message(
+                orden_id=int(self.ordenes[orden[i]]) if con_orden[i] else None,
+                remitente_id=remitente, destinatario_id=destinatario, asunto='Consulta sobre la compra',
+                mensaje='¡Hola! ¿Cuándo llega el envío?', leido=bool(leido[i]), fecha_envio=fechas[i],
+            )
+
+        return len(self._insertar(Message, (fila(i) for i in range(cantidad))))
+
+    def _envios(self):
+        np, azar = self.np, self.azar
+        views._asegurar_proveedores_default()
+        carriers = list(Carrier.objects.filter(activo=True).values_list('id', flat=True))
+        enviadas = np.flatnonzero(np.isin(self.orden_estado, ['Enviada', 'Entregada']))
+        entregada = self.orden_estado[enviadas] == 'Entregada'
+        # Etapas alcanzadas: todas si se entregó, 2 o 3 si está en viaje
+        etapas = np.where(entregada, len(ETAPAS_ENVIO), azar.integers(2, len(ETAPAS_ENVIO), len(enviadas)))
+        carrier = azar.choice(len(carriers), size=len(enviadas))
+        fechas = self._fechas(self.orden_antiguedad[enviadas])
+
+        costos = np.round(1200 + azar.random(len(enviadas)) * 3000, 2)
+
+        envios = self._insertar(Shipment, (
+            Shipment(
+                order_id=int(self.ordenes[orden]), carrier_id=carriers[carrier[i]], costo=str(costos[i]),
+                estado=ETAPAS_ENVIO[etapas[i] - 1], tracking_number=f'SEED{self.semilla}-{orden}',
+                dias_estimados=int(etapas[i]) + 1, fecha_creacion=fechas[i], fecha_actualizacion=fechas[i],
+            )
+            for i, orden in enumerate(enviadas.tolist())
+        ))
+
+        # Un evento por etapa, separados entre 6 y 36 horas
+        horas = azar.uniform(6, 36, (len(enviadas), len(ETAPAS_ENVIO))).cumsum(axis=1)
+
+        def eventos():
+            for i in range(len(envios)):
+                for etapa in range(int(etapas[i])):
+                    fecha = fechas[i] + timedelta(hours=float(horas[i, etapa]))
+                    yield TrackingEvent(
+                        shipment_id=int(envios[i]), estado=ETAPAS_ENVIO[etapa],
+                        descripcion=f'{ETAPAS_ENVIO[etapa]} ({etapa + 1}/{len(ETAPAS_ENVIO)})',
+                        fecha_evento=min(fecha, self.ahora), fecha_creacion=min(fecha, self.ahora),
+                    )
+
+        return len(envios) + len(self._insertar(TrackingEvent, eventos()))
@@ -0,0 +1,26 @@
+"""
+Copia la base SQLite principal sobre el archivo que hace de réplica local (DB_REPLICA_SQLITE)
+"""
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza la réplica SQLite local con la base principal usando la API de backup de SQLite'
+
+    def handle(self, *args, **options):
+        origen = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if 'sqlite' not in origen['ENGINE'] or not settings.DB_REPLICA_SQLITE:
+            raise CommandError('Requiere una base principal SQLite y DB_REPLICA_SQLITE configurado')
+
+        fuente = sqlite3.connect(str(origen['NAME']))
+        destino = sqlite3.connect(settings.DB_REPLICA_SQLITE)
+        try:
+            fuente.backup(destino)
+        finally:
+            destino.close()
+            fuente.close()
+        self.stdout.write(self.style.SUCCESS(f'Réplica actualizada: {settings.DB_REPLICA_SQLITE}'))
@@ -0,0 +1,146 @@
+"""
+Servicio de archivos de MEDIA_ROOT.
+
+La vista solo valida el acceso y arma los headers de caché: la transferencia la hace el
+servidor web mediante X-Accel-Redirect (nginx) o X-Sendfile (Apache / lighttpd), según
+MEDIA_ACCEL_MODE. Ejemplo para nginx, con MEDIA_ACCEL_PREFIX = '/protected-media/':
+
+    location /protected-media/ {
+        internal;
+        alias /ruta/a/media/;
+    }
+
+Sin servidor delante (MEDIA_ACCEL_MODE = '') el archivo se entrega desde Django con soporte
+de Range; pensado para desarrollo.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+
+
+# Carpetas que cualquiera puede leer; el resto de MEDIA_ROOT solo lo ve el staff
+CARPETAS_PUBLICAS = ('productos/', 'banners/', 'variantes/')
+
+# Nombres del almacenamiento direccionado por contenido (ver almacenamiento.py)
+PATRON_HASH = re.compile(r'(?:^|/)([0-9a-f]{64})(?:_[\w-]+)?\.\w+$')
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_MEDIA = 'public, max-age=86400'
+
+TAMANO_CHUNK = 64 * 1024
+
+
+def _get_modo():
+    return getattr(settings, 'MEDIA_ACCEL_MODE', '')
+
+
+def _get_prefijo():
+    return getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+
+def puede_ver(request, ruta):
+    """Control de acceso a un archivo de media (`ruta` normalizada, relativa a MEDIA_ROOT)"""
+    if ruta.startswith(CARPETAS_PUBLICAS):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def _etag(ruta, estado):
+    coincidencia = PATRON_HASH.search(ruta)
+    if coincidencia:
+        return f'"{coincidencia.group(1)}"', CACHE_INMUTABLE
+    return f'"{int(estado.st_mtime):x}-{estado.st_size:x}"', CACHE_MEDIA
+
+
+def _rango(header, tamano):
+    """(inicio, fin) inclusivos de un header Range de un solo rango, None si no aplica"""
+    coincidencia = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+    if not coincidencia or not any(coincidencia.groups()):
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio:
+        inicio, fin = max(tamano - int(fin), 0), tamano - 1
+    else:
+        inicio, fin = int(inicio), min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio > fin:
+        raise ValueError(header)
+    return inicio, fin
+
+
+def _leer_rango(archivo, inicio, fin):
+    try:
+        archivo.seek(inicio)
+        restante = fin - inicio + 1
+        while restante > 0:
+            datos = archivo.read(min(TAMANO_CHUNK, restante))
+            if not datos:
+                break
+            restante -= len(datos)
+            yield datos
+    finally:
+        archivo.close()
+
+
+def _respuesta_django(request, completa, estado, content_type):
+    rango = None
+    if request.headers.get('Range'):
+        try:
+            rango = _rango(request.headers['Range'], estado.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{estado.st_size}'
+            return response
+    if rango is None:
+        return FileResponse(open(completa, 'rb'), content_type=content_type)
+
+    inicio, fin = rango
+    response = FileResponse(_leer_rango(open(completa, 'rb'), inicio, fin), status=206, content_type=content_type)
+    response['Content-Length'] = str(fin - inicio + 1)
+    response['Content-Range'] = f'bytes {inicio}-{fin}/{estado.st_size}'
+    return response
+
+
+def servir_media(request, ruta):
+    """Entrega un archivo de media delegando la transferencia al servidor web"""
+    try:
+        completa = safe_join(settings.MEDIA_ROOT, ruta.lstrip('/'))
+        # El acceso se decide sobre la ruta ya resuelta: productos/../tmp/x no es pública
+        ruta = os.path.relpath(completa, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+        if ruta == '.' or ruta.startswith('../'):
+            raise SuspiciousFileOperation(ruta)
+        estado = os.stat(completa)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404('Archivo no encontrado')
+    if not os.path.isfile(completa) or not puede_ver(request, ruta):
+        raise Http404('Archivo no encontrado')
+
+    etag, cache_control = _etag(ruta, estado)
+    if not ruta.startswith(CARPETAS_PUBLICAS):
+        cache_control = 'private, no-cache'
+    if request.headers.get('If-None-Match') and etag in parse_etags(request.headers['If-None-Match']):
+        response = HttpResponseNotModified()
+    else:
+        content_type = mimetypes.guess_type(completa)[0] or 'application/octet-stream'
+        modo = _get_modo()
+        if modo == 'nginx':
+            # nginx resuelve el Range y envía el archivo con sendfile()
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = quote(_get_prefijo().rstrip('/') + '/' + ruta)
+        elif modo == 'sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = completa
+        else:
+            response = _respuesta_django(request, completa, estado, content_type)
+        response['Last-Modified'] = http_date(estado.st_mtime)
+
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    response['Accept-Ranges'] = 'bytes'
+    return response
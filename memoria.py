@@ -0,0 +1,136 @@
+"""
+Perfilado de memoria por request con tracemalloc.
+
+Con MEMORY_PROFILING_ENABLED = False el middleware no se instala (costo cero). Activo,
+traza las asignaciones de una fracción de los requests (MEMORY_PROFILING_SAMPLE_RATE):
+    - el pico de memoria del request se suma al histograma memory_peak_bytes de /metrics;
+    - si el pico supera MEMORY_BUDGET_MB se dispara la alarma: se registran los sitios que
+      más memoria retienen al terminar la vista (la respuesta todavía referencia los datos
+      serializados), agrupados por la línea de la aplicación más cercana, y se suma
+      memory_alarms_total en /metrics.
+
+tracemalloc es global al proceso: se traza un request a la vez y, con workers con hilos, el
+pico incluye lo que asignen los otros hilos mientras tanto. Mientras se traza, el request es
+varias veces más lento. Las respuestas en streaming solo miden hasta que empieza el envío.
+Los registros van a MEMORY_PROFILING_LOG_FILE (o se imprimen) y los últimos quedan en memoria
+para admin-panel/memoria/.
+"""
+import json
+import os
+import random
+import threading
+import tracemalloc
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from .instrumentacion import registro
+
+
+MAX_REGISTROS_MEMORIA = 200
+MB = 1024 * 1024
+
+ESTE_ARCHIVO = os.path.abspath(__file__)
+DIRECTORIO_APP = os.path.dirname(ESTE_ARCHIVO)
+
+ultimos = deque(maxlen=MAX_REGISTROS_MEMORIA)
+_lock_archivo = threading.Lock()
+# tracemalloc no distingue hilos: un solo request trazado a la vez por proceso
+_activo = threading.Lock()
+
+
+def _get_tasa():
+    return getattr(settings, 'MEMORY_PROFILING_SAMPLE_RATE', 1.0)
+
+
+def _get_presupuesto():
+    return getattr(settings, 'MEMORY_BUDGET_MB', 64) * MB
+
+
+def _get_top():
+    return getattr(settings, 'MEMORY_PROFILING_TOP', 10)
+
+
+def _get_frames():
+    return getattr(settings, 'MEMORY_PROFILING_FRAMES', 15)
+
+
+def _sitio(traza):
+    """'archivo.py:línea' de la aplicación más cercano a la asignación, o el frame más reciente"""
+    # Las trazas de tracemalloc van del frame más viejo al más reciente
+    for frame in reversed(traza):
+        if frame.filename.startswith(DIRECTORIO_APP) and frame.filename != ESTE_ARCHIVO:
+            return f'{os.path.relpath(frame.filename, DIRECTORIO_APP)}:{frame.lineno}'
+    frame = traza[-1]
+    return f'{frame.filename}:{frame.lineno}'
+
+
+def sitios_principales(snapshot, limite):
+    """Los `limite` sitios que más memoria retienen: [{'sitio', 'kb', 'bloques'}]"""
+    sitios = {}
+    for estadistica in snapshot.statistics('traceback'):
+        sitio = _sitio(estadistica.traceback)
+        tamano, bloques = sitios.get(sitio, (0, 0))
+        sitios[sitio] = (tamano + estadistica.size, bloques + estadistica.count)
+    principales = sorted(sitios.items(), key=lambda item: item[1][0], reverse=True)[:limite]
+    return [{'sitio': sitio, 'kb': round(tamano / 1024, 1), 'bloques': bloques} for sitio, (tamano, bloques) in principales]
+
+
+def registrar(datos):
+    """Guarda un registro en memoria y en MEMORY_PROFILING_LOG_FILE (o lo imprime)"""
+    datos['fecha'] = timezone.now().isoformat()
+    ultimos.append(datos)
+    archivo = getattr(settings, 'MEMORY_PROFILING_LOG_FILE', '')
+    if not archivo:
+        sitio = datos['sitios'][0]['sitio'] if datos['sitios'] else '-'
+        print(f"🧠 {datos['vista']} | pico {datos['pico_mb']} MB (presupuesto {datos['presupuesto_mb']} MB) | {sitio}")
+        return
+    with _lock_archivo, open(archivo, 'a') as salida:
+        salida.write(json.dumps(datos, ensure_ascii=False) + '\n')
+
+
+class MemoriaMiddleware:
+    """Mide el pico de memoria de los requests muestreados (MEMORY_PROFILING_ENABLED)"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'MEMORY_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tasa = _get_tasa()
+        if tasa < 1 and random.random() >= tasa:
+            return self.get_response(request)
+        # Otro request trazándose, o tracemalloc en uso por otra herramienta
+        if tracemalloc.is_tracing() or not _activo.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            tracemalloc.start(_get_frames())
+            try:
+                response = self.get_response(request)
+                _, pico = tracemalloc.get_traced_memory()
+                presupuesto = _get_presupuesto()
+                snapshot = tracemalloc.take_snapshot() if pico > presupuesto else None
+            finally:
+                tracemalloc.stop()
+        finally:
+            _activo.release()
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        vista = resolver_match.view_name if resolver_match else 'sin_ruta'
+        registro.observar('memory_peak_bytes', vista, pico)
+        if snapshot is not None:
+            registro.sumar('memory_alarms_total', (vista,))
+            registrar({
+                'vista': vista,
+                'metodo': request.method,
+                'ruta': request.get_full_path(),
+                'estado': response.status_code,
+                'pico_mb': round(pico / MB, 2),
+                'presupuesto_mb': round(presupuesto / MB, 2),
+                'sitios': sitios_principales(snapshot, _get_top()),
+            })
+        return response
@@ -0,0 +1,126 @@
+"""
+Métricas del panel de administración.
+
+Los paneles leen las tablas de resumen diario (ver rollups.py), por lo que su costo
+no depende del tamaño del catálogo.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Count, Sum, Q, F, OuterRef, Subquery, Value, DecimalField, ExpressionWrapper
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, User, Comision, ResumenDiarioCategoria
+
+
+def porcentaje_comision():
+    """Subconsulta con el porcentaje de comisión activo de la categoría del producto"""
+    return Coalesce(
+        Subquery(
+            Comision.objects.filter(categoria=OuterRef('categoria'), activa=True).values('porcentaje')[:1]
+        ),
+        Value(0),
+        output_field=DecimalField(max_digits=5, decimal_places=2),
+    )
+
+
+def productos_con_comision(queryset=None):
+    """Anota cada producto con el importe de comisión que le corresponde"""
+    if queryset is None:
+        queryset = Product.objects.all()
+    return queryset.annotate(
+        comision_pct=porcentaje_comision(),
+    ).annotate(
+        comision_importe=ExpressionWrapper(
+            # Se multiplica por 0.01 para evitar la división entera de SQLite
+            F('precio') * F('comision_pct') * Value(Decimal('0.01')),
+            output_field=DecimalField(max_digits=14, decimal_places=4),
+        ),
+    )
+
+
+def _sumar(valores):
+    return {clave: valor or 0 for clave, valor in valores.items()}
+
+
+def metricas_panel():
+    """
+    Calcula las métricas del panel a partir de los resúmenes diarios, con un número
+    fijo de consultas independiente de la cantidad de productos.
+    """
+    hoy = timezone.localdate()
+    inicio_mes = hoy.replace(day=1)
+    hace_una_semana = hoy - timedelta(days=7)
+
+    activos = Q(estado='Activo')
+    vendidos = Q(estado='Vendido')
+    vendidos_mes = vendidos & Q(fecha__gte=inicio_mes)
+
+    productos = _sumar(ResumenDiarioCategoria.objects.aggregate(
+        total_productos=Sum('cantidad'),
+        productos_activos=Sum('cantidad', filter=activos),
+        productos_pausados=Sum('cantidad', filter=Q(estado='Pausado')),
+        productos_vendidos=Sum('cantidad', filter=vendidos),
+        productos_pendientes=Sum('cantidad', filter=activos & Q(fecha__gte=hace_una_semana)),
+        valor_total_activos=Sum('valor', filter=activos),
+        valor_vendidos=Sum('valor', filter=vendidos),
+        comisiones_potenciales=Sum('comision', filter=activos),
+        comisiones_reales=Sum('comision', filter=vendidos),
+        productos_vendidos_mes=Sum('cantidad', filter=vendidos_mes),
+        valor_vendido_mes=Sum('valor', filter=vendidos_mes),
+        comisiones_mes=Sum('comision', filter=vendidos_mes),
+    ))
+
+    usuarios = User.objects.aggregate(
+        total_usuarios=Count('id'),
+        usuarios_activos=Count('id', filter=Q(is_active=True)),
+    )
+
+    # Top categorías por valor, con la comisión potencial de cada una
+    categorias_valor = list(
+        ResumenDiarioCategoria.objects.filter(activos).values('categoria').annotate(
+            valor_total=Sum('valor'),
+            cantidad=Sum('cantidad'),
+            comision_potencial=Sum('comision'),
+        ).filter(cantidad__gt=0).order_by('-valor_total')[:5]
+    )
+
+    return {
+        **productos,
+        **usuarios,
+        'productos_recientes': list(
+            Product.objects.select_related('vendedor').order_by('-fecha_publicacion')[:10]
+        ),
+        'productos_por_categoria': list(
+            ResumenDiarioCategoria.objects.values('categoria').annotate(total=Sum('cantidad'))
+            .filter(total__gt=0).order_by('-total')[:10]
+        ),
+        'comisiones': list(Comision.objects.filter(activa=True).order_by('categoria')),
+        'categorias_valor': categorias_valor,
+    }
+
+
+def metricas_estadisticas():
+    """Datos de la página de estadísticas leídos desde los resúmenes diarios"""
+    return {
+        'productos_por_estado': list(
+            ResumenDiarioCategoria.objects.values('estado').annotate(total=Sum('cantidad'))
+            .filter(total__gt=0).order_by('estado')
+        ),
+        'productos_por_categoria': list(
+            ResumenDiarioCategoria.objects.values('categoria').annotate(
+                total=Sum('cantidad'),
+                total_activos=Coalesce(Sum('cantidad', filter=Q(estado='Activo')), 0),
+            ).filter(total__gt=0).order_by('-total')
+        ),
+        'usuarios_activos': list(
+            User.objects.annotate(productos_count=Sum('resumenes_diarios__publicaciones'))
+            .filter(productos_count__gt=0).order_by('-productos_count')[:10]
+        ),
+        'valor_total': ResumenDiarioCategoria.objects.filter(estado='Activo').aggregate(
+            total=Sum('valor')
+        )['total'] or 0,
+    }
@@ -1,7 +1,12 @@
 from django.db import models
-from django.db.models import Avg
+from django.db.models import Avg, Count
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .almacenamiento import AlmacenamientoDeduplicado
 
 
 class User(AbstractUser):
@@ -19,6 +24,8 @@ class User(AbstractUser):
         null=True,
         help_text="Imagen de cabecera para tu página pública."
     )
+    banner_variantes = models.JSONField(default=dict, blank=True, editable=False,
+                                        help_text="Versiones redimensionadas del banner (ver imagenes.py)")
     
     # Dirección
     calle = models.CharField(max_length=200, blank=True, null=True)
@@ -48,17 +55,68 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
     
+    def _resumen_calificaciones(self):
+        """Promedio y total de calificaciones en una sola consulta, memorizados en la instancia"""
+        if not hasattr(self, '_calificaciones'):
+            self._calificaciones = self.calificaciones_recibidas.aggregate(
+                promedio=Avg('estrellas'), total=Count('id')
+            )
+        return self._calificaciones
+    
+    @classmethod
+    def precargar_calificaciones(cls, usuarios):
+        """Memoriza el resumen de calificaciones de varios usuarios con una sola consulta (listados)"""
+        pendientes = {}
+        for usuario in usuarios:
+            if usuario is not None and not hasattr(usuario, '_calificaciones'):
+                pendientes.setdefault(usuario.pk, []).append(usuario)
+        if not pendientes:
+            return
+        resumenes = {
+            fila.pop('calificado_id'): fila
+            for fila in Rating.objects.filter(calificado_id__in=pendientes).order_by()
+            .values('calificado_id').annotate(promedio=Avg('estrellas'), total=Count('id'))
+        }
+        for pk, instancias in pendientes.items():
+            resumen = resumenes.get(pk, {'promedio': None, 'total': 0})
+            for usuario in instancias:
+                usuario._calificaciones = resumen
+    
     def calcular_reputacion(self):
         """Calcula la reputación promedio basada en las calificaciones recibidas"""
-        calificaciones = self.calificaciones_recibidas.all()
-        if not calificaciones.exists():
-            return None
-        promedio = calificaciones.aggregate(Avg('estrellas'))['estrellas__avg']
+        promedio = self._resumen_calificaciones()['promedio']
         return round(promedio, 2) if promedio else None
     
     def total_calificaciones(self):
         """Retorna el total de calificaciones recibidas"""
-        return self.calificaciones_recibidas.count()
+        return self._resumen_calificaciones()['total']
+
+
+class Categoria(models.Model):
+    """Categoría de productos, con jerarquía y contador desnormalizado (ver categorias.py)"""
+    nombre = models.CharField(max_length=100, unique=True)
+    padre = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='subcategorias')
+    productos_activos = models.IntegerField(default=0, editable=False,
+                                            help_text="Productos activos de la categoría (sin subcategorías)")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Categoría'
+        verbose_name_plural = 'Categorías'
+        ordering = ['nombre']
+    
+    def __str__(self):
+        return self.nombre
+    
+    def clean(self):
+        # Un ciclo dejaría a la categoría fuera del árbol
+        padre = self.padre
+        vistos = set()
+        while padre is not None and padre.pk not in vistos:
+            if padre.pk == self.pk:
+                raise ValidationError({'padre': 'La categoría no puede estar dentro de sí misma.'})
+            vistos.add(padre.pk)
+            padre = padre.padre
 
 
 class Product(models.Model):
@@ -80,12 +138,15 @@ class Product(models.Model):
     descripcion = models.TextField()
     precio = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     categoria = models.CharField(max_length=100)
+    # Se completa al guardar a partir de `categoria` (ver categorias.py)
+    categoria_ref = models.ForeignKey(Categoria, on_delete=models.PROTECT, null=True, blank=True,
+                                      related_name='productos', db_index=False, editable=False)
     condicion = models.CharField(max_length=20, choices=CONDICION_CHOICES, default='Nuevo')
     stock = models.IntegerField(validators=[MinValueValidator(0)], default=1)
     envio_gratis = models.BooleanField(default=False)
     vendedor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='productos_publicados')
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='Activo')
-    fecha_publicacion = models.DateTimeField(auto_now_add=True)
+    fecha_publicacion = models.DateTimeField(auto_now_add=True, db_index=True)
     visitas = models.IntegerField(default=0)
     
     # Datos para cotizar envíos
@@ -98,6 +159,9 @@ class Product(models.Model):
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
         ordering = ['-fecha_publicacion']
+        indexes = [
+            models.Index(fields=['categoria_ref', 'estado']),
+        ]
     
     def __str__(self):
         return self.titulo
@@ -106,7 +170,9 @@ class Product(models.Model):
 class ProductImage(models.Model):
     """Modelo para imágenes de productos"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='imagenes')
-    imagen = models.ImageField(upload_to='productos/')
+    imagen = models.ImageField(upload_to='productos/', storage=AlmacenamientoDeduplicado())
+    variantes = models.JSONField(default=dict, blank=True, editable=False,
+                                 help_text="Versiones redimensionadas de la imagen (ver imagenes.py)")
     fecha_subida = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -120,6 +186,8 @@ class ProductImage(models.Model):
 class Comision(models.Model):
     """Modelo para comisiones por categoría"""
     categoria = models.CharField(max_length=100, unique=True)
+    categoria_ref = models.OneToOneField(Categoria, on_delete=models.PROTECT, null=True, blank=True,
+                                         related_name='comision', editable=False)
     porcentaje = models.DecimalField(max_digits=5, decimal_places=2, default=0.00, help_text="Porcentaje de comisión (ej: 10.50 = 10.5%)")
     activa = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
@@ -164,7 +232,7 @@ class Order(models.Model):
     metodo_pago = models.CharField(max_length=20, choices=METODO_PAGO_CHOICES)
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='Pendiente')
     direccion_entrega = models.TextField(blank=True, null=True)
-    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True, db_index=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     transaccion_id = models.CharField(max_length=200, blank=True, null=True)
     
@@ -340,3 +408,108 @@ class TrackingEvent(models.Model):
     
     def __str__(self):
         return f"{self.estado} - Envío #{self.shipment.id}"
+
+
+class IdempotencyKey(models.Model):
+    """Respuesta guardada para una clave de idempotencia (header Idempotency-Key)"""
+    ESTADO_CHOICES = [
+        ('En proceso', 'En proceso'),
+        ('Completada', 'Completada'),
+    ]
+    
+    clave = models.CharField(max_length=64, unique=True)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='claves_idempotencia')
+    metodo = models.CharField(max_length=10)
+    ruta = models.CharField(max_length=255)
+    huella = models.CharField(max_length=64, help_text="Hash del cuerpo de la solicitud original")
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='En proceso')
+    status_code = models.IntegerField(null=True, blank=True)
+    respuesta = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_reserva = models.DateTimeField(default=timezone.now,
+                                         help_text="Inicio de la ejecución en curso (ver IDEMPOTENCY_LEASE_SECONDS)")
+    fecha_expiracion = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        verbose_name = 'Clave de Idempotencia'
+        verbose_name_plural = 'Claves de Idempotencia'
+        ordering = ['-fecha_creacion']
+    
+    def __str__(self):
+        return f"{self.metodo} {self.ruta} ({self.estado})"
+
+
+class ResumenDiarioCategoria(models.Model):
+    """Resumen diario de productos por categoría y estado (según fecha de publicación)"""
+    fecha = models.DateField()
+    categoria = models.CharField(max_length=100)
+    estado = models.CharField(max_length=20, choices=Product.ESTADO_CHOICES)
+    cantidad = models.IntegerField(default=0)
+    valor = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    comision = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    
+    class Meta:
+        verbose_name = 'Resumen Diario por Categoría'
+        verbose_name_plural = 'Resúmenes Diarios por Categoría'
+        unique_together = ['fecha', 'categoria', 'estado']
+        indexes = [
+            models.Index(fields=['estado', 'fecha']),
+            models.Index(fields=['categoria']),
+        ]
+        ordering = ['-fecha', 'categoria', 'estado']
+    
+    def __str__(self):
+        return f"{self.fecha} - {self.categoria} ({self.estado}): {self.cantidad}"
+
+
+class ResumenDiarioVendedor(models.Model):
+    """Resumen diario de publicaciones por vendedor"""
+    fecha = models.DateField()
+    vendedor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    publicaciones = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Resumen Diario por Vendedor'
+        verbose_name_plural = 'Resúmenes Diarios por Vendedor'
+        unique_together = ['fecha', 'vendedor']
+        ordering = ['-fecha']
+    
+    def __str__(self):
+        return f"{self.fecha} - {self.vendedor.email}: {self.publicaciones}"
+
+
+class ModeracionLote(models.Model):
+    """Registro de auditoría de un lote de cambios de estado de productos"""
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='moderaciones')
+    estado_nuevo = models.CharField(max_length=20, choices=Product.ESTADO_CHOICES)
+    cantidad = models.IntegerField(default=0)
+    productos = models.JSONField(default=list, help_text="IDs de los productos del lote")
+    criterio = models.JSONField(default=dict, blank=True, help_text="Filtro o selección que originó el cambio")
+    origen = models.CharField(max_length=50, blank=True, default='')
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Lote de Moderación'
+        verbose_name_plural = 'Lotes de Moderación'
+        ordering = ['-fecha']
+    
+    def __str__(self):
+        return f"{self.cantidad} productos -> {self.estado_nuevo} ({self.fecha:%Y-%m-%d %H:%M})"
+
+
+class ArchivoMedia(models.Model):
+    """Archivo único del almacenamiento direccionado por contenido (ver almacenamiento.py)"""
+    ruta = models.CharField(max_length=255, unique=True)
+    hash = models.CharField(max_length=64, db_index=True)
+    tamano = models.BigIntegerField(default=0, help_text="Tamaño en bytes")
+    referencias = models.IntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Archivo de Media'
+        verbose_name_plural = 'Archivos de Media'
+        indexes = [models.Index(fields=['referencias', 'fecha_actualizacion'])]
+    
+    def __str__(self):
+        return f"{self.ruta} ({self.referencias} referencias)"
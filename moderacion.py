@@ -0,0 +1,45 @@
+"""
+Cambios de estado masivos de productos (moderación) con UPDATEs por lotes y un registro
+de auditoría por lote
+"""
+from django.db import transaction
+
+from .models import Product, ModeracionLote
+from .rollups import cambiar_estado_masivo
+
+
+ESTADOS_VALIDOS = [estado for estado, _ in Product.ESTADO_CHOICES]
+TAMANO_LOTE = 1000
+
+
+def moderar_productos(queryset, nuevo_estado, usuario=None, criterio=None, origen='', tamano_lote=TAMANO_LOTE):
+    """
+    Aplica `nuevo_estado` a los productos del queryset en lotes de `tamano_lote` ids,
+    recorriendo por id ascendente. Devuelve (productos_actualizados, lotes).
+    """
+    if nuevo_estado not in ESTADOS_VALIDOS:
+        raise ValueError(f'Estado inválido: {nuevo_estado}')
+
+    actualizados = 0
+    lotes = 0
+    ultimo_id = 0
+    while True:
+        ids = list(
+            queryset.filter(id__gt=ultimo_id).order_by('id').values_list('id', flat=True)[:tamano_lote]
+        )
+        if not ids:
+            break
+        ultimo_id = ids[-1]
+        with transaction.atomic():
+            cantidad = cambiar_estado_masivo(Product.objects.filter(id__in=ids), nuevo_estado)
+            ModeracionLote.objects.create(
+                usuario=usuario if usuario and usuario.is_authenticated else None,
+                estado_nuevo=nuevo_estado,
+                cantidad=cantidad,
+                productos=ids,
+                criterio=criterio or {},
+                origen=origen,
+            )
+        actualizados += cantidad
+        lotes += 1
+    return actualizados, lotes
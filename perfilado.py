@@ -0,0 +1,215 @@
+"""
+Perfilado de requests en producción con cProfile.
+
+Con PROFILING_ENABLED = False el middleware no se instala (costo cero). Con el perfilado
+activo se perfila un request cuando:
+    - lo pide un usuario staff (sesión o JWT) con el header X-Perfilar: 1, o
+    - su vista tiene una tasa de muestreo en PROFILING_SAMPLE_RATES ({'mis_ventas': 0.01}).
+
+Cada perfil se guarda en PROFILING_DIR como <nombre>.prof (formato de pstats / snakeviz) y
+<nombre>.json (vista, duración y consultas ejecutadas). Se perfila un request a la vez por
+proceso; los que llegan mientras tanto se atienden sin perfilar. Desde Python 3.12 cProfile
+observa todos los hilos, por lo que con workers con hilos el perfil puede incluir otros requests.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+
+HEADER_PERFILAR = 'X-Perfilar'
+HEADER_PERFIL = 'X-Perfil'
+
+MAX_CONSULTAS = 1000
+PATRON_NOMBRE = re.compile(r'^[\w.-]+$')
+PATRON_INVALIDOS = re.compile(r'[^\w.-]')
+
+# Un solo perfil activo por proceso: cProfile no admite perfiladores simultáneos
+_activo = threading.Lock()
+
+
+def _get_directorio():
+    return str(getattr(settings, 'PROFILING_DIR', os.path.join(settings.BASE_DIR, 'perfiles')))
+
+
+def _get_tasas():
+    return getattr(settings, 'PROFILING_SAMPLE_RATES', {})
+
+
+def _get_max_archivos():
+    return getattr(settings, 'PROFILING_MAX_FILES', 200)
+
+
+def _es_staff(request):
+    usuario = getattr(request, 'user', None)
+    if usuario is not None and usuario.is_authenticated and usuario.is_staff:
+        return True
+    # Las vistas de la API autentican por JWT dentro de DRF: se valida el token acá
+    from rest_framework.exceptions import APIException
+    from .autenticacion import JWTCacheAuthentication
+
+    try:
+        resultado = JWTCacheAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return bool(resultado and resultado[0].is_staff)
+
+
+def _motivo(request):
+    """'header' o 'muestreo' si el request se debe perfilar, None si no"""
+    if request.headers.get(HEADER_PERFILAR) == '1' and _es_staff(request):
+        return 'header'
+    tasas = _get_tasas()
+    if tasas and request.resolver_match:
+        vista = request.resolver_match.view_name
+        tasa = tasas.get(vista, tasas.get(vista.rsplit('.', 1)[-1], 0))
+        if tasa and random.random() < tasa:
+            return 'muestreo'
+    return None
+
+
+class Perfil:
+    """cProfile y registro de consultas de un request"""
+
+    def __init__(self, motivo):
+        self.motivo = motivo
+        self.consultas = []
+        self.perfilador = cProfile.Profile()
+        self._envolturas = ExitStack()
+
+    def _registrar_consulta(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.consultas) < MAX_CONSULTAS:
+                self.consultas.append({
+                    'db': context['connection'].alias,
+                    'sql': sql,
+                    'ms': round((time.perf_counter() - inicio) * 1000, 3),
+                })
+
+    def iniciar(self):
+        for alias in connections:
+            self._envolturas.enter_context(connections[alias].execute_wrapper(self._registrar_consulta))
+        self.inicio = time.perf_counter()
+        self.perfilador.enable()
+
+    def terminar(self):
+        self.perfilador.disable()
+        self.duracion = time.perf_counter() - self.inicio
+        self._envolturas.close()
+
+    def guardar(self, request, response):
+        """Escribe el .prof y el .json; devuelve el nombre del perfil"""
+        vista = request.resolver_match.view_name if request.resolver_match else 'sin_ruta'
+        fecha = timezone.now()
+        nombre = f'{fecha:%Y%m%d-%H%M%S}-{PATRON_INVALIDOS.sub("_", vista)}-{os.getpid()}-{random.randrange(16 ** 4):04x}'
+        directorio = _get_directorio()
+        os.makedirs(directorio, exist_ok=True)
+
+        self.perfilador.dump_stats(os.path.join(directorio, f'{nombre}.prof'))
+        usuario = getattr(request, 'user', None)
+        datos = {
+            'nombre': nombre,
+            'fecha': fecha.isoformat(),
+            'vista': vista,
+            'metodo': request.method,
+            'ruta': request.get_full_path(),
+            'estado': response.status_code,
+            'motivo': self.motivo,
+            'usuario': usuario.pk if usuario is not None and usuario.is_authenticated else None,
+            'duracion_ms': round(self.duracion * 1000, 3),
+            'cantidad_consultas': len(self.consultas),
+            'tiempo_consultas_ms': round(sum(consulta['ms'] for consulta in self.consultas), 3),
+            'consultas': self.consultas,
+        }
+        with open(os.path.join(directorio, f'{nombre}.json'), 'w') as archivo:
+            json.dump(datos, archivo, indent=1)
+        _rotar(directorio)
+        return nombre
+
+
+def _rotar(directorio):
+    """Conserva solo los PROFILING_MAX_FILES perfiles más recientes"""
+    perfiles = sorted(archivo[:-5] for archivo in os.listdir(directorio) if archivo.endswith('.json'))
+    for nombre in perfiles[:-_get_max_archivos() or None]:
+        for extension in ('.prof', '.json'):
+            try:
+                os.unlink(os.path.join(directorio, nombre + extension))
+            except FileNotFoundError:
+                pass
+
+
+def listar_perfiles():
+    """Resumen de los perfiles guardados, del más reciente al más viejo"""
+    directorio = _get_directorio()
+    if not os.path.isdir(directorio):
+        return []
+    perfiles = []
+    for archivo in sorted(os.listdir(directorio), reverse=True):
+        if not archivo.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directorio, archivo)) as datos:
+                perfil = json.load(datos)
+        except (OSError, ValueError):
+            continue
+        perfil.pop('consultas', None)
+        perfiles.append(perfil)
+    return perfiles
+
+
+def ruta_perfil(nombre, extension):
+    """Ruta de un archivo de perfil, o None si el nombre no es válido o no existe"""
+    if not PATRON_NOMBRE.match(nombre):
+        return None
+    ruta = os.path.join(_get_directorio(), nombre + extension)
+    return ruta if os.path.isfile(ruta) else None
+
+
+def resumen_texto(nombre, orden='cumulative', limite=60):
+    """Estadísticas de pstats del perfil como texto"""
+    salida = io.StringIO()
+    estadisticas = pstats.Stats(ruta_perfil(nombre, '.prof'), stream=salida)
+    estadisticas.strip_dirs().sort_stats(orden).print_stats(limite)
+    return salida.getvalue()
+
+
+class PerfiladorMiddleware:
+    """Perfila los requests pedidos por header o elegidos por muestreo (PROFILING_ENABLED)"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        perfil = getattr(request, '_perfil', None)
+        if perfil is not None:
+            try:
+                perfil.terminar()
+                response[HEADER_PERFIL] = perfil.guardar(request, response)
+            finally:
+                request._perfil = None
+                _activo.release()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        motivo = _motivo(request)
+        if motivo and _activo.acquire(blocking=False):
+            request._perfil = Perfil(motivo)
+            request._perfil.iniciar()
+        return None
@@ -0,0 +1,67 @@
+"""
+Presupuestos de consultas por vista.
+
+El presupuesto se declara junto a la vista: con @presupuesto_consultas(n) en las vistas de
+función (arriba de @api_view) y en las acciones extra de un ViewSet, o con un diccionario
+por acción en el ViewSet para las acciones heredadas:
+
+    class ProductViewSet(viewsets.ModelViewSet):
+        presupuesto_acciones = {'list': 3, 'retrieve': 4}
+
+El comando check_query_budgets recorre las rutas GET con datos de distintos tamaños y falla
+si una vista pasa su presupuesto o si la cantidad de consultas crece con los datos. Las
+plantillas que no estén instaladas (el frontend y el panel se despliegan aparte) las resuelve
+PlantillasFaltantes, para que las vistas que renderizan HTML también se midan.
+"""
+from django.core.paginator import Page
+from django.db.models.query import QuerySet
+from django.template.backends.base import BaseEngine
+
+
+def presupuesto_consultas(maximo):
+    """Declara la cantidad máxima de consultas de la vista en un GET"""
+    def decorador(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+    return decorador
+
+
+def presupuesto_vista(view_func, metodo='GET'):
+    """Presupuesto declarado para la vista (función, ViewSet o acción del ViewSet), o None"""
+    acciones = getattr(view_func, 'actions', None)
+    if not acciones:
+        return getattr(view_func, 'presupuesto_consultas', None)
+    # ViewSet: el decorador de la acción o el diccionario de la clase
+    clase = view_func.cls
+    accion = acciones.get(metodo.lower())
+    presupuesto = getattr(getattr(clase, accion, None), 'presupuesto_consultas', None) if accion else None
+    if presupuesto is None:
+        presupuesto = getattr(clase, 'presupuesto_acciones', {}).get(accion)
+    return presupuesto
+
+
+class _PlantillaVacia:
+    def render(self, context=None, request=None):
+        # Evalúa los querysets del contexto como lo haría la plantilla al recorrerlos
+        for valor in (context or {}).values():
+            if isinstance(valor, (QuerySet, Page)):
+                list(valor)
+        return ''
+
+
+class PlantillasFaltantes(BaseEngine):
+    """
+    Backend de plantillas para check_query_budgets: cualquier nombre devuelve una plantilla
+    vacía. Va después del backend real, así que solo se usa para las plantillas que faltan
+    """
+
+    def __init__(self, params):
+        params = params.copy()
+        params.pop('OPTIONS', None)
+        super().__init__(params)
+
+    def from_string(self, template_code):
+        return _PlantillaVacia()
+
+    def get_template(self, template_name):
+        return _PlantillaVacia()
@@ -0,0 +1,141 @@
+"""
+Lecturas desde réplicas de la base de datos.
+
+ReplicaMiddleware marca los requests GET/HEAD/OPTIONS como aptos para leer de una réplica y
+EnrutadorReplicas envía esas lecturas a una de las réplicas configuradas (DB_REPLICAS). Todo
+lo demás va a 'default':
+    - requests con otros métodos, código fuera de un request (comandos, shell) y lecturas
+      dentro de una transacción;
+    - el resto de un request después de su primera escritura (read-your-writes);
+    - los requests de un usuario que escribió hace menos de DB_REPLICA_PIN_SECONDS, para no
+      mostrarle datos que la réplica todavía no recibió. Se recuerda por id de usuario en la
+      caché de Django (la fijación sigue al usuario entre dispositivos y, con una caché
+      compartida, entre workers) y con una cookie, que cubre a las sesiones y a los anónimos.
+
+Cada vista puede forzar el destino con los decoradores usar_primaria / usar_replica (en
+funciones, ViewSets o acciones de un ViewSet).
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+COOKIE_PRIMARIA = 'db_primaria'
+
+PRIMARIA = 'primaria'
+REPLICA = 'replica'
+
+# Estado del request actual: None (sin request), REPLICA o PRIMARIA
+_destino = ContextVar('destino_lecturas', default=None)
+
+
+def _get_replicas():
+    return getattr(settings, 'DB_REPLICAS', [])
+
+
+def _get_fijacion():
+    return getattr(settings, 'DB_REPLICA_PIN_SECONDS', 5)
+
+
+def usar_primaria(vista):
+    """Decorador: las lecturas de la vista van siempre a la base primaria"""
+    vista.base_de_datos = PRIMARIA
+    return vista
+
+
+def usar_replica(vista):
+    """Decorador: la vista puede leer de réplicas aunque el cliente haya escrito recientemente"""
+    vista.base_de_datos = REPLICA
+    return vista
+
+
+def fijar_primaria():
+    """Envía a la primaria el resto de las lecturas del request actual"""
+    if _destino.get() is not None:
+        _destino.set(PRIMARIA)
+
+
+def _clave_fijacion(user_id):
+    return f'replicas:primaria:{user_id}'
+
+
+def fijar_usuario(user_id):
+    """Envía a la primaria las lecturas del usuario durante DB_REPLICA_PIN_SECONDS"""
+    cache.set(_clave_fijacion(user_id), True, _get_fijacion())
+
+
+def usuario_autenticado(user_id):
+    """
+    Llamada al autenticar el request (ver autenticacion.py): si el usuario escribió hace poco,
+    el resto de sus lecturas van a la primaria. Solo consulta la caché si iban a una réplica.
+    """
+    if _destino.get() == REPLICA and cache.get(_clave_fijacion(user_id)):
+        _destino.set(PRIMARIA)
+
+
+class EnrutadorReplicas:
+    """Router de Django: lecturas a réplicas según el estado del request, escrituras a 'default'"""
+
+    def db_for_read(self, model, **hints):
+        replicas = _get_replicas()
+        if not replicas or _destino.get() != REPLICA or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        fijar_primaria()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas tienen los mismos datos que la primaria
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _preferencia_vista(view_func, request):
+    """Destino pedido por la vista (función, ViewSet o acción del ViewSet), o None"""
+    preferencia = getattr(view_func, 'base_de_datos', None)
+    clase = getattr(view_func, 'cls', None)
+    if clase is not None:
+        acciones = getattr(view_func, 'actions', None) or {}
+        accion = acciones.get(request.method.lower())
+        metodo = getattr(clase, accion, None) if accion else None
+        preferencia = getattr(metodo, 'base_de_datos', None) or getattr(clase, 'base_de_datos', preferencia)
+    return preferencia
+
+
+class ReplicaMiddleware:
+    """Decide si las lecturas de cada request pueden ir a una réplica"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        seguro = request.method in METODOS_SEGUROS and not request.COOKIES.get(COOKIE_PRIMARIA)
+        token = _destino.set(REPLICA if seguro else PRIMARIA)
+        try:
+            response = self.get_response(request)
+        finally:
+            _destino.reset(token)
+        if request.method not in METODOS_SEGUROS and _get_fijacion():
+            # Read-your-writes entre requests mientras la réplica se pone al día. DRF deja el
+            # usuario del token en el request de Django, así que también se fija a los usuarios JWT
+            usuario = getattr(request, 'user', None)
+            if usuario is not None and usuario.is_authenticated:
+                fijar_usuario(usuario.pk)
+            response.set_cookie(COOKIE_PRIMARIA, '1', max_age=_get_fijacion(), httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        preferencia = _preferencia_vista(view_func, request)
+        if preferencia == PRIMARIA:
+            _destino.set(PRIMARIA)
+        elif preferencia == REPLICA and request.method in METODOS_SEGUROS:
+            _destino.set(REPLICA)
+        return None
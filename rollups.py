@@ -0,0 +1,221 @@
+"""
+Tablas de resumen diario (rollups) para las estadísticas del panel de administración.
+
+Los resúmenes se mantienen de forma incremental a partir de los cambios de productos
+(ver signals.py) y se pueden reconstruir por completo con el comando rebuild_rollups.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum, F, Value, DecimalField
+from django.db.models.functions import TruncDate, Coalesce
+from django.utils import timezone
+
+from .models import Product, Comision, ResumenDiarioCategoria, ResumenDiarioVendedor
+from .metricas import productos_con_comision
+from .invalidacion import invalidar_claves
+from . import categorias
+
+
+CAMPOS_RESUMEN = ('fecha_publicacion', 'categoria', 'estado', 'precio')
+
+COMISIONES_CACHE_KEY = 'rollups:comisiones'
+COMISIONES_CACHE_TTL = 60 * 5
+
+
+def clave_resumen(producto, base=None):
+    """
+    Datos del producto que determinan su fila de resumen. Los campos diferidos se toman
+    de `base` (no se fuerza su carga); si no hay base y falta alguno, devuelve None.
+    """
+    valores = producto.__dict__
+    if any(campo not in valores for campo in CAMPOS_RESUMEN):
+        if base is None:
+            return None
+        return tuple(valores.get(campo, base[i]) for i, campo in enumerate(CAMPOS_RESUMEN))
+    return tuple(valores[campo] for campo in CAMPOS_RESUMEN)
+
+
+def _fecha(fecha_publicacion):
+    return timezone.localdate(fecha_publicacion) if fecha_publicacion else timezone.localdate()
+
+
+def porcentajes_comision():
+    """
+    {categoría: porcentaje} de las comisiones activas, cacheado (signals.py lo invalida). Solo
+    para lecturas: la caché puede estar atrasada en otros procesos, así que los resúmenes toman
+    el porcentaje de la base
+    """
+    return cache.get_or_set(
+        COMISIONES_CACHE_KEY,
+        lambda: dict(Comision.objects.filter(activa=True).values_list('categoria', 'porcentaje')),
+        COMISIONES_CACHE_TTL,
+    )
+
+
+def invalidar_comisiones():
+    invalidar_claves(COMISIONES_CACHE_KEY)
+
+
+def _porcentaje(categoria):
+    porcentaje = Comision.objects.filter(categoria=categoria, activa=True).values_list('porcentaje', flat=True).first()
+    return porcentaje or Decimal('0')
+
+
+def aplicar_delta(fecha, categoria, estado, cantidad, valor, porcentaje=None):
+    """
+    Suma (o resta) cantidad y valor en la fila de resumen de (fecha, categoría, estado) y, si
+    el estado es Activo, en el contador de productos activos de la categoría
+    """
+    if not cantidad and not valor:
+        return
+    if porcentaje is None:
+        porcentaje = _porcentaje(categoria)
+    valor = Decimal(str(valor or 0))
+    ResumenDiarioCategoria.objects.get_or_create(fecha=fecha, categoria=categoria, estado=estado)
+    ResumenDiarioCategoria.objects.filter(fecha=fecha, categoria=categoria, estado=estado).update(
+        cantidad=F('cantidad') + cantidad,
+        valor=F('valor') + valor,
+        comision=F('comision') + valor * porcentaje / 100,
+    )
+    if estado == 'Activo':
+        categorias.sumar_activos(categoria, cantidad)
+
+
+def aplicar_publicaciones(fecha, vendedor_id, cantidad):
+    """Suma (o resta) publicaciones en el resumen diario del vendedor"""
+    if cantidad > 0:
+        # Al restar no se crea la fila: el vendedor puede estar eliminándose en cascada
+        ResumenDiarioVendedor.objects.get_or_create(fecha=fecha, vendedor_id=vendedor_id)
+    ResumenDiarioVendedor.objects.filter(fecha=fecha, vendedor_id=vendedor_id).update(
+        publicaciones=F('publicaciones') + cantidad
+    )
+
+
+def producto_guardado(producto, original, creado):
+    """Actualiza los resúmenes tras guardar un producto. Devuelve la nueva clave de resumen"""
+    nueva = clave_resumen(producto, original)
+    if nueva is None:
+        return None
+    if creado:
+        aplicar_delta(_fecha(nueva[0]), nueva[1], nueva[2], 1, nueva[3])
+        aplicar_publicaciones(_fecha(nueva[0]), producto.vendedor_id, 1)
+        return nueva
+    if original is None or original == nueva:
+        return nueva
+    aplicar_delta(_fecha(original[0]), original[1], original[2], -1, -Decimal(str(original[3] or 0)))
+    aplicar_delta(_fecha(nueva[0]), nueva[1], nueva[2], 1, nueva[3])
+    return nueva
+
+
+def producto_eliminado(producto, original):
+    """Descuenta un producto eliminado de la base de datos"""
+    clave = original or clave_resumen(producto)
+    if clave is None:
+        return
+    aplicar_delta(_fecha(clave[0]), clave[1], clave[2], -1, -Decimal(str(clave[3] or 0)))
+    aplicar_publicaciones(_fecha(clave[0]), producto.vendedor_id, -1)
+
+
+def productos_creados(productos):
+    """Suma a los resúmenes productos insertados con bulk_create (que no dispara señales)"""
+    por_categoria = {}
+    por_vendedor = {}
+    for producto in productos:
+        fecha = _fecha(producto.fecha_publicacion)
+        clave = (fecha, producto.categoria, producto.estado)
+        cantidad, valor = por_categoria.get(clave, (0, Decimal('0')))
+        por_categoria[clave] = (cantidad + 1, valor + Decimal(str(producto.precio or 0)))
+        clave = (fecha, producto.vendedor_id)
+        por_vendedor[clave] = por_vendedor.get(clave, 0) + 1
+
+    porcentajes = dict(
+        Comision.objects.filter(activa=True, categoria__in={c for _, c, _ in por_categoria})
+        .values_list('categoria', 'porcentaje')
+    )
+    for (fecha, categoria, estado), (cantidad, valor) in por_categoria.items():
+        aplicar_delta(fecha, categoria, estado, cantidad, valor, porcentajes.get(categoria, Decimal('0')))
+    for (fecha, vendedor_id), cantidad in por_vendedor.items():
+        aplicar_publicaciones(fecha, vendedor_id, cantidad)
+
+
+def cambiar_estado_masivo(queryset, nuevo_estado):
+    """
+    Actualiza el estado de un queryset de productos con UPDATE y ajusta los resúmenes
+    agrupando el cambio por (fecha, categoría, estado). Devuelve la cantidad de filas actualizadas.
+    """
+    with transaction.atomic():
+        grupos = list(
+            queryset.exclude(estado=nuevo_estado).annotate(fecha=TruncDate('fecha_publicacion'))
+            .values('fecha', 'categoria', 'estado')
+            .annotate(cantidad=Count('id'), valor=Sum('precio'))
+            .order_by()
+        )
+        actualizados = queryset.update(estado=nuevo_estado)
+        porcentajes = dict(
+            Comision.objects.filter(activa=True, categoria__in={g['categoria'] for g in grupos})
+            .values_list('categoria', 'porcentaje')
+        )
+        for grupo in grupos:
+            porcentaje = porcentajes.get(grupo['categoria'], Decimal('0'))
+            aplicar_delta(grupo['fecha'], grupo['categoria'], grupo['estado'],
+                          -grupo['cantidad'], -grupo['valor'], porcentaje)
+            aplicar_delta(grupo['fecha'], grupo['categoria'], nuevo_estado,
+                          grupo['cantidad'], grupo['valor'], porcentaje)
+    return actualizados
+
+
+def recalcular_comision_categoria(categoria):
+    """Recalcula la comisión guardada de una categoría cuando cambia su porcentaje"""
+    factor = _porcentaje(categoria) / 100
+    ResumenDiarioCategoria.objects.filter(categoria=categoria).update(
+        comision=F('valor') * factor
+    )
+
+
+@transaction.atomic
+def reconstruir_resumenes(batch_size=5000):
+    """Reconstruye todos los resúmenes (y los contadores de categorías) desde la tabla de productos"""
+    ResumenDiarioCategoria.objects.all().delete()
+    ResumenDiarioVendedor.objects.all().delete()
+
+    por_categoria = (
+        productos_con_comision()
+        .annotate(fecha=TruncDate('fecha_publicacion'))
+        .values('fecha', 'categoria', 'estado')
+        .annotate(
+            cantidad=Count('id'),
+            valor_total=Sum('precio'),
+            comision_total=Coalesce(Sum('comision_importe'), Value(0),
+                                    output_field=DecimalField(max_digits=16, decimal_places=4)),
+        )
+        .order_by()
+    )
+    ResumenDiarioCategoria.objects.bulk_create(
+        (
+            ResumenDiarioCategoria(
+                fecha=fila['fecha'], categoria=fila['categoria'], estado=fila['estado'],
+                cantidad=fila['cantidad'], valor=fila['valor_total'], comision=fila['comision_total'],
+            )
+            for fila in por_categoria.iterator(chunk_size=batch_size)
+        ),
+        batch_size=batch_size,
+    )
+
+    por_vendedor = (
+        Product.objects.annotate(fecha=TruncDate('fecha_publicacion'))
+        .values('fecha', 'vendedor_id')
+        .annotate(publicaciones=Count('id'))
+        .order_by()
+    )
+    ResumenDiarioVendedor.objects.bulk_create(
+        (
+            ResumenDiarioVendedor(fecha=fila['fecha'], vendedor_id=fila['vendedor_id'],
+                                  publicaciones=fila['publicaciones'])
+            for fila in por_vendedor.iterator(chunk_size=batch_size)
+        ),
+        batch_size=batch_size,
+    )
+    categorias.recalcular_contadores()
+    return ResumenDiarioCategoria.objects.count(), ResumenDiarioVendedor.objects.count()
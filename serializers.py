@@ -4,6 +4,7 @@ from .models import (
     User, Product, ProductImage, Order, Rating, Question, Offer, Message,
     Carrier, Shipment, TrackingEvent
 )
+from .imagenes import url_variante, srcset
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -51,6 +52,7 @@ class UserSerializer(serializers.ModelSerializer):
     is_staff = serializers.SerializerMethodField()
     reputacion = serializers.SerializerMethodField()
     total_calificaciones = serializers.SerializerMethodField()
+    banner_srcset = serializers.SerializerMethodField()
     
     def get_is_superuser(self, obj):
         return bool(obj.is_superuser)
@@ -64,6 +66,9 @@ class UserSerializer(serializers.ModelSerializer):
     def get_total_calificaciones(self, obj):
         return obj.total_calificaciones()
     
+    def get_banner_srcset(self, obj):
+        return srcset(obj.banner_variantes, request=self.context.get('request')) or None
+    
     class Meta:
         model = User
         fields = (
@@ -72,19 +77,44 @@ class UserSerializer(serializers.ModelSerializer):
             'mercadopago_activa', 'mercadopago_cuenta',
             'lemon_activa', 'lemon_cuenta',
             'brubank_activa', 'brubank_cuenta',
-            'nombre_tienda', 'banner_imagen',
+            'nombre_tienda', 'banner_imagen', 'banner_srcset',
             'is_superuser', 'is_staff', 'reputacion', 'total_calificaciones',
         )
         read_only_fields = (
             'id', 'fecha_creacion', 'is_superuser', 'is_staff',
-            'reputacion', 'total_calificaciones',
+            'reputacion', 'total_calificaciones', 'banner_srcset',
         )
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+    srcset_jpeg = serializers.SerializerMethodField()
+    
+    def get_srcset(self, obj):
+        return srcset(obj.variantes, 'webp', self.context.get('request')) or None
+    
+    def get_srcset_jpeg(self, obj):
+        return srcset(obj.variantes, 'jpeg', self.context.get('request')) or None
+    
     class Meta:
         model = ProductImage
-        fields = ('id', 'imagen', 'fecha_subida')
+        fields = ('id', 'imagen', 'srcset', 'srcset_jpeg', 'fecha_subida')
+
+
+class ProductImageListSerializer(ProductImageSerializer):
+    """Imagen para listados: 'imagen' apunta a la variante de tarjeta y 'original' al archivo subido"""
+    imagen = serializers.SerializerMethodField()
+    original = serializers.ImageField(source='imagen', read_only=True)
+    
+    def get_imagen(self, obj):
+        request = self.context.get('request')
+        url = url_variante(obj.variantes, 'tarjeta', 'jpeg', request)
+        if url is None and obj.imagen:
+            url = request.build_absolute_uri(obj.imagen.url) if request else obj.imagen.url
+        return url
+    
+    class Meta(ProductImageSerializer.Meta):
+        fields = ('id', 'imagen', 'original', 'srcset', 'srcset_jpeg', 'fecha_subida')
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -114,7 +144,7 @@ class ProductSerializer(serializers.ModelSerializer):
 class ProductListSerializer(serializers.ModelSerializer):
     """Serializer simplificado para listar productos"""
     vendedor_nombre = serializers.CharField(source='vendedor.nombre', read_only=True)
-    imagenes = ProductImageSerializer(many=True, read_only=True)
+    imagenes = ProductImageListSerializer(many=True, read_only=True)
     
     class Meta:
         model = Product
@@ -0,0 +1,169 @@
+"""
+Series temporales para estadísticas (productos, órdenes e ingresos) agrupadas por día,
+semana o mes con TruncDay/TruncWeek/TruncMonth, compatibles con SQLite y PostgreSQL.
+
+Los períodos ya cerrados se guardan en caché individualmente; en cada consulta solo se
+recalcula el período abierto (el que contiene el momento actual) y los que falten en caché.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum, Q
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from django.utils import timezone
+
+from .models import Product, Order
+
+
+GRANULARIDADES = {
+    'dia': TruncDay,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+
+METRICAS = {
+    'productos': {
+        'modelo': Product,
+        'campo_fecha': 'fecha_publicacion',
+        'agregado': Count('id'),
+        'filtro': Q(),
+    },
+    'ordenes': {
+        'modelo': Order,
+        'campo_fecha': 'fecha_creacion',
+        'agregado': Count('id'),
+        'filtro': Q(),
+    },
+    'ingresos': {
+        'modelo': Order,
+        'campo_fecha': 'fecha_creacion',
+        'agregado': Sum('precio_total'),
+        'filtro': ~Q(estado__in=['Cancelada', 'Rechazada']),
+    },
+}
+
+
+def _get_cache_ttl():
+    return getattr(settings, 'SERIES_CACHE_TTL', 60 * 60 * 24)
+
+
+def _get_max_periodos():
+    return getattr(settings, 'SERIES_MAX_PERIODS', 1000)
+
+
+def _cantidad_periodos(desde, hasta, granularidad):
+    if granularidad == 'semana':
+        return (hasta - inicio_periodo(desde, granularidad)).days // 7 + 1
+    if granularidad == 'mes':
+        return (hasta.year - desde.year) * 12 + hasta.month - desde.month + 1
+    return (hasta - desde).days + 1
+
+
+def inicio_periodo(fecha, granularidad):
+    """Primer día del período (día, semana ISO o mes) que contiene a `fecha`"""
+    if granularidad == 'semana':
+        return fecha - datetime.timedelta(days=fecha.weekday())
+    if granularidad == 'mes':
+        return fecha.replace(day=1)
+    return fecha
+
+
+def siguiente_periodo(inicio, granularidad):
+    if granularidad == 'semana':
+        return inicio + datetime.timedelta(days=7)
+    if granularidad == 'mes':
+        return (inicio.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return inicio + datetime.timedelta(days=1)
+
+
+def _inicio_datetime(fecha):
+    return timezone.make_aware(datetime.datetime.combine(fecha, datetime.time.min))
+
+
+def _clave_cache(metrica, granularidad, inicio):
+    return f'series:{metrica}:{granularidad}:{inicio.isoformat()}'
+
+
+def _consultar(metrica, granularidad, desde, hasta):
+    """Valores por período entre las fechas `desde` (incluida) y `hasta` (excluida)"""
+    definicion = METRICAS[metrica]
+    campo = definicion['campo_fecha']
+    filas = (
+        definicion['modelo'].objects.filter(definicion['filtro'])
+        .filter(**{f'{campo}__gte': _inicio_datetime(desde), f'{campo}__lt': _inicio_datetime(hasta)})
+        .annotate(periodo=GRANULARIDADES[granularidad](campo))
+        .values('periodo')
+        .annotate(total=definicion['agregado'])
+        .order_by()
+    )
+    resultado = {}
+    for fila in filas:
+        periodo = fila['periodo']
+        if isinstance(periodo, datetime.datetime):
+            periodo = timezone.localtime(periodo).date() if timezone.is_aware(periodo) else periodo.date()
+        resultado[periodo] = fila['total'] or 0
+    return resultado
+
+
+def serie(metrica, granularidad='mes', desde=None, hasta=None):
+    """
+    Devuelve [{'periodo': date, 'total': valor}, ...] con un elemento por período entre
+    `desde` y `hasta` (fechas locales, ambas incluidas), completando con 0 los vacíos.
+    El rango se extiende hasta los bordes de los períodos; las fechas futuras se llevan a hoy
+    y un rango de más de SERIES_MAX_PERIODS períodos es un ValueError.
+    """
+    if metrica not in METRICAS:
+        raise ValueError(f'Métrica inválida: {metrica}')
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f'Granularidad inválida: {granularidad}')
+
+    hoy = timezone.localdate()
+    if desde and hasta and desde > hasta:
+        raise ValueError('La fecha inicial no puede ser posterior a la final')
+    # Los períodos futuros valen 0: no se recorren (y no se llega al límite de date)
+    hasta = min(hasta or hoy, hoy)
+    desde = min(desde or hasta, hasta)
+    if _cantidad_periodos(desde, hasta, granularidad) > _get_max_periodos():
+        raise ValueError(f'El rango no puede superar los {_get_max_periodos()} períodos')
+
+    periodos = []
+    inicio = inicio_periodo(desde, granularidad)
+    while inicio <= hasta:
+        periodos.append(inicio)
+        inicio = siguiente_periodo(inicio, granularidad)
+    abierto = inicio_periodo(hoy, granularidad)
+
+    cerrados = [p for p in periodos if p < abierto]
+    claves = {p: _clave_cache(metrica, granularidad, p) for p in cerrados}
+    en_cache = cache.get_many(claves.values())
+    valores = {p: en_cache[clave] for p, clave in claves.items() if clave in en_cache}
+
+    faltantes = [p for p in cerrados if p not in valores]
+    if faltantes:
+        calculados = _consultar(metrica, granularidad, faltantes[0],
+                                siguiente_periodo(faltantes[-1], granularidad))
+        nuevos = {p: calculados.get(p, 0) for p in faltantes}
+        cache.set_many({claves[p]: valor for p, valor in nuevos.items()}, _get_cache_ttl())
+        valores.update(nuevos)
+
+    abiertos = [p for p in periodos if p >= abierto]
+    if abiertos:
+        calculados = _consultar(metrica, granularidad, abiertos[0],
+                                siguiente_periodo(abiertos[-1], granularidad))
+        valores.update({p: calculados.get(p, 0) for p in abiertos})
+
+    return [{'periodo': p, 'total': valores[p]} for p in periodos]
+
+
+def invalidar(metrica, fecha):
+    """Descarta de la caché los períodos que contienen `fecha` (p. ej. al borrar o cancelar)"""
+    if not fecha:
+        return
+    if isinstance(fecha, datetime.datetime):
+        fecha = timezone.localdate(fecha)
+    cache.delete_many([
+        _clave_cache(metrica, granularidad, inicio_periodo(fecha, granularidad))
+        for granularidad in GRANULARIDADES
+    ])
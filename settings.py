@@ -4,7 +4,8 @@ Django settings for mandale project.
 
 from pathlib import Path
 from datetime import timedelta
-from decouple import config
+from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,6 +40,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentacion.MetricasMiddleware',
+    'api.consultas_lentas.ConsultasLentasMiddleware',
+    'api.memoria.MemoriaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -47,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.perfilado.PerfiladorMiddleware',
 ]
 
 ROOT_URLCONF = 'mandale_project.urls'
@@ -73,12 +78,74 @@ WSGI_APPLICATION = 'mandale_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Perfiles: 'desarrollo' (SQLite simple), 'sqlite' (SQLite de producción: WAL, busy_timeout,
+# BEGIN IMMEDIATE y conexiones persistentes) o 'postgres' (PostgreSQL, normalmente detrás de PgBouncer)
+DB_PROFILE = config('DB_PROFILE', default='desarrollo')
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='mandale_db'),
+            'USER': config('DB_USER', default='mandale_user'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            # PgBouncer en modo transaction no admite cursores del lado del servidor. Sin ellos,
+            # .iterator(chunk_size=...) trae el resultado completo a memoria: las exportaciones
+            # y reconstrucciones grandes dejan de ir por chunks
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER', default=False, cast=bool),
+            'OPTIONS': {
+                'connect_timeout': 10,
+            },
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+    if DB_PROFILE == 'sqlite':
+        DATABASES['default'].update({
+            'ENGINE': 'api.backends.sqlite',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'timeout': 20},
+        })
+
+# PRAGMAs que se aplican a cada conexión SQLite nueva (ver basedatos.py)
+SQLITE_PRAGMAS_PRODUCCION = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+    'mmap_size': 128 * 1024 * 1024,
 }
+SQLITE_PRAGMAS = SQLITE_PRAGMAS_PRODUCCION if DB_PROFILE == 'sqlite' else {}
+
+# Réplicas de lectura (ver replicas.py): hosts de PostgreSQL separados por coma o, para probar
+# localmente, un archivo SQLite que hace de réplica (se copia con: python manage.py sync_sqlite_replica)
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='', cast=Csv())
+DB_REPLICA_SQLITE = config('DB_REPLICA_SQLITE', default='')
+# Segundos que las lecturas de un usuario van a la primaria después de que escribió (por id de
+# usuario en la caché, que conviene compartir entre workers, y por cookie)
+DB_REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=5, cast=int)
+
+for numero, host in enumerate(DB_REPLICA_HOSTS, start=1):
+    DATABASES[f'replica{numero}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+if DB_REPLICA_SQLITE:
+    DATABASES['replica_local'] = {**DATABASES['default'], 'NAME': DB_REPLICA_SQLITE, 'TEST': {'MIRROR': 'default'}}
+
+DB_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+if DB_REPLICAS:
+    DATABASE_ROUTERS = ['api.replicas.EnrutadorReplicas']
+    MIDDLEWARE.append('api.replicas.ReplicaMiddleware')
 
 
 # Password validation
@@ -122,12 +189,44 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Entrega de media: 'nginx' (X-Accel-Redirect), 'sendfile' (X-Sendfile) o '' para servir desde Django
+MEDIA_ACCEL_MODE = config('MEDIA_ACCEL_MODE', default='')
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+
 # Shipping / Logística
 SHIPPING_PROVIDER = config('SHIPPING_PROVIDER', default='stub')
 SHIPPING_API_KEY = config('SHIPPING_API_KEY', default='')
 SHIPPING_WEBHOOK_SECRET = config('SHIPPING_WEBHOOK_SECRET', default='')
 SHIPPING_ORIGIN_CP = config('SHIPPING_ORIGIN_CP', default='1000')
 
+# Idempotencia (header Idempotency-Key en órdenes, pagos y envíos)
+IDEMPOTENCY_KEY_TTL = timedelta(hours=config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int))
+IDEMPOTENCY_WAIT_TIMEOUT = config('IDEMPOTENCY_WAIT_TIMEOUT', default=10, cast=int)
+# Segundos tras los cuales una clave 'En proceso' se considera abandonada (el worker murió) y
+# otro request puede tomarla; debe superar la duración del request más lento
+IDEMPOTENCY_LEASE_SECONDS = config('IDEMPOTENCY_LEASE_SECONDS', default=60, cast=int)
+
+# Estadísticas: TTL de la caché de períodos cerrados de las series temporales (segundos)
+SERIES_CACHE_TTL = config('SERIES_CACHE_TTL', default=60 * 60 * 24, cast=int)
+# Máximo de períodos por consulta (1000 días, semanas o meses)
+SERIES_MAX_PERIODS = config('SERIES_MAX_PERIODS', default=1000, cast=int)
+
+# Importación masiva de productos: tamaño máximo del archivo de datos, del .zip de imágenes
+# y de cada imagen (bytes), y cantidad máxima de filas por archivo
+IMPORT_MAX_FILE_BYTES = config('IMPORT_MAX_FILE_BYTES', default=20 * 1024 * 1024, cast=int)
+IMPORT_MAX_ZIP_BYTES = config('IMPORT_MAX_ZIP_BYTES', default=200 * 1024 * 1024, cast=int)
+IMPORT_MAX_IMAGE_BYTES = config('IMPORT_MAX_IMAGE_BYTES', default=10 * 1024 * 1024, cast=int)
+IMPORT_MAX_ROWS = config('IMPORT_MAX_ROWS', default=50000, cast=int)
+
+# Imágenes: procesos que generan las variantes redimensionadas (0 = en línea, dentro del request)
+IMAGE_DERIVATIVES_WORKERS = config('IMAGE_DERIVATIVES_WORKERS', default=2, cast=int)
+
+# Imágenes de productos deduplicadas: horas que se conserva un archivo sin referencias antes de borrarlo
+MEDIA_ORPHAN_GRACE_HOURS = config('MEDIA_ORPHAN_GRACE_HOURS', default=24, cast=int)
+
+# Subidas mayores a este tamaño (bytes) se escriben a un archivo temporal en lugar de quedar en memoria
+FILE_UPLOAD_MAX_MEMORY_SIZE = config('FILE_UPLOAD_MAX_MEMORY_SIZE', default=256 * 1024, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -139,7 +238,7 @@ AUTH_USER_MODEL = 'api.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.autenticacion.JWTCacheAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -156,6 +255,71 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Segundos que cada worker conserva en memoria el usuario autenticado por JWT
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60, cast=int)
+
+# Límite de intentos fallidos de login (ventana deslizante en segundos, por IP y por cuenta)
+LOGIN_THROTTLE_BACKEND = config('LOGIN_THROTTLE_BACKEND', default='mixto')  # memoria, cache o mixto
+LOGIN_THROTTLE_WINDOW = config('LOGIN_THROTTLE_WINDOW', default=900, cast=int)
+LOGIN_THROTTLE_IP_LIMIT = config('LOGIN_THROTTLE_IP_LIMIT', default=20, cast=int)
+LOGIN_THROTTLE_ACCOUNT_LIMIT = config('LOGIN_THROTTLE_ACCOUNT_LIMIT', default=10, cast=int)
+# Proxies delante de la aplicación (para tomar la IP del cliente de X-Forwarded-For)
+TRUSTED_PROXY_COUNT = config('TRUSTED_PROXY_COUNT', default=0, cast=int)
+
+# Métricas por vista (ver instrumentacion.py): /metrics en formato Prometheus y header Server-Timing
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# Header Server-Timing (tiempos y consultas a la base): 'todos', 'staff' o 'no'
+METRICS_SERVER_TIMING = config('METRICS_SERVER_TIMING', default='todos' if DEBUG else 'staff')
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1', cast=Csv())
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Con gunicorn: directorio donde cada worker vuelca sus métricas para sumarlas en /metrics
+METRICS_MULTIPROC_DIR = config('METRICS_MULTIPROC_DIR', default='')
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=5, cast=int)
+
+# Registro de consultas lentas y repetidas por request (ver consultas_lentas.py); apagado por defecto
+SLOW_QUERY_ENABLED = config('SLOW_QUERY_ENABLED', default=False, cast=bool)
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=100, cast=int)
+SLOW_QUERY_REPEAT_THRESHOLD = config('SLOW_QUERY_REPEAT_THRESHOLD', default=10, cast=int)
+SLOW_QUERY_LOG_FILE = config('SLOW_QUERY_LOG_FILE', default='')
+
+# Perfilado de requests (ver perfilado.py): header X-Perfilar: 1 para staff o muestreo por vista,
+# por ejemplo PROFILING_SAMPLE_RATES=mis_ventas:0.01,admin_panel:0.05
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+
+
+def _tasas_de_muestreo(valor):
+    tasas = {}
+    for entrada in Csv()(valor):
+        vista, _, tasa = entrada.partition(':')
+        try:
+            tasas[vista.strip()] = float(tasa)
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"PROFILING_SAMPLE_RATES: '{entrada}' no tiene la forma vista:tasa (por ejemplo mis_ventas:0.01)"
+            ) from None
+    return tasas
+
+
+PROFILING_SAMPLE_RATES = config('PROFILING_SAMPLE_RATES', default='', cast=_tasas_de_muestreo)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'perfiles'))
+PROFILING_MAX_FILES = config('PROFILING_MAX_FILES', default=200, cast=int)
+
+# Perfilado de memoria por request con tracemalloc (ver memoria.py): pico en /metrics y alarma
+# con los sitios que más memoria retienen cuando un request supera MEMORY_BUDGET_MB
+MEMORY_PROFILING_ENABLED = config('MEMORY_PROFILING_ENABLED', default=False, cast=bool)
+MEMORY_PROFILING_SAMPLE_RATE = config('MEMORY_PROFILING_SAMPLE_RATE', default=1.0, cast=float)
+MEMORY_BUDGET_MB = config('MEMORY_BUDGET_MB', default=64, cast=int)
+MEMORY_PROFILING_TOP = config('MEMORY_PROFILING_TOP', default=10, cast=int)
+MEMORY_PROFILING_FRAMES = config('MEMORY_PROFILING_FRAMES', default=15, cast=int)
+MEMORY_PROFILING_LOG_FILE = config('MEMORY_PROFILING_LOG_FILE', default='')
+
+# Arranque de workers (ver arranque.py): precarga de módulos y calentamiento de cachés y conexiones.
+# Con WORKER_PRELOAD (gunicorn --preload) el calentamiento queda para post_worker_init.
+# Las conexiones a la base solo se abren de antemano desde post_worker_init con workers sync de
+# gunicorn; al importar la aplicación (y siempre con uvicorn/ASGI) solo se calientan las cachés
+WORKER_WARMUP = config('WORKER_WARMUP', default=True, cast=bool)
+WORKER_PRELOAD = config('WORKER_PRELOAD', default=False, cast=bool)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -0,0 +1,177 @@
+"""
+Señales que mantienen actualizados los resúmenes diarios (rollups), la caché de series,
+las referencias a categorías, las imágenes y las cachés de autenticación, comisiones,
+categorías y proveedores logísticos, y que configuran las conexiones a la base de datos
+"""
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Carrier, Categoria, Product, Comision, Order, ProductImage, User
+from . import rollups, series, imagenes, almacenamiento, autenticacion, basedatos, categorias
+
+
+@receiver(post_init, sender=Product)
+def guardar_estado_original_producto(sender, instance, **kwargs):
+    # Se guarda sin consultas extra para poder calcular el delta al guardar
+    instance._resumen_original = rollups.clave_resumen(instance) if instance.pk else None
+
+
+@receiver(pre_save, sender=Product)
+def cargar_estado_original_producto(sender, instance, raw=False, **kwargs):
+    # Solo consulta si el producto se cargó con campos diferidos (.only/.defer)
+    if raw or not instance.pk or getattr(instance, '_resumen_original', None) is not None:
+        return
+    original = sender.objects.filter(pk=instance.pk).values_list(*rollups.CAMPOS_RESUMEN).first()
+    instance._resumen_original = tuple(original) if original else None
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Comision)
+def asignar_categoria(sender, instance, raw=False, update_fields=None, **kwargs):
+    # La referencia sigue al nombre mientras conviven los dos campos (ver categorias.py). Un
+    # save(update_fields=...) que cambia la categoría debe incluir categoria_ref
+    if raw or 'categoria' not in instance.__dict__:
+        return
+    if update_fields is not None and not {'categoria_ref', 'categoria_ref_id'} & set(update_fields):
+        return
+    if instance.categoria_ref_id is not None and instance.categoria == _categoria_original(instance):
+        # Solo se busca el id (una consulta) si el nombre cambió
+        return
+    instance.categoria_ref_id = categorias.id_categoria(instance.categoria)
+
+
+def _categoria_original(instance):
+    """Nombre de la categoría con el que se cargó la instancia (None si es nueva)"""
+    if isinstance(instance, Comision):
+        return getattr(instance, '_categoria_original', None)
+    original = getattr(instance, '_resumen_original', None)
+    return original[rollups.CAMPOS_RESUMEN.index('categoria')] if original else None
+
+
+@receiver(post_save, sender=Product)
+def actualizar_resumen_producto(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    instance._resumen_original = rollups.producto_guardado(
+        instance, getattr(instance, '_resumen_original', None), created
+    )
+
+
+@receiver(post_delete, sender=Product)
+def descontar_resumen_producto(sender, instance, **kwargs):
+    rollups.producto_eliminado(instance, getattr(instance, '_resumen_original', None))
+    series.invalidar('productos', instance.fecha_publicacion)
+
+
+@receiver(post_init, sender=Comision)
+def guardar_categoria_original_comision(sender, instance, **kwargs):
+    instance._categoria_original = instance.categoria if instance.pk else None
+
+
+@receiver(post_save, sender=Comision)
+@receiver(post_delete, sender=Comision)
+def actualizar_comision_resumen(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    rollups.invalidar_comisiones()
+    rollups.recalcular_comision_categoria(instance.categoria)
+    original = getattr(instance, '_categoria_original', None)
+    if original and original != instance.categoria:
+        rollups.recalcular_comision_categoria(original)
+    instance._categoria_original = instance.categoria
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_cache_categorias(sender, **kwargs):
+    if not kwargs.get('raw'):
+        categorias.invalidar()
+
+
+@receiver(post_save, sender=Carrier)
+@receiver(post_delete, sender=Carrier)
+def invalidar_cache_carriers(sender, **kwargs):
+    from .views import invalidar_carriers
+    invalidar_carriers()
+
+
+@receiver(post_save, sender=Order)
+def invalidar_series_orden(sender, instance, created, **kwargs):
+    # Un cambio de estado (p. ej. cancelación) altera los ingresos de un período ya cerrado
+    if not created:
+        series.invalidar('ingresos', instance.fecha_creacion)
+
+
+@receiver(post_delete, sender=Order)
+def invalidar_series_orden_eliminada(sender, instance, **kwargs):
+    series.invalidar('ordenes', instance.fecha_creacion)
+    series.invalidar('ingresos', instance.fecha_creacion)
+
+
+@receiver(post_init, sender=ProductImage)
+def guardar_imagen_original(sender, instance, **kwargs):
+    original = instance.__dict__.get('imagen')
+    instance._imagen_original = (getattr(original, 'name', original) or '') if instance.pk else ''
+
+
+@receiver(post_save, sender=ProductImage)
+def actualizar_imagen_producto(sender, instance, created, raw=False, **kwargs):
+    if raw or 'imagen' not in instance.__dict__:
+        return
+    nombre = instance.imagen.name or ''
+    if nombre != instance._imagen_original:
+        # Referencias del almacenamiento deduplicado y variantes del nuevo archivo
+        almacenamiento.sumar_referencias(instance._imagen_original, -1)
+        almacenamiento.sumar_referencias(nombre, 1)
+        imagenes.encolar('producto', nombre)
+    instance._imagen_original = nombre
+
+
+@receiver(post_delete, sender=ProductImage)
+def liberar_imagen_producto(sender, instance, **kwargs):
+    almacenamiento.sumar_referencias(instance._imagen_original or instance.imagen.name, -1)
+
+
+def _nombre_banner(instance):
+    return getattr(instance.banner_imagen, 'name', None) or ''
+
+
+@receiver(post_init, sender=User)
+def guardar_banner_original(sender, instance, **kwargs):
+    # Sin forzar la carga si el campo está diferido
+    original = instance.__dict__.get('banner_imagen')
+    instance._banner_original = getattr(original, 'name', original) or ''
+
+
+@receiver(pre_save, sender=User)
+def descartar_variantes_banner(sender, instance, raw=False, **kwargs):
+    if not raw and 'banner_imagen' in instance.__dict__ and _nombre_banner(instance) != instance._banner_original:
+        instance.banner_variantes = {}
+
+
+@receiver(post_save, sender=User)
+def generar_variantes_banner(sender, instance, raw=False, **kwargs):
+    if raw or 'banner_imagen' not in instance.__dict__:
+        return
+    nombre = _nombre_banner(instance)
+    if nombre != instance._banner_original:
+        imagenes.encolar('banner', nombre)
+    instance._banner_original = nombre
+
+
+@receiver(post_save, sender=User)
+def invalidar_usuario_autenticado(sender, instance, raw=False, **kwargs):
+    # Contraseña, activación o permisos nuevos invalidan los tokens emitidos antes
+    if not raw:
+        autenticacion.invalidar_usuario(instance)
+
+
+@receiver(post_delete, sender=User)
+def invalidar_usuario_eliminado(sender, instance, **kwargs):
+    autenticacion.invalidar_usuario(instance, eliminado=True)
+
+
+@receiver(connection_created)
+def configurar_conexion(sender, connection, **kwargs):
+    basedatos.configurar_conexion(connection)
@@ -0,0 +1,5 @@
+"""
+Tests de la API. Se corren con: python manage.py test api.tests
+
+(test_admin.py, en la raíz de la app, es un script interactivo y no forma parte de la suite)
+"""
@@ -0,0 +1,19 @@
+"""Datos de prueba compartidos por los tests"""
+from decimal import Decimal
+
+from api.models import Product, User
+
+
+def crear_usuario(nombre, **campos):
+    return User.objects.create_user(
+        email=f'{nombre}@test.local', username=nombre, nombre=nombre.capitalize(), password=f'clave-{nombre}',
+        **campos,
+    )
+
+
+def crear_producto(vendedor, precio='1000', categoria='Muebles', **campos):
+    campos.setdefault('stock', 5)
+    return Product.objects.create(
+        titulo=campos.pop('titulo', 'Mesa'), descripcion='', precio=Decimal(precio), categoria=categoria,
+        vendedor=vendedor, **campos,
+    )
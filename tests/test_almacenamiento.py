@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from PIL import UnidentifiedImageError
+
+from api.almacenamiento import CARPETA_TEMPORAL, AlmacenamientoDeduplicado
+from api.models import ArchivoMedia
+
+from .test_imagenes import imagen_png
+
+
+class AlmacenamientoDeduplicadoTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.storage = AlmacenamientoDeduplicado(location=media_root)
+
+    def test_extension_segun_el_contenido(self):
+        nombre = self.storage.save('productos/pagina.html', imagen_png(10))
+
+        self.assertTrue(nombre.startswith('productos/'))
+        self.assertTrue(nombre.endswith('.png'))
+        self.assertEqual(self.storage.save('productos/otra.PNG', imagen_png(10)), nombre)
+        self.assertEqual(ArchivoMedia.objects.get().ruta, nombre)
+
+    def test_rechaza_contenido_que_no_es_imagen(self):
+        for nombre, contenido in (('ataque.html', b'<script>alert(1)</script>'),
+                                  ('ataque.svg', b'<svg xmlns="http://www.w3.org/2000/svg"><script/></svg>')):
+            with self.assertRaises(UnidentifiedImageError):
+                self.storage.save(f'productos/{nombre}', ContentFile(contenido))
+
+        self.assertFalse(ArchivoMedia.objects.exists())
+        self.assertEqual(os.listdir(self.storage.path(CARPETA_TEMPORAL)), [])
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from api import arranque
+from api.admin import CarrierAdmin
+from api.models import Carrier
+from api.views import carriers_activos
+
+
+class CalentarTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Cerrar la conexión dentro de la transacción del test la invalidaría
+        parches = [mock.patch.object(arranque.connections, 'close_all'), mock.patch('builtins.print')]
+        self.close_all = parches[0].start()
+        parches[1].start()
+        for parche in parches:
+            self.addCleanup(parche.stop)
+
+    def test_llena_las_caches(self):
+        tiempos = arranque.calentar(conservar_conexiones=False)
+
+        self.assertEqual(set(tiempos), {'carriers', 'comisiones', 'categorias', 'arbol de categorias'})
+        self.close_all.assert_called_once_with()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(carriers_activos()), 2)
+
+    def test_abre_las_conexiones_desde_post_worker_init(self):
+        with mock.patch.object(type(arranque.connections['default']), 'close_if_unusable_or_obsolete'):
+            tiempos = arranque.calentar()
+
+        self.assertIn('db:default', tiempos)
+        self.close_all.assert_not_called()
+
+    def test_un_error_no_impide_el_resto(self):
+        with mock.patch('api.rollups.porcentajes_comision', side_effect=RuntimeError('sin base')):
+            tiempos = arranque.calentar(conservar_conexiones=False)
+
+        self.assertNotIn('comisiones', tiempos)
+        self.assertIn('carriers', tiempos)
+
+    def test_iniciar_worker(self):
+        with mock.patch.object(arranque, 'precargar') as precargar, \
+                mock.patch.object(arranque, 'calentar') as calentar:
+            with override_settings(WORKER_WARMUP=False):
+                arranque.iniciar_worker()
+            precargar.assert_not_called()
+
+            with override_settings(WORKER_PRELOAD=True):
+                arranque.iniciar_worker()
+            calentar.assert_not_called()
+
+            arranque.iniciar_worker()
+            calentar.assert_called_once_with(conservar_conexiones=False)
+        self.assertEqual(precargar.call_count, 2)
+
+
+class CarrierAdminTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_las_acciones_masivas_invalidan_la_cache(self):
+        self.assertEqual(len(carriers_activos()), 2)
+        modelo_admin = CarrierAdmin(Carrier, admin.site)
+
+        with mock.patch.object(modelo_admin, 'message_user'):
+            modelo_admin.desactivar_carriers(RequestFactory().post('/'), Carrier.objects.filter(codigo='moova'))
+            self.assertEqual([carrier.codigo for carrier in carriers_activos()], ['envio_pack'])
+
+            modelo_admin.activar_carriers(RequestFactory().post('/'), Carrier.objects.all())
+            self.assertEqual(len(carriers_activos()), 4)
@@ -0,0 +1,62 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api import autenticacion, views
+from api.autenticacion import TokenMandale, usuarios_cache
+from api.models import User
+
+
+class _Reloj:
+    """Reemplazo del módulo time que adelanta el reloj `adelanto` segundos"""
+
+    def __init__(self, adelanto):
+        self.adelanto = adelanto
+
+    def time(self):
+        return time.time() + self.adelanto
+
+    def monotonic(self):
+        return time.monotonic() + self.adelanto
+
+
+@override_settings(AUTH_USER_CACHE_TTL=60)
+class SelloCredencialesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        usuarios_cache.limpiar()
+        self.usuario = User.objects.create_user(
+            email='usuario@test.local', username='usuario', nombre='Usuario', password='clave-original',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenMandale.for_user(self.usuario).access_token}')
+        self.url = reverse(views.get_profile)
+
+    def _perfil(self):
+        return self.client.get(self.url, secure=True)
+
+    def test_token_vigente(self):
+        self.assertEqual(self._perfil().status_code, 200)
+
+    def test_cambio_de_contrasena_invalida_el_token(self):
+        self.assertEqual(self._perfil().status_code, 200)
+
+        self.usuario.set_password('clave-nueva')
+        self.usuario.save()
+
+        self.assertEqual(self._perfil().status_code, 401)
+
+    def test_sello_publicado_vence_con_el_ttl(self):
+        self.assertEqual(self._perfil().status_code, 200)
+
+        # Cambio sin señales (otro proceso, un UPDATE directo): nadie publica el sello nuevo
+        User.objects.filter(pk=self.usuario.pk).update(is_active=False)
+        self.assertEqual(self._perfil().status_code, 200)
+
+        with mock.patch.object(autenticacion, 'time', _Reloj(61)):
+            self.assertEqual(self._perfil().status_code, 401)
@@ -0,0 +1,121 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from api import categorias
+from api.models import Categoria, Comision, Product
+
+from .datos import crear_producto, crear_usuario
+
+
+class AsignarCategoriaTests(TestCase):
+
+    def setUp(self):
+        self.producto = crear_producto(crear_usuario('vendedor'), categoria='Muebles')
+
+    def test_completa_la_referencia_al_crear(self):
+        self.assertEqual(self.producto.categoria_ref.nombre, 'Muebles')
+
+    def test_solo_resuelve_el_id_si_cambia_la_categoria(self):
+        producto = Product.objects.get(pk=self.producto.pk)
+        with mock.patch.object(categorias, 'id_categoria', wraps=categorias.id_categoria) as id_categoria:
+            producto.titulo = 'Mesa ratona'
+            producto.save()
+            id_categoria.assert_not_called()
+
+            producto.categoria = 'Sillas'
+            producto.save()
+            # La señal resuelve la categoría nueva (los contadores la vuelven a buscar por nombre)
+            self.assertEqual(id_categoria.call_args_list[0], mock.call('Sillas'))
+
+        self.assertEqual(Product.objects.get(pk=producto.pk).categoria_ref.nombre, 'Sillas')
+
+    def test_update_fields_sin_la_referencia(self):
+        with mock.patch.object(categorias, 'id_categoria') as id_categoria:
+            self.producto.visitas = 5
+            self.producto.save(update_fields=['visitas'])
+            Product.objects.only('titulo').get(pk=self.producto.pk).save()
+
+        id_categoria.assert_not_called()
+
+    def test_comisiones(self):
+        comision = Comision.objects.create(categoria='Muebles', porcentaje=Decimal('10'))
+        self.assertEqual(comision.categoria_ref_id, self.producto.categoria_ref_id)
+
+        comision = Comision.objects.get(pk=comision.pk)
+        with mock.patch.object(categorias, 'id_categoria') as id_categoria:
+            comision.porcentaje = Decimal('12')
+            comision.save()
+        id_categoria.assert_not_called()
+
+    def test_completar_referencias_por_lotes(self):
+        Product.objects.update(categoria_ref=None)
+        crear_producto(self.producto.vendedor, categoria='Ropa')
+        Product.objects.update(categoria_ref=None)
+
+        desde, actualizados = categorias.completar_referencias(lote=1)
+        self.assertEqual((desde, actualizados), (self.producto.pk, 1))
+        self.assertEqual(categorias.completar_referencias(desde)[1], 1)
+        self.assertEqual(categorias.completar_referencias(), (None, 0))
+        self.assertFalse(Product.objects.filter(categoria_ref__isnull=True).exists())
+
+
+class ArbolCategoriasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.hogar = Categoria.objects.create(nombre='Hogar')
+        self.muebles = Categoria.objects.create(nombre='Muebles', padre=self.hogar)
+        self.sillas = Categoria.objects.create(nombre='Sillas', padre=self.muebles)
+        vendedor = crear_usuario('vendedor')
+        for categoria in ('Hogar', 'Muebles', 'Sillas', 'Sillas'):
+            crear_producto(vendedor, categoria=categoria)
+        self.pausado = crear_producto(vendedor, categoria='Sillas', estado='Pausado')
+
+    def _contadores(self):
+        return dict(Categoria.objects.values_list('nombre', 'productos_activos'))
+
+    def test_contadores_de_productos_activos(self):
+        self.assertEqual(self._contadores(), {'Hogar': 1, 'Muebles': 1, 'Sillas': 2})
+
+        self.pausado.estado = 'Activo'
+        self.pausado.save()
+        Product.objects.filter(categoria='Hogar').get().delete()
+
+        esperado = {'Hogar': 0, 'Muebles': 1, 'Sillas': 3}
+        self.assertEqual(self._contadores(), esperado)
+        Categoria.objects.update(productos_activos=0)
+        categorias.recalcular_contadores()
+        self.assertEqual(self._contadores(), esperado)
+
+    def test_arbol_con_totales_de_subcategorias(self):
+        with self.assertNumQueries(1):
+            (hogar,) = categorias.arbol()
+        with self.assertNumQueries(0):
+            categorias.arbol()
+
+        self.assertEqual((hogar['productos_activos'], hogar['total_activos']), (1, 4))
+        muebles = hogar['subcategorias'][0]
+        self.assertEqual((muebles['nombre'], muebles['total_activos']), ('Muebles', 3))
+
+    def test_subarbol(self):
+        self.assertEqual(sorted(categorias.subarbol('Muebles')), ['Muebles', 'Sillas'])
+        self.assertEqual(categorias.subarbol('Desconocida'), ['Desconocida'])
+
+        # Cambiar la jerarquía invalida el árbol cacheado
+        self.sillas.padre = None
+        self.sillas.save()
+        self.assertEqual(categorias.subarbol('Muebles'), ['Muebles'])
+
+    def test_clean_rechaza_ciclos(self):
+        self.hogar.padre = self.sillas
+        with self.assertRaises(ValidationError):
+            self.hogar.clean()
+
+        # Un ciclo guardado sin clean() deja esas categorías fuera del árbol
+        self.hogar.save()
+        self.assertEqual(categorias.arbol(), [])
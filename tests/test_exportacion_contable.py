@@ -0,0 +1,105 @@
+import csv
+import io
+import os
+import re
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from api import admin_views, exportaciones
+from api.management.commands import export_accounting
+from api.models import Order
+
+from .datos import crear_producto, crear_usuario
+
+
+def _cortar_tras(cantidad, error=KeyboardInterrupt):
+    """Reemplazo de lineas_exportacion que se interrumpe tras `cantidad` líneas escritas"""
+    def lineas(*args, **kwargs):
+        # Se corta antes de pedir la siguiente fila, como un Ctrl-C entre dos escrituras
+        lineas = exportaciones.lineas_exportacion(*args, **kwargs)
+        for _ in range(cantidad):
+            yield next(lineas)
+        raise error()
+    return lineas
+
+
+class ExportacionContableTests(TestCase):
+
+    def setUp(self):
+        comprador = crear_usuario('comprador')
+        vendedor = crear_usuario('vendedor')
+        producto = crear_producto(vendedor)
+        self.ids = [
+            Order.objects.create(comprador=comprador, vendedor=vendedor, producto=producto,
+                                 precio_unitario=Decimal('100'), precio_total=Decimal('100'),
+                                 metodo_pago='mercadopago').pk
+            for _ in range(5)
+        ]
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.archivo = os.path.join(directorio.name, 'ordenes.csv')
+
+    def _exportar(self, *argumentos):
+        errores = io.StringIO()
+        call_command('export_accounting', 'ordenes', '--formato', 'csv', '--salida', self.archivo,
+                     '--chunk-size', '2', *argumentos, stderr=errores)
+        return errores.getvalue()
+
+    def _ids_exportados(self):
+        with open(self.archivo, newline='', encoding='utf-8') as archivo:
+            filas = list(csv.reader(archivo))
+        self.assertEqual(filas[0][0], 'id')
+        return [int(fila[0]) for fila in filas[1:]]
+
+    def _retomar_tras_interrupcion(self, error):
+        errores = io.StringIO()
+        with mock.patch.object(export_accounting, 'lineas_exportacion', _cortar_tras(3, error)):
+            with self.assertRaises((CommandError, error)):
+                call_command('export_accounting', 'ordenes', '--formato', 'csv', '--salida', self.archivo,
+                             '--chunk-size', '2', stderr=errores)
+
+        # Encabezado + 2 filas escritas: el cursor apunta a la segunda
+        self.assertIn('tras 2 filas', errores.getvalue())
+        cursor = re.search(r'--cursor (\S+)', errores.getvalue()).group(1)
+        self._exportar('--cursor', cursor)
+        self.assertEqual(self._ids_exportados(), self.ids)
+
+    def test_retoma_sin_duplicar_filas(self):
+        self._retomar_tras_interrupcion(KeyboardInterrupt)
+
+    def test_informa_el_cursor_ante_cualquier_error(self):
+        self._retomar_tras_interrupcion(ConnectionError)
+
+    def test_exportacion_completa(self):
+        self.assertIn('5 filas exportadas', self._exportar())
+        self.assertEqual(self._ids_exportados(), self.ids)
+
+
+class ExportarContabilidadViewTests(TestCase):
+
+    def setUp(self):
+        ExportacionContableTests.setUp(self)
+        self.client.force_login(crear_usuario('admin', is_staff=True, is_superuser=True))
+        self.url = reverse(admin_views.exportar_contabilidad, args=['ordenes'])
+
+    def _ids(self, response):
+        contenido = b''.join(response.streaming_content).decode('utf-8')
+        return [int(fila[0]) for fila in list(csv.reader(io.StringIO(contenido)))[1:]]
+
+    def test_exporta_por_partes_con_cursor(self):
+        primera = self.client.get(self.url, {'formato': 'csv', 'limite': 3}, secure=True)
+        segunda = self.client.get(self.url, {'formato': 'csv', 'limite': 3,
+                                             'cursor': primera['X-Export-Cursor']}, secure=True)
+
+        self.assertEqual(self._ids(primera) + self._ids(segunda), self.ids)
+        self.assertNotIn('X-Export-Cursor', segunda)
+
+    def test_rechaza_limite_o_cursor_invalidos(self):
+        for parametros in ({'limite': 0}, {'cursor': 'no-es-un-cursor'}):
+            response = self.client.get(self.url, parametros, secure=True)
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api import admin_views
+from api.exportaciones import pagina_keyset
+from api.management.commands.check_query_budgets import plantillas_medicion
+from api.models import Product
+
+from .datos import crear_producto, crear_usuario
+
+
+class PaginaKeysetTests(TestCase):
+
+    def setUp(self):
+        vendedor = crear_usuario('vendedor')
+        self.ids = [crear_producto(vendedor, titulo=f'Producto {i}').pk for i in range(7)]
+        # Fechas repetidas: el id desempata y ninguna fila se repite ni se pierde
+        Product.objects.update(fecha_publicacion=timezone.now())
+        self.esperados = sorted(self.ids, reverse=True)
+
+    def _pagina(self, cursor=None, direccion='siguiente'):
+        filas, siguiente, anterior = pagina_keyset(Product.objects.all(), 'fecha_publicacion',
+                                                   cursor=cursor, direccion=direccion, tamano=3)
+        return [fila.pk for fila in filas], siguiente, anterior
+
+    def test_recorre_hacia_adelante_y_hacia_atras(self):
+        primera, siguiente, anterior = self._pagina()
+        self.assertEqual(primera, self.esperados[:3])
+        self.assertIsNone(anterior)
+
+        segunda, siguiente, anterior = self._pagina(siguiente)
+        tercera, ultima, _ = self._pagina(siguiente)
+        self.assertEqual(segunda + tercera, self.esperados[3:])
+        self.assertIsNone(ultima)
+
+        volver, _, _ = self._pagina(anterior, 'anterior')
+        self.assertEqual(volver, primera)
+
+    def test_una_consulta_por_pagina(self):
+        _, siguiente, _ = self._pagina()
+        with self.assertNumQueries(1):
+            self._pagina(siguiente)
+
+
+@override_settings(TEMPLATES=plantillas_medicion())
+class GestionProductosTests(TestCase):
+
+    def setUp(self):
+        self.admin = crear_usuario('admin', is_staff=True, is_superuser=True)
+        vendedor = crear_usuario('vendedor')
+        for i in range(5):
+            crear_producto(vendedor, titulo=f'Mesa {i}', estado='Activo' if i % 2 else 'Pausado')
+        self.client.force_login(self.admin)
+
+    def test_pagina_con_cursor(self):
+        with mock.patch.object(admin_views, 'render', return_value=HttpResponse()) as render:
+            self.client.get(reverse(admin_views.gestionar_productos), {'tamano': 2}, secure=True)
+
+        context = render.call_args.args[2]
+        self.assertEqual(len(context['productos']), 2)
+        self.assertIsNotNone(context['cursor_siguiente'])
+        self.assertIsNone(context['cursor_anterior'])
+
+    def test_exportacion_en_streaming_con_filtros(self):
+        url = reverse(admin_views.exportar_productos)
+        response = self.client.get(url, {'estado': 'Activo'}, secure=True)
+
+        self.assertTrue(response.streaming)
+        filas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(filas[0][:3], ['id', 'titulo', 'categoria'])
+        self.assertEqual(len(filas) - 1, 2)
+
+        response = self.client.get(url, {'formato': 'ndjson'}, secure=True)
+        lineas = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lineas), 5)
+        self.assertIn('vendedor__email', json.loads(lineas[0]))
+
+    def test_requiere_superusuario(self):
+        self.client.force_login(crear_usuario('otro'))
+
+        response = self.client.get(reverse(admin_views.exportar_productos), secure=True)
+
+        self.assertEqual(response.status_code, 302)
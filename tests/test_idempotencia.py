@@ -0,0 +1,134 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import views
+from api.autenticacion import TokenMandale
+from api.models import Carrier, IdempotencyKey, Order, Product, Shipment, User
+
+
+class IdempotenciaTests(TestCase):
+
+    def setUp(self):
+        self.vendedor = User.objects.create_user(
+            email='vendedor@test.local', username='vendedor', nombre='Vendedor', password='clave-vendedor',
+        )
+        self.comprador = User.objects.create_user(
+            email='comprador@test.local', username='comprador', nombre='Comprador', password='clave-comprador',
+            mercadopago_activa=True,
+        )
+        self.producto = Product.objects.create(
+            titulo='Mesa', descripcion='', precio=Decimal('1000'), categoria='Muebles', stock=5,
+            vendedor=self.vendedor,
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenMandale.for_user(self.comprador).access_token}')
+        self.url = reverse(views.crear_orden)
+
+    def _crear_orden(self, clave, cantidad=1):
+        return self.client.post(
+            self.url, {'producto_id': self.producto.pk, 'cantidad': cantidad, 'metodo_pago': 'mercadopago'},
+            format='json', secure=True, HTTP_IDEMPOTENCY_KEY=clave,
+        )
+
+    def test_reintento_devuelve_la_respuesta_guardada(self):
+        primera = self._crear_orden('orden-1')
+        reintento = self._crear_orden('orden-1')
+
+        self.assertEqual(primera.status_code, 201)
+        self.assertEqual(reintento.status_code, 201)
+        self.assertEqual(reintento['Idempotent-Replayed'], 'true')
+        self.assertEqual(reintento.json()['id'], primera.json()['id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 4)
+
+    def test_clave_reutilizada_con_otros_datos(self):
+        self._crear_orden('orden-1')
+        response = self._crear_orden('orden-1', cantidad=2)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_claves_distintas_crean_ordenes_distintas(self):
+        self._crear_orden('orden-1')
+        self._crear_orden('orden-2')
+
+        self.assertEqual(Order.objects.count(), 2)
+
+    def _dejar_en_proceso(self, hace):
+        # Como si el worker hubiera muerto después de reservar la clave
+        Order.objects.all().delete()
+        IdempotencyKey.objects.update(estado='En proceso', status_code=None, respuesta=None,
+                                      fecha_reserva=timezone.now() - hace)
+
+    @override_settings(IDEMPOTENCY_LEASE_SECONDS=60, IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_clave_en_proceso_dentro_del_lease(self):
+        self._crear_orden('orden-1')
+        self._dejar_en_proceso(timedelta(seconds=5))
+
+        response = self._crear_orden('orden-1')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 0)
+
+    @override_settings(IDEMPOTENCY_LEASE_SECONDS=60, IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_clave_abandonada_se_vuelve_a_ejecutar(self):
+        self._crear_orden('orden-1')
+        self._dejar_en_proceso(timedelta(minutes=2))
+
+        response = self._crear_orden('orden-1')
+        reintento = self._crear_orden('orden-1')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(reintento['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().estado, 'Completada')
+
+
+@override_settings(SHIPPING_WEBHOOK_SECRET='secreto-proveedor')
+class WebhookEnvioTests(TestCase):
+
+    def setUp(self):
+        vendedor = User.objects.create_user(
+            email='vendedor@test.local', username='vendedor', nombre='Vendedor', password='clave-vendedor',
+        )
+        comprador = User.objects.create_user(
+            email='comprador@test.local', username='comprador', nombre='Comprador', password='clave-comprador',
+        )
+        producto = Product.objects.create(
+            titulo='Mesa', descripcion='', precio=Decimal('1000'), categoria='Muebles', stock=5, vendedor=vendedor,
+        )
+        orden = Order.objects.create(comprador=comprador, vendedor=vendedor, producto=producto,
+                                     precio_unitario=Decimal('1000'), metodo_pago='mercadopago')
+        carrier = Carrier.objects.create(codigo='moova', nombre='Moova', activo=True)
+        self.envio = Shipment.objects.create(order=orden, carrier=carrier, estado='Creado', tracking_number='TRK-1')
+        self.url = reverse(views.shipping_webhook)
+
+    def _webhook(self, secreto, clave='evento-1'):
+        return APIClient().post(
+            self.url, {'tracking_number': 'TRK-1', 'estado': 'En camino'}, format='json', secure=True,
+            HTTP_X_WEBHOOK_SECRET=secreto, HTTP_IDEMPOTENCY_KEY=clave,
+        )
+
+    def test_secreto_invalido_no_reserva_la_clave(self):
+        self.assertEqual(self._webhook('otro').status_code, 403)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self._webhook('secreto-proveedor')
+
+        self.assertEqual(response.status_code, 200)
+        self.envio.refresh_from_db()
+        self.assertEqual(self.envio.estado, 'En camino')
+
+    def test_reintento_del_proveedor(self):
+        self._webhook('secreto-proveedor')
+        reintento = self._webhook('secreto-proveedor')
+
+        self.assertEqual(reintento['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.envio.tracking.count(), 1)
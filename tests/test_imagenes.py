@@ -0,0 +1,78 @@
+import io
+import shutil
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api import imagenes
+from api.models import ProductImage
+
+from .datos import crear_producto, crear_usuario
+
+
+def imagen_png(ancho, alto=None, nombre='foto.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (ancho, alto or ancho), (200, 30, 30)).save(buffer, format='PNG')
+    return SimpleUploadedFile(nombre, buffer.getvalue(), content_type='image/png')
+
+
+class VariantesTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        configuracion = override_settings(MEDIA_ROOT=media_root, IMAGE_DERIVATIVES_WORKERS=0)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        self.producto = crear_producto(crear_usuario('vendedor'))
+
+    def _subir(self, archivo):
+        with self.captureOnCommitCallbacks(execute=True):
+            imagen = ProductImage.objects.create(product=self.producto, imagen=archivo)
+        imagen.refresh_from_db()
+        return imagen
+
+    def test_genera_variantes_sin_ampliar(self):
+        imagen = self._subir(imagen_png(600, 300))
+
+        self.assertEqual(set(imagen.variantes), {'miniatura', 'tarjeta'})
+        self.assertEqual((imagen.variantes['tarjeta']['ancho'], imagen.variantes['tarjeta']['alto']), (480, 240))
+        for variante in imagen.variantes.values():
+            for formato in imagenes.FORMATOS:
+                self.assertTrue(default_storage.exists(variante[formato]))
+        with default_storage.open(imagen.variantes['miniatura']['webp']) as archivo:
+            self.assertEqual(Image.open(archivo).format, 'WEBP')
+
+    def test_imagen_chica_conserva_la_miniatura(self):
+        imagen = self._subir(imagen_png(100))
+
+        self.assertEqual(list(imagen.variantes), ['miniatura'])
+        self.assertEqual(imagen.variantes['miniatura']['ancho'], 100)
+
+    def test_el_mismo_archivo_reutiliza_las_variantes(self):
+        primera = self._subir(imagen_png(600))
+        segunda = self._subir(imagen_png(600, nombre='copia.png'))
+
+        self.assertEqual(segunda.imagen.name, primera.imagen.name)
+        self.assertEqual(segunda.variantes, primera.variantes)
+
+    def test_generar_pendientes(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            imagen = ProductImage.objects.create(product=self.producto, imagen=imagen_png(600))
+
+        procesadas, errores = imagenes.generar_pendientes('producto', workers=0)
+
+        self.assertEqual((procesadas, errores), (1, []))
+        imagen.refresh_from_db()
+        self.assertIn('tarjeta', imagen.variantes)
+
+    def test_urls_de_las_variantes(self):
+        variantes = self._subir(imagen_png(600)).variantes
+
+        self.assertEqual(imagenes.url_variante(variantes, 'detalle', 'jpeg'),
+                         default_storage.url(variantes['tarjeta']['jpeg']))
+        self.assertIsNone(imagenes.url_variante({}, 'tarjeta'))
+        self.assertTrue(imagenes.srcset(variantes).endswith('480w'))
@@ -0,0 +1,110 @@
+import io
+import zipfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api import views
+from api.autenticacion import TokenMandale
+from api.importacion import leer_filas, validar_fila
+from api.models import Product
+
+from .datos import crear_usuario
+
+
+class ValidarFilaTests(SimpleTestCase):
+
+    def _fila(self, **campos):
+        return {'titulo': 'Mesa', 'categoria': 'Muebles', 'precio': '1500,50', **campos}
+
+    def test_fila_valida(self):
+        datos, imagenes, errores = validar_fila(self._fila(stock='3', imagenes='a.jpg; b.jpg'))
+
+        self.assertEqual(errores, {})
+        self.assertEqual(str(datos['precio']), '1500.50')
+        self.assertEqual(datos['stock'], 3)
+        self.assertEqual(datos['condicion'], 'Nuevo')
+        self.assertEqual(imagenes, ['a.jpg', 'b.jpg'])
+
+    def test_campos_requeridos(self):
+        _, _, errores = validar_fila({})
+
+        self.assertEqual(set(errores), {'titulo', 'categoria', 'precio'})
+
+    def test_campos_que_no_son_texto(self):
+        _, _, errores = validar_fila(self._fila(titulo=['Mesa'], categoria=7, descripcion={'a': 1}))
+
+        self.assertEqual(set(errores), {'titulo', 'categoria', 'descripcion'})
+
+    def test_valores_invalidos(self):
+        _, _, errores = validar_fila(self._fila(precio='caro', stock=-1, condicion='Roto', imagenes=[1, 2]))
+
+        self.assertEqual(set(errores), {'precio', 'stock', 'condicion', 'imagenes'})
+
+    def test_lineas_ndjson_que_no_son_objetos(self):
+        archivo = io.StringIO('{"titulo": "Mesa"}\n[1, 2]\n"texto"\nno es json\n')
+        filas = list(leer_filas(archivo, 'ndjson'))
+
+        self.assertEqual(filas[0], {'titulo': 'Mesa'})
+        for fila in filas[1:]:
+            datos, _, errores = validar_fila(fila)
+            self.assertIsNone(datos)
+            self.assertIn('fila', errores)
+
+
+class ImportarProductosViewTests(TestCase):
+
+    def setUp(self):
+        self.vendedor = crear_usuario('vendedor')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenMandale.for_user(self.vendedor).access_token}')
+
+    def _importar(self, contenido, **archivos):
+        datos = {'archivo': SimpleUploadedFile('productos.csv', contenido), **archivos}
+        return self.client.post(reverse(views.importar_productos_masivo), datos, format='multipart', secure=True)
+
+    def _csv(self, filas, imagenes=''):
+        lineas = ['titulo,categoria,precio,imagenes']
+        lineas += [f'Mesa {numero},Muebles,1000,{imagenes}' for numero in range(filas)]
+        return ('\n'.join(lineas) + '\n').encode('utf-8')
+
+    def test_importa_las_filas_validas(self):
+        response = self._importar(self._csv(3))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Product.objects.filter(vendedor=self.vendedor).count(), 3)
+
+    def test_codificacion_invalida_no_deja_productos_a_medias(self):
+        # El byte inválido está después de un lote completo
+        response = self._importar(self._csv(1500) + 'Silla,Muebles,1000,\n'.encode('latin-1').replace(b'i', b'\xed'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.exists())
+
+    @override_settings(IMPORT_MAX_ROWS=2)
+    def test_limite_de_filas(self):
+        response = self._importar(self._csv(3))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.exists())
+
+    @override_settings(IMPORT_MAX_FILE_BYTES=64)
+    def test_limite_de_tamano(self):
+        response = self._importar(self._csv(10))
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Product.objects.exists())
+
+    @override_settings(IMPORT_MAX_IMAGE_BYTES=16)
+    def test_limite_de_tamano_por_imagen_del_zip(self):
+        comprimido = io.BytesIO()
+        with zipfile.ZipFile(comprimido, 'w', zipfile.ZIP_DEFLATED) as archivo_zip:
+            archivo_zip.writestr('mesa.jpg', b'\0' * 1024)
+        imagenes = SimpleUploadedFile('imagenes.zip', comprimido.getvalue())
+
+        response = self._importar(self._csv(1, imagenes='mesa.jpg'), imagenes=imagenes)
+
+        self.assertEqual(response.status_code, 207)
+        self.assertIn('supera el máximo', response.json()['errores'][0]['errores']['imagenes'])
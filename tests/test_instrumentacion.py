@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import instrumentacion
+from api.autenticacion import TokenMandale
+from api.instrumentacion import Registro
+
+from .datos import crear_producto, crear_usuario
+
+
+class RegistroTests(SimpleTestCase):
+
+    def test_texto_en_formato_prometheus(self):
+        registro = Registro()
+        for valor in (0.003, 0.02, 20):
+            registro.observar('request_duration_seconds', 'productos-list', valor)
+        registro.sumar(instrumentacion.CONTADOR_REQUESTS, ('productos-list', '2xx'), 3)
+
+        texto = registro.texto()
+
+        self.assertIn('mandale_http_requests_total{vista="productos-list",estado="2xx"} 3', texto)
+        self.assertIn('mandale_http_request_duration_seconds_bucket{vista="productos-list",le="0.005"} 1', texto)
+        self.assertIn('mandale_http_request_duration_seconds_bucket{vista="productos-list",le="0.025"} 2', texto)
+        self.assertIn('mandale_http_request_duration_seconds_bucket{vista="productos-list",le="+Inf"} 3', texto)
+        self.assertIn('mandale_http_request_duration_seconds_count{vista="productos-list"} 3', texto)
+
+    def test_combina_los_archivos_de_los_workers(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        otro = Registro()
+        otro.observar('db_queries', 'productos-list', 4)
+        with open(os.path.join(directorio, '1.json'), 'w') as archivo:
+            json.dump(otro.exportar(), archivo)
+        with open(os.path.join(directorio, '2.json'), 'w') as archivo:
+            archivo.write('{incompleto')
+        propio = Registro()
+        propio.observar('db_queries', 'productos-list', 1)
+
+        with override_settings(METRICS_MULTIPROC_DIR=directorio), \
+                mock.patch.object(instrumentacion, 'registro', propio):
+            texto = instrumentacion.registro_combinado().texto()
+
+        self.assertIn('mandale_http_db_queries_count{vista="productos-list"} 2', texto)
+        self.assertIn('mandale_http_db_queries_sum{vista="productos-list"} 5', texto)
+
+
+class MetricasMiddlewareTests(TestCase):
+
+    def setUp(self):
+        crear_producto(crear_usuario('vendedor'))
+        parche = mock.patch.object(instrumentacion, 'registro', Registro())
+        self.registro = parche.start()
+        self.addCleanup(parche.stop)
+
+    def _get(self, usuario=None):
+        client = APIClient()
+        if usuario:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenMandale.for_user(usuario).access_token}')
+        return client.get('/api/productos/', secure=True)
+
+    @override_settings(METRICS_SERVER_TIMING='staff')
+    def test_mide_el_request_por_vista(self):
+        response = self._get()
+
+        self.assertNotIn('Server-Timing', response)
+        datos = {(nombre, vista): valores for nombre, vista, valores in self.registro.exportar()['histogramas']}
+        consultas = datos[('db_queries', 'productos-list')]
+        self.assertEqual(sum(consultas[:-1]), 1)
+        self.assertGreater(consultas[-1], 0)
+        self.assertGreater(datos[('serializer_duration_seconds', 'productos-list')][-1], 0)
+        self.assertIn(['requests_total', ['productos-list', '2xx'], 1], self.registro.exportar()['contadores'])
+
+    @override_settings(METRICS_SERVER_TIMING='staff')
+    def test_server_timing_para_el_staff(self):
+        response = self._get(crear_usuario('staff', is_staff=True))
+
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ consultas"')
+
+    @override_settings(METRICS_SERVER_TIMING='todos')
+    def test_server_timing_para_todos(self):
+        self.assertIn('Server-Timing', self._get())
+
+
+@override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=['10.0.0.5'])
+class VistaMetricasTests(SimpleTestCase):
+
+    def test_acceso_por_ip(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.6').status_code, 403)
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE mandale_http_requests_total counter', response.content.decode())
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test_acceso_por_token(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
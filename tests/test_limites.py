@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api import limites, views
+
+from .datos import crear_usuario
+
+
+@override_settings(LOGIN_THROTTLE_ACCOUNT_LIMIT=3, LOGIN_THROTTLE_IP_LIMIT=5, LOGIN_THROTTLE_BACKEND='mixto')
+class LimiteLoginTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Contadores locales nuevos en cada test
+        parche = mock.patch.object(limites, 'memoria', limites.BackendMemoria())
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.usuario = crear_usuario('cliente')
+        self.client = APIClient()
+
+    def _login(self, password, email='cliente@test.local', ip='10.0.0.1'):
+        return self.client.post(reverse(views.login), {'email': email, 'password': password},
+                                format='json', secure=True, REMOTE_ADDR=ip)
+
+    def test_bloquea_la_cuenta_tras_el_limite(self):
+        for _ in range(3):
+            self.assertEqual(self._login('incorrecta').status_code, 401)
+
+        with mock.patch.object(type(self.usuario), 'check_password') as check_password:
+            response = self._login('clave-cliente')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        check_password.assert_not_called()
+        self.assertEqual(limites.estadisticas()['cuenta'], {'worker': 1, 'total': 1})
+
+    def test_la_ip_conocida_sigue_entrando(self):
+        self.assertEqual(self._login('clave-cliente', ip='10.0.0.9').status_code, 200)
+        for _ in range(3):
+            self._login('incorrecta', ip='10.0.0.1')
+
+        self.assertEqual(self._login('clave-cliente', ip='10.0.0.9').status_code, 200)
+        self.assertEqual(self._login('clave-cliente', ip='10.0.0.1').status_code, 429)
+
+    def test_limite_por_ip_entre_cuentas(self):
+        for numero in range(5):
+            self._login('incorrecta', email=f'otro{numero}@test.local')
+
+        self.assertEqual(self._login('clave-cliente').status_code, 429)
+        self.assertEqual(self._login('clave-cliente', ip='10.0.0.2').status_code, 200)
+
+    @override_settings(LOGIN_THROTTLE_BACKEND='cache')
+    def test_contadores_compartidos_entre_workers(self):
+        for _ in range(3):
+            self._login('incorrecta')
+        # Otro worker: sin contadores locales
+        limites.memoria.__init__()
+
+        self.assertEqual(self._login('clave-cliente').status_code, 429)
+
+
+class VentanaDeslizanteTests(SimpleTestCase):
+
+    def test_el_periodo_anterior_pesa_segun_lo_transcurrido(self):
+        self.assertEqual(limites._estimar(2, 10, ahora=1000, ventana=100), 12)
+        self.assertEqual(limites._estimar(2, 10, ahora=1075, ventana=100), 4.5)
+
+    def test_memoria_descarta_periodos_viejos(self):
+        backend = limites.BackendMemoria()
+        for ahora in (0, 150, 350):
+            backend.registrar('clave', ahora, 100)
+
+        self.assertEqual(backend.estimar('clave', 350, 100), 1)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_ip_desde_el_proxy_de_confianza(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2')
+
+        self.assertEqual(limites.obtener_ip(request), '2.2.2.2')
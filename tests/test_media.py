@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api.media_views import servir_media
+
+
+class ServirMediaTests(SimpleTestCase):
+
+    def setUp(self):
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base)
+        self.media_root = os.path.join(base, 'media')
+        with open(os.path.join(base, 'secreto.txt'), 'wb') as archivo:
+            archivo.write(b'fuera de media')
+        for ruta in ('productos/foto.jpg', 'tmp/privado.txt'):
+            os.makedirs(os.path.join(self.media_root, os.path.dirname(ruta)), exist_ok=True)
+            with open(os.path.join(self.media_root, ruta), 'wb') as archivo:
+                archivo.write(b'contenido')
+        configuracion = override_settings(MEDIA_ROOT=self.media_root, MEDIA_ACCEL_MODE='nginx',
+                                          MEDIA_ACCEL_PREFIX='/protected-media/')
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+
+    def _servir(self, ruta, usuario=None):
+        request = RequestFactory().get('/media/' + ruta)
+        request.user = usuario or AnonymousUser()
+        return servir_media(request, ruta)
+
+    def test_archivo_publico(self):
+        response = self._servir('productos/foto.jpg')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/productos/foto.jpg')
+        self.assertTrue(response['Cache-Control'].startswith('public'))
+
+    def test_archivo_privado_para_anonimos(self):
+        with self.assertRaises(Http404):
+            self._servir('tmp/privado.txt')
+
+    def test_ruta_con_punto_punto_no_hereda_el_acceso_publico(self):
+        with self.assertRaises(Http404):
+            self._servir('productos/../tmp/privado.txt')
+
+    def test_ruta_fuera_de_media_root(self):
+        with self.assertRaises(Http404):
+            self._servir('productos/../../secreto.txt')
+
+    def test_redireccion_con_la_ruta_normalizada(self):
+        response = self._servir('productos/./otra/../foto.jpg')
+
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/productos/foto.jpg')
@@ -0,0 +1,67 @@
+import tracemalloc
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api import memoria
+from api.instrumentacion import Registro
+
+
+def _vista_que_retiene(megas):
+    def vista(request):
+        response = HttpResponse()
+        # Datos que la respuesta sigue referenciando al terminar la vista
+        response.datos = [bytearray(1024) for _ in range(megas * 1024)]
+        return response
+    return vista
+
+
+LINEA_ASIGNACION = _vista_que_retiene.__code__.co_firstlineno + 4
+
+
+@override_settings(MEMORY_PROFILING_ENABLED=True, MEMORY_PROFILING_SAMPLE_RATE=1.0, MEMORY_BUDGET_MB=1,
+                   MEMORY_PROFILING_LOG_FILE='')
+class MemoriaMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        parches = [
+            mock.patch.object(memoria, 'registro', Registro()),
+            mock.patch.object(memoria, 'ultimos', memoria.deque(maxlen=10)),
+            mock.patch('builtins.print'),
+        ]
+        self.registro, self.ultimos, _ = [parche.start() for parche in parches]
+        for parche in parches:
+            self.addCleanup(parche.stop)
+
+    def _request(self, megas):
+        memoria.MemoriaMiddleware(_vista_que_retiene(megas))(RequestFactory().get('/api/productos/'))
+        return self.registro.exportar()
+
+    def test_alarma_al_superar_el_presupuesto(self):
+        datos = self._request(2)
+
+        self.assertIn(['memory_alarms_total', ['sin_ruta'], 1], datos['contadores'])
+        alarma = self.ultimos[-1]
+        self.assertGreater(alarma['pico_mb'], 1)
+        # El sitio es la línea de la vista que asigna, no un frame externo ni el middleware
+        self.assertEqual(alarma['sitios'][0]['sitio'], f'tests/test_memoria.py:{LINEA_ASIGNACION}')
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_dentro_del_presupuesto_solo_registra_el_pico(self):
+        datos = self._request(0)
+
+        self.assertEqual(datos['contadores'], [])
+        self.assertEqual(datos['histogramas'][0][:2], ['memory_peak_bytes', 'sin_ruta'])
+        self.assertEqual(len(self.ultimos), 0)
+
+    @override_settings(MEMORY_PROFILING_SAMPLE_RATE=0.0)
+    def test_requests_no_muestreados(self):
+        self.assertEqual(self._request(2), {'histogramas': [], 'contadores': []})
+
+    @override_settings(MEMORY_PROFILING_ENABLED=False)
+    def test_desactivado_no_se_instala(self):
+        from django.core.exceptions import MiddlewareNotUsed
+
+        with self.assertRaises(MiddlewareNotUsed):
+            memoria.MemoriaMiddleware(_vista_que_retiene(0))
@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from api.metricas import metricas_panel, productos_con_comision
+from api.models import Comision
+
+from .datos import crear_producto, crear_usuario
+
+
+class MetricasPanelTests(TestCase):
+
+    def setUp(self):
+        self.vendedor = crear_usuario('vendedor')
+        Comision.objects.create(categoria='Muebles', porcentaje=Decimal('10'), activa=True)
+
+    def test_comision_por_producto(self):
+        mesa = crear_producto(self.vendedor, precio='1000')
+        remera = crear_producto(self.vendedor, precio='500', categoria='Ropa')
+
+        importes = dict(productos_con_comision().values_list('pk', 'comision_importe'))
+
+        self.assertEqual(importes[mesa.pk], Decimal('100'))
+        self.assertEqual(importes[remera.pk], Decimal('0'))
+
+    def test_totales_del_panel(self):
+        crear_producto(self.vendedor, precio='1000')
+        crear_producto(self.vendedor, precio='2000', estado='Vendido')
+        crear_producto(self.vendedor, precio='300', categoria='Ropa', estado='Pausado')
+
+        metricas = metricas_panel()
+
+        self.assertEqual(metricas['total_productos'], 3)
+        self.assertEqual(metricas['productos_activos'], 1)
+        self.assertEqual(metricas['productos_vendidos'], 1)
+        self.assertEqual(metricas['productos_pausados'], 1)
+        self.assertEqual(metricas['valor_total_activos'], Decimal('1000'))
+        self.assertEqual(metricas['comisiones_potenciales'], Decimal('100'))
+        self.assertEqual(metricas['comisiones_reales'], Decimal('200'))
+        self.assertEqual(metricas['comisiones_mes'], Decimal('200'))
+
+    def test_consultas_no_dependen_del_catalogo(self):
+        crear_producto(self.vendedor)
+        with self.assertNumQueries(6) as contexto:
+            metricas_panel()
+        consultas = len(contexto.captured_queries)
+
+        for i in range(20):
+            crear_producto(self.vendedor, categoria=f'Categoria {i}')
+        with self.assertNumQueries(consultas):
+            metricas_panel()
@@ -0,0 +1,70 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from api import admin_views
+from api.management.commands.check_query_budgets import plantillas_medicion
+from api.models import ModeracionLote, Product
+from api.moderacion import moderar_productos
+
+from .datos import crear_producto, crear_usuario
+
+
+class ModerarProductosTests(TestCase):
+
+    def setUp(self):
+        self.admin = crear_usuario('admin', is_staff=True, is_superuser=True)
+        vendedor = crear_usuario('vendedor')
+        self.ids = [crear_producto(vendedor, titulo=f'Mesa {i}').pk for i in range(5)]
+
+    def test_actualiza_por_lotes_con_auditoria(self):
+        actualizados, lotes = moderar_productos(
+            Product.objects.all(), 'Pausado', usuario=self.admin, criterio={'estado': 'Activo'},
+            origen='test', tamano_lote=2,
+        )
+
+        self.assertEqual((actualizados, lotes), (5, 3))
+        self.assertFalse(Product.objects.exclude(estado='Pausado').exists())
+        auditoria = ModeracionLote.objects.order_by('id')
+        self.assertEqual([lote.productos for lote in auditoria], [self.ids[0:2], self.ids[2:4], self.ids[4:]])
+        self.assertTrue(all(lote.usuario == self.admin and lote.origen == 'test' for lote in auditoria))
+
+    def test_filtro_por_el_estado_que_cambia(self):
+        # Los productos que dejan de cumplir el filtro no desplazan el recorrido por id
+        actualizados, lotes = moderar_productos(Product.objects.filter(estado='Activo'), 'Eliminado', tamano_lote=2)
+
+        self.assertEqual((actualizados, lotes), (5, 3))
+
+    def test_estado_invalido(self):
+        with self.assertRaises(ValueError):
+            moderar_productos(Product.objects.all(), 'Borrado')
+        self.assertFalse(ModeracionLote.objects.exists())
+
+
+@override_settings(TEMPLATES=plantillas_medicion())
+class CambiarEstadoMasivoViewTests(TestCase):
+
+    def setUp(self):
+        ModerarProductosTests.setUp(self)
+        self.client.force_login(self.admin)
+        self.url = reverse(admin_views.cambiar_estado_productos_masivo)
+
+    def _post(self, datos):
+        return self.client.post(self.url, datos, secure=True)
+
+    def test_por_ids(self):
+        response = self._post({'estado': 'Pausado', 'ids': f'{self.ids[0]},{self.ids[1]}'})
+
+        self.assertEqual(response.json()['actualizados'], 2)
+        self.assertEqual(Product.objects.filter(estado='Pausado').count(), 2)
+        self.assertEqual(ModeracionLote.objects.get().criterio, {'ids': 2})
+
+    def test_por_filtro(self):
+        response = self._post({'estado': 'Pausado', 'busqueda': 'Mesa'})
+
+        self.assertEqual(response.json()['actualizados'], 5)
+        self.assertEqual(ModeracionLote.objects.get().criterio, {'busqueda': 'Mesa'})
+
+    def test_exige_ids_o_filtro(self):
+        for datos in ({'estado': 'Pausado'}, {'estado': 'Borrado', 'ids': '1'}, {'estado': 'Pausado', 'ids': 'x'}):
+            self.assertEqual(self._post(datos).status_code, 400)
+        self.assertFalse(Product.objects.exclude(estado='Activo').exists())
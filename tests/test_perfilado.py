@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import perfilado
+from api.autenticacion import TokenMandale
+
+from .datos import crear_producto, crear_usuario
+
+
+class PerfiladorMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+        configuracion = override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directorio,
+                                          PROFILING_SAMPLE_RATES={})
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        crear_producto(crear_usuario('vendedor'))
+
+    def _get(self, usuario=None, **extra):
+        client = APIClient()
+        if usuario:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenMandale.for_user(usuario).access_token}')
+        return client.get('/api/productos/', secure=True, **extra)
+
+    def _perfil(self, nombre):
+        with open(os.path.join(self.directorio, f'{nombre}.json')) as archivo:
+            return json.load(archivo)
+
+    def test_staff_con_header(self):
+        response = self._get(crear_usuario('staff', is_staff=True), HTTP_X_PERFILAR='1')
+
+        perfil = self._perfil(response[perfilado.HEADER_PERFIL])
+        self.assertEqual((perfil['vista'], perfil['motivo']), ('productos-list', 'header'))
+        self.assertEqual(perfil['cantidad_consultas'], len(perfil['consultas']))
+        self.assertGreater(perfil['cantidad_consultas'], 0)
+        self.assertIn('cumulative', perfilado.resumen_texto(perfil['nombre']))
+
+    def test_el_header_no_alcanza_sin_staff(self):
+        for usuario in (None, crear_usuario('cliente')):
+            response = self._get(usuario, HTTP_X_PERFILAR='1')
+            self.assertNotIn(perfilado.HEADER_PERFIL, response)
+        self.assertEqual(os.listdir(self.directorio), [])
+
+    def test_muestreo_por_vista(self):
+        with override_settings(PROFILING_SAMPLE_RATES={'productos-list': 1.0}):
+            response = self._get()
+        self.assertEqual(self._perfil(response[perfilado.HEADER_PERFIL])['motivo'], 'muestreo')
+
+        with override_settings(PROFILING_SAMPLE_RATES={'productos-list': 0.0}):
+            self.assertNotIn(perfilado.HEADER_PERFIL, self._get())
+
+    @override_settings(PROFILING_SAMPLE_RATES={'productos-list': 1.0}, PROFILING_MAX_FILES=2)
+    def test_conserva_los_perfiles_mas_recientes(self):
+        nombres = [self._get()[perfilado.HEADER_PERFIL] for _ in range(3)]
+
+        self.assertEqual(len(perfilado.listar_perfiles()), 2)
+        self.assertEqual(len(os.listdir(self.directorio)), 4)
+        self.assertIsNotNone(perfilado.ruta_perfil(max(nombres), '.prof'))
+
+    def test_nombres_de_perfil_invalidos(self):
+        self.assertIsNone(perfilado.ruta_perfil('../settings', '.json'))
+        self.assertIsNone(perfilado.ruta_perfil('no-existe', '.json'))
@@ -0,0 +1,27 @@
+"""
+Presupuestos de consultas (ver presupuestos.py y el comando check_query_budgets): una vista
+cuya cantidad de consultas crece con los datos (N+1), que supera su presupuesto o que falla
+hace fallar la suite
+"""
+from io import StringIO
+
+from django.test import TestCase, override_settings
+
+from api.management.commands.check_query_budgets import CACHE_MEDICION, Command, plantillas_medicion
+
+
+class PresupuestosConsultasTests(TestCase):
+
+    def test_vistas_dentro_de_presupuesto(self):
+        salida = StringIO()
+        comando = Command(stdout=salida)
+        tamanos = [10, 100]
+        with override_settings(CACHES=CACHE_MEDICION, TEMPLATES=plantillas_medicion(),
+                               SLOW_QUERY_ENABLED=False, PROFILING_ENABLED=False):
+            mediciones, omitidas = comando._medir(tamanos, ['admin/'])
+        fallas = comando._reportar(mediciones, omitidas, tamanos, exigir=False)
+
+        rutas = {medicion['nombre'] for medicion in mediciones.values()}
+        self.assertIn('/api/productos/', rutas)
+        self.assertIn('/admin-panel/productos/', rutas)
+        self.assertEqual(fallas, {}, salida.getvalue())
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.request import Request
+
+from api import replicas
+from api.autenticacion import JWTCacheAuthentication, TokenMandale
+from api.models import Product
+
+from .datos import crear_usuario
+
+
+@override_settings(DB_REPLICAS=['replica'], DB_REPLICA_PIN_SECONDS=5)
+class ReplicaMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # TestCase corre dentro de una transacción, que siempre lee de la primaria
+        fuera_de_transaccion = {DEFAULT_DB_ALIAS: SimpleNamespace(in_atomic_block=False)}
+        parche = mock.patch.object(replicas, 'connections', fuera_de_transaccion)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.usuario = crear_usuario('cliente')
+        self.token = str(TokenMandale.for_user(self.usuario).access_token)
+
+    def _request(self, metodo='get', token=None, usuario=None, **extra):
+        """Pasa un request por el middleware; devuelve (destino de las lecturas, response)"""
+        destinos = []
+
+        def vista(request):
+            if token:
+                # Como hace DRF al autenticar: el usuario del token queda en el request de Django
+                drf = Request(request, authenticators=[JWTCacheAuthentication()])
+                drf.user
+            destinos.append(replicas.EnrutadorReplicas().db_for_read(Product))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), metodo)('/api/productos/', **extra)
+        request.user = usuario or AnonymousUser()
+        if token:
+            request.META['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        response = replicas.ReplicaMiddleware(vista)(request)
+        return destinos[0], response
+
+    def test_lecturas_a_la_replica(self):
+        self.assertEqual(self._request()[0], 'replica')
+        self.assertEqual(self._request(token=self.token)[0], 'replica')
+        self.assertEqual(self._request('post')[0], DEFAULT_DB_ALIAS)
+
+    def test_fija_al_usuario_jwt_que_escribio(self):
+        _, response = self._request('post', token=self.token)
+
+        # Otro dispositivo del mismo usuario, sin la cookie
+        self.assertEqual(self._request(token=self.token)[0], DEFAULT_DB_ALIAS)
+        otro = str(TokenMandale.for_user(crear_usuario('otro')).access_token)
+        self.assertEqual(self._request(token=otro)[0], 'replica')
+        self.assertEqual(response.cookies[replicas.COOKIE_PRIMARIA]['max-age'], 5)
+
+    def test_la_fijacion_vence(self):
+        self._request('post', token=self.token)
+        cache.delete(replicas._clave_fijacion(self.usuario.pk))
+
+        self.assertEqual(self._request(token=self.token)[0], 'replica')
+
+    def test_cookie_para_sesiones(self):
+        _, response = self._request('post', usuario=self.usuario)
+        self.assertIn(replicas.COOKIE_PRIMARIA, response.cookies)
+
+        destino, _ = self._request(usuario=self.usuario, HTTP_COOKIE=f'{replicas.COOKIE_PRIMARIA}=1')
+
+        self.assertEqual(destino, DEFAULT_DB_ALIAS)
+
+    def test_la_vista_puede_forzar_el_destino(self):
+        middleware = replicas.ReplicaMiddleware(lambda request: HttpResponse())
+        vista = replicas.usar_primaria(lambda request: None)
+        request = RequestFactory().get('/')
+
+        with mock.patch.object(replicas, '_destino') as destino:
+            middleware.process_view(request, vista, (), {})
+
+        destino.set.assert_called_once_with(replicas.PRIMARIA)
@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from api.models import Comision, Product, ResumenDiarioCategoria, ResumenDiarioVendedor
+from api.rollups import cambiar_estado_masivo, productos_creados, reconstruir_resumenes
+
+from .datos import crear_producto, crear_usuario
+
+
+def _resumenes():
+    """Filas de resumen con contenido, para comparar el estado incremental con una reconstrucción"""
+    por_categoria = {
+        (fila.fecha, fila.categoria, fila.estado): (fila.cantidad, fila.valor, fila.comision)
+        for fila in ResumenDiarioCategoria.objects.all() if fila.cantidad
+    }
+    por_vendedor = {
+        (fila.fecha, fila.vendedor_id): fila.publicaciones
+        for fila in ResumenDiarioVendedor.objects.all() if fila.publicaciones
+    }
+    return por_categoria, por_vendedor
+
+
+class ResumenesIncrementalesTests(TestCase):
+
+    def setUp(self):
+        self.vendedor = crear_usuario('vendedor')
+        Comision.objects.create(categoria='Muebles', porcentaje=Decimal('10'), activa=True)
+
+    def assertIgualAReconstruir(self):
+        incremental = _resumenes()
+        reconstruir_resumenes()
+        self.assertEqual(incremental, _resumenes())
+
+    def test_alta_cambios_y_baja(self):
+        mesa = crear_producto(self.vendedor, precio='1000')
+        silla = crear_producto(self.vendedor, precio='300')
+        crear_producto(self.vendedor, precio='50', categoria='Ropa')
+
+        mesa.precio = Decimal('1200')
+        mesa.estado = 'Vendido'
+        mesa.save()
+        silla.categoria = 'Ropa'
+        silla.save()
+        Product.objects.get(categoria='Ropa', precio=Decimal('50')).delete()
+
+        fila = ResumenDiarioCategoria.objects.get(categoria='Muebles', estado='Vendido')
+        self.assertEqual((fila.cantidad, fila.valor, fila.comision), (1, Decimal('1200'), Decimal('120')))
+        self.assertIgualAReconstruir()
+
+    def test_campos_diferidos(self):
+        mesa = crear_producto(self.vendedor)
+        parcial = Product.objects.only('id', 'stock').get(pk=mesa.pk)
+        parcial.estado = 'Pausado'
+        parcial.save()
+
+        self.assertIgualAReconstruir()
+
+    def test_alta_masiva_y_cambio_de_estado_masivo(self):
+        productos = Product.objects.bulk_create([
+            Product(titulo=f'Mesa {i}', descripcion='', precio=Decimal('100'), categoria='Muebles',
+                    stock=1, vendedor=self.vendedor)
+            for i in range(5)
+        ])
+        productos_creados(productos)
+
+        actualizados = cambiar_estado_masivo(Product.objects.filter(pk__in=[p.pk for p in productos[:3]]), 'Pausado')
+
+        self.assertEqual(actualizados, 3)
+        self.assertIgualAReconstruir()
+
+    def test_cambio_de_comision_recalcula(self):
+        crear_producto(self.vendedor, precio='1000')
+        comision = Comision.objects.get(categoria='Muebles')
+        comision.porcentaje = Decimal('20')
+        comision.save()
+
+        self.assertEqual(ResumenDiarioCategoria.objects.get(categoria='Muebles').comision, Decimal('200'))
+        self.assertIgualAReconstruir()
+
+    def test_borrar_vendedor_en_cascada(self):
+        crear_producto(self.vendedor)
+        crear_producto(self.vendedor)
+
+        self.vendedor.delete()
+
+        self.assertFalse(ResumenDiarioVendedor.objects.exists())
+        self.assertIgualAReconstruir()
@@ -0,0 +1,85 @@
+import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api import admin_views
+from api.models import Order, Product
+from api.series import serie
+
+from .datos import crear_producto, crear_usuario
+
+
+def _publicado(producto, fecha):
+    Product.objects.filter(pk=producto.pk).update(
+        fecha_publicacion=timezone.make_aware(datetime.datetime.combine(fecha, datetime.time(12)))
+    )
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'series'}})
+class SeriesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.vendedor = crear_usuario('vendedor')
+        self.hoy = timezone.localdate()
+
+    def test_agrupa_por_dia_semana_y_mes_completando_vacios(self):
+        lunes = self.hoy - datetime.timedelta(days=self.hoy.weekday() + 14)
+        for dias in (0, 1, 8):
+            _publicado(crear_producto(self.vendedor), lunes + datetime.timedelta(days=dias))
+
+        diaria = serie('productos', 'dia', desde=lunes, hasta=lunes + datetime.timedelta(days=8))
+        semanal = serie('productos', 'semana', desde=lunes, hasta=lunes + datetime.timedelta(days=8))
+
+        self.assertEqual([punto['total'] for punto in diaria], [1, 1, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual([(punto['periodo'], punto['total']) for punto in semanal],
+                         [(lunes, 2), (lunes + datetime.timedelta(days=7), 1)])
+        mensual = serie('productos', 'mes', desde=lunes, hasta=self.hoy)
+        self.assertEqual(sum(punto['total'] for punto in mensual), 3)
+        self.assertTrue(all(punto['periodo'].day == 1 for punto in mensual))
+
+    def test_ingresos_excluyen_ordenes_canceladas(self):
+        comprador = crear_usuario('comprador')
+        producto = crear_producto(self.vendedor)
+        for estado in ('Entregada', 'Cancelada'):
+            Order.objects.create(comprador=comprador, vendedor=self.vendedor, producto=producto,
+                                 precio_unitario=Decimal('100'), precio_total=Decimal('100'),
+                                 metodo_pago='mercadopago', estado=estado)
+
+        self.assertEqual(serie('ingresos', 'dia')[0]['total'], Decimal('100'))
+
+    def test_periodos_cerrados_salen_de_la_cache(self):
+        ayer = self.hoy - datetime.timedelta(days=1)
+        _publicado(crear_producto(self.vendedor), ayer)
+        serie('productos', 'dia', desde=ayer, hasta=ayer)
+
+        _publicado(crear_producto(self.vendedor), ayer)
+        with self.assertNumQueries(0):
+            puntos = serie('productos', 'dia', desde=ayer, hasta=ayer)
+        self.assertEqual(puntos[0]['total'], 1)
+
+    def test_rango_demasiado_largo(self):
+        with self.assertRaises(ValueError):
+            serie('productos', 'dia', desde=datetime.date(1, 1, 1))
+        self.assertEqual(len(serie('productos', 'mes', desde=datetime.date(2000, 1, 1))),
+                         (self.hoy.year - 2000) * 12 + self.hoy.month)
+
+    def test_fechas_futuras_se_llevan_a_hoy(self):
+        puntos = serie('productos', 'dia', desde=self.hoy, hasta=datetime.date(9999, 12, 31))
+
+        self.assertEqual([punto['periodo'] for punto in puntos], [self.hoy])
+
+    def test_vista_responde_400_con_rangos_invalidos(self):
+        admin = crear_usuario('admin', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        url = reverse(admin_views.estadisticas_series)
+
+        for parametros in ({'granularidad': 'dia', 'desde': '0001-01-01'}, {'desde': 'ayer'},
+                           {'desde': '2020-02-01', 'hasta': '2020-01-01'}):
+            self.assertEqual(self.client.get(url, parametros, secure=True).status_code, 400, parametros)
+        response = self.client.get(url, {'granularidad': 'dia', 'hasta': '9999-12-31'}, secure=True)
+        self.assertEqual(response.status_code, 200)
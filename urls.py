@@ -2,14 +2,17 @@
 URL configuration for mandale project.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
-from api import admin_views
+from api import admin_views, instrumentacion, media_views, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', instrumentacion.vista_metricas, name='metricas'),
+    path('api/productos/importar/', views.importar_productos_masivo, name='importar_productos'),
+    path('api/categorias/', views.categorias_arbol, name='categorias'),
     path('api/', include('api.urls')),
     
     # Login para admin panel
@@ -18,9 +21,18 @@ urlpatterns = [
     # Panel de administración personalizado
     path('admin-panel/', admin_views.admin_panel, name='admin_panel'),
     path('admin-panel/productos/', admin_views.gestionar_productos, name='gestionar_productos'),
+    path('admin-panel/productos/exportar/', admin_views.exportar_productos, name='exportar_productos'),
     path('admin-panel/comisiones/', admin_views.gestionar_comisiones, name='gestionar_comisiones'),
     path('admin-panel/estadisticas/', admin_views.estadisticas, name='estadisticas'),
+    path('admin-panel/estadisticas/series/', admin_views.estadisticas_series, name='estadisticas_series'),
+    path('admin-panel/estadisticas/login/', admin_views.estadisticas_login, name='estadisticas_login'),
+    path('admin-panel/perfiles/', admin_views.perfiles, name='perfiles'),
+    path('admin-panel/perfiles/<str:nombre>/', admin_views.descargar_perfil, name='descargar_perfil'),
+    path('admin-panel/consultas-lentas/', admin_views.consultas_lentas_recientes, name='consultas_lentas'),
+    path('admin-panel/memoria/', admin_views.memoria_reciente, name='memoria'),
+    path('admin-panel/exportaciones/<str:tipo>/', admin_views.exportar_contabilidad, name='exportar_contabilidad'),
     path('admin-panel/producto/<int:producto_id>/cambiar-estado/', admin_views.cambiar_estado_producto, name='cambiar_estado_producto'),
+    path('admin-panel/productos/cambiar-estado/', admin_views.cambiar_estado_productos_masivo, name='cambiar_estado_productos_masivo'),
     
     # Páginas públicas
     path('', TemplateView.as_view(template_name='index.html'), name='home'),
@@ -33,7 +45,11 @@ urlpatterns = [
     path('producto-detalle.html', TemplateView.as_view(template_name='producto-detalle.html'), name='producto_detalle'),
 ]
 
-# Servir archivos estáticos y media en desarrollo
+# Media: la vista controla el acceso y delega la transferencia al servidor web (X-Accel-Redirect / X-Sendfile)
+urlpatterns += [
+    re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<ruta>.+)$', media_views.servir_media, name='servir_media'),
+]
+
+# Servir archivos estáticos en desarrollo
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
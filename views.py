@@ -1,13 +1,18 @@
+import io
+import zipfile
+
 from rest_framework import status, generics, viewsets
 from rest_framework.decorators import api_view, permission_classes, action, parser_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from rest_framework_simplejwt.tokens import RefreshToken
+from .autenticacion import TokenMandale
 from django.contrib.auth import authenticate, login as auth_login
-from django.db.models import Q
+from django.db.models import F, Q
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from .models import (
     User, Product, ProductImage, Order, Rating, Question, Offer, Message,
     Carrier, Shipment, TrackingEvent
@@ -18,6 +23,16 @@ from .serializers import (
     OrderSerializer, RatingSerializer, QuestionSerializer, OfferSerializer, MessageSerializer,
     CarrierSerializer, ShipmentSerializer, TrackingEventSerializer, ShippingQuoteSerializer
 )
+from .idempotency import idempotente
+from .invalidacion import invalidar_claves
+from . import categorias, limites
+from .replicas import usar_primaria
+from .presupuestos import presupuesto_consultas
+from .importacion import FuenteImagenes, importar_productos, leer_filas, tamano_excedido, verificar_archivo
+
+
+CARRIERS_CACHE_KEY = 'envios:carriers_activos'
+CARRIERS_CACHE_TTL = 60 * 5
 
 
 # ==================== AUTENTICACIÓN ====================
@@ -53,7 +68,7 @@ def register(request):
     if serializer.is_valid():
         try:
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = TokenMandale.for_user(user)
             return Response({
                 'message': 'Usuario registrado exitosamente',
                 'token': str(refresh.access_token),
@@ -100,16 +115,27 @@ def login(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    # Se rechaza antes de buscar el usuario y de calcular el hash de la contraseña
+    espera = limites.verificar_login(request, email)
+    if espera:
+        return Response(
+            {'message': 'Demasiados intentos fallidos. Intenta nuevamente más tarde.'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={'Retry-After': str(espera)}
+        )
+    
     try:
         user = User.objects.get(email=email)
     except User.DoesNotExist:
+        limites.registrar_fallo(request, email)
         return Response(
             {'message': 'Credenciales inválidas'},
             status=status.HTTP_401_UNAUTHORIZED
         )
     
     if user.check_password(password):
-        refresh = RefreshToken.for_user(user)
+        limites.registrar_exito(request, email)
+        refresh = TokenMandale.for_user(user)
         user_data = UserSerializer(user).data
         
         # Si es superusuario, crear sesión de Django para acceso al admin panel
@@ -136,12 +162,14 @@ def login(request):
         
         return Response(response_data)
     else:
+        limites.registrar_fallo(request, email)
         return Response(
             {'message': 'Credenciales inválidas'},
             status=status.HTTP_401_UNAUTHORIZED
         )
 
 
+@presupuesto_consultas(2)
 @api_view(['GET', 'PUT', 'PATCH'])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser, JSONParser])
@@ -193,6 +221,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser, JSONParser]  # Para aceptar archivos
+    presupuesto_acciones = {'list': 4, 'retrieve': 5}
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -205,7 +234,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         return [IsAuthenticated()]
     
     def get_queryset(self):
-        queryset = Product.objects.filter(estado='Activo')
+        queryset = Product.objects.filter(estado='Activo').select_related('vendedor').prefetch_related('imagenes')
         
         # Filtros
         categoria = self.request.query_params.get('categoria', None)
@@ -213,7 +242,8 @@ class ProductViewSet(viewsets.ModelViewSet):
         ordenar_por = self.request.query_params.get('ordenar_por', 'fecha')  # fecha, visitas
         
         if categoria:
-            queryset = queryset.filter(categoria=categoria)
+            # Incluye las subcategorías (según el árbol cacheado, sin recorrer productos)
+            queryset = queryset.filter(categoria__in=categorias.subarbol(categoria))
         
         if busqueda:
             queryset = queryset.filter(
@@ -274,17 +304,23 @@ class ProductViewSet(viewsets.ModelViewSet):
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
+        # UPDATE atómico: sin leer y reescribir toda la fila ni perder visitas concurrentes
+        Product.objects.filter(pk=instance.pk).update(visitas=F('visitas') + 1)
         instance.visitas += 1
-        instance.save()
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
     
+    @presupuesto_consultas(4)
+    @usar_primaria
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], url_path='mis_productos')
     def mis_productos(self, request):
         """Obtener productos del usuario autenticado"""
         try:
             print(f"🛍️ Mis productos - Usuario: {request.user.email}")
-            productos = Product.objects.filter(vendedor=request.user).order_by('-fecha_publicacion')
+            productos = (
+                Product.objects.filter(vendedor=request.user)
+                .select_related('vendedor').prefetch_related('imagenes').order_by('-fecha_publicacion')
+            )
             print(f"   Productos encontrados: {productos.count()}")
             serializer = ProductListSerializer(productos, many=True)
             print(f"   Datos serializados: {len(serializer.data)} productos")
@@ -317,6 +353,65 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response({'message': 'Producto eliminado exitosamente'})
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def importar_productos_masivo(request):
+    """Importar productos en lote desde un archivo CSV o NDJSON (imágenes opcionales en un .zip)"""
+    archivo = request.FILES.get('archivo')
+    if not archivo:
+        return Response(
+            {'message': 'Debes enviar el archivo a importar en el campo "archivo"'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    formato = request.data.get('formato') or ('csv' if archivo.name.lower().endswith('.csv') else 'ndjson')
+    if formato not in ['csv', 'ndjson']:
+        return Response(
+            {'message': 'Formato inválido. Use "csv" o "ndjson"'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    imagenes_zip = request.FILES.get('imagenes')
+    error = tamano_excedido(archivo, imagenes_zip)
+    if error:
+        return Response({'message': error}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    
+    # Se valida el archivo completo antes de insertar el primer lote
+    try:
+        verificar_archivo(archivo.file, formato)
+    except ValueError as e:
+        return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        fuente = FuenteImagenes(archivo_zip=imagenes_zip) if imagenes_zip else None
+    except zipfile.BadZipFile:
+        return Response(
+            {'message': 'El archivo de imágenes no es un .zip válido'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        texto = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+        resultado = importar_productos(leer_filas(texto, formato), request.user, fuente_imagenes=fuente)
+    finally:
+        if fuente:
+            fuente.cerrar()
+    
+    return Response(
+        {'message': f"{resultado['creados']} productos importados", **resultado},
+        status=status.HTTP_201_CREATED if not resultado['errores'] else status.HTTP_207_MULTI_STATUS
+    )
+
+
+@presupuesto_consultas(2)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def categorias_arbol(request):
+    """Árbol de categorías con la cantidad de productos activos (cacheado)"""
+    return Response(categorias.arbol())
+
+
 # ==================== PAGOS / BILLETERAS ====================
 
 @api_view(['POST'])
@@ -384,6 +479,7 @@ def desconectar_billetera(request):
     })
 
 
+@presupuesto_consultas(1)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def mis_billeteras(request):
@@ -398,6 +494,7 @@ def mis_billeteras(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotente
 def procesar_pago(request):
     """Procesar pago (simulado)"""
     serializer = PaymentSerializer(data=request.data)
@@ -440,6 +537,7 @@ def procesar_pago(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@presupuesto_consultas(1)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def metodos_disponibles(request):
@@ -472,6 +570,7 @@ def metodos_disponibles(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotente
 def crear_orden(request):
     """Crear una orden de compra"""
     producto_id = request.data.get('producto_id')
@@ -539,26 +638,41 @@ def crear_orden(request):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+def _ordenes_para_serializar(ordenes):
+    """Órdenes con usuarios, producto e imágenes cargados para OrderSerializer (sin N+1)"""
+    ordenes = list(
+        ordenes.select_related('comprador', 'vendedor', 'producto__vendedor')
+        .prefetch_related('producto__imagenes')
+    )
+    User.precargar_calificaciones(
+        [u for orden in ordenes for u in (orden.comprador, orden.vendedor, orden.producto.vendedor)]
+    )
+    return ordenes
+
+
+@presupuesto_consultas(4)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def mis_compras(request):
     """Obtener compras del usuario"""
-    compras = Order.objects.filter(comprador=request.user).order_by('-fecha_creacion')
+    compras = _ordenes_para_serializar(Order.objects.filter(comprador=request.user).order_by('-fecha_creacion'))
     serializer = OrderSerializer(compras, many=True)
     return Response(serializer.data)
 
 
+@presupuesto_consultas(4)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def mis_ventas(request):
     """Obtener ventas del usuario"""
-    ventas = Order.objects.filter(vendedor=request.user).order_by('-fecha_creacion')
+    ventas = _ordenes_para_serializar(Order.objects.filter(vendedor=request.user).order_by('-fecha_creacion'))
     serializer = OrderSerializer(ventas, many=True)
     return Response(serializer.data)
 
 
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
+@idempotente
 def actualizar_estado_orden(request, orden_id):
     """Actualizar estado de una orden (solo vendedor)"""
     try:
@@ -634,6 +748,7 @@ def crear_calificacion(request):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@presupuesto_consultas(4)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def calificaciones_usuario(request, user_id):
@@ -646,7 +761,13 @@ def calificaciones_usuario(request, user_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    calificaciones = Rating.objects.filter(calificado=usuario).order_by('-fecha_creacion')
+    calificaciones = list(
+        Rating.objects.filter(calificado=usuario)
+        .select_related('calificador', 'calificado').order_by('-fecha_creacion')
+    )
+    User.precargar_calificaciones(
+        [usuario] + [u for c in calificaciones for u in (c.calificador, c.calificado)]
+    )
     serializer = RatingSerializer(calificaciones, many=True)
     
     return Response({
@@ -683,6 +804,7 @@ def crear_pregunta(request):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@presupuesto_consultas(4)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def preguntas_producto(request, producto_id):
@@ -695,7 +817,11 @@ def preguntas_producto(request, producto_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    preguntas = Question.objects.filter(producto=producto).order_by('-fecha_pregunta')
+    preguntas = list(
+        Question.objects.filter(producto=producto)
+        .select_related('usuario', 'respondida_por').order_by('-fecha_pregunta')
+    )
+    User.precargar_calificaciones([u for p in preguntas for u in (p.usuario, p.respondida_por)])
     serializer = QuestionSerializer(preguntas, many=True)
     return Response(serializer.data)
 
@@ -774,6 +900,7 @@ def crear_oferta(request):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@presupuesto_consultas(6)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def ofertas_producto(request, producto_id):
@@ -792,7 +919,12 @@ def ofertas_producto(request, producto_id):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    ofertas = Offer.objects.filter(producto=producto).order_by('-fecha_creacion')
+    ofertas = list(
+        Offer.objects.filter(producto=producto)
+        .select_related('comprador', 'producto__vendedor').prefetch_related('producto__imagenes')
+        .order_by('-fecha_creacion')
+    )
+    User.precargar_calificaciones([u for o in ofertas for u in (o.comprador, o.producto.vendedor)])
     serializer = OfferSerializer(ofertas, many=True)
     return Response(serializer.data)
 
@@ -888,13 +1020,16 @@ def enviar_mensaje(request):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@presupuesto_consultas(3)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def mis_mensajes(request):
     """Obtener mensajes del usuario"""
-    mensajes = Message.objects.filter(
-        Q(remitente=request.user) | Q(destinatario=request.user)
-    ).order_by('-fecha_envio')
+    mensajes = list(
+        Message.objects.filter(Q(remitente=request.user) | Q(destinatario=request.user))
+        .select_related('remitente', 'destinatario').order_by('-fecha_envio')
+    )
+    User.precargar_calificaciones([u for m in mensajes for u in (m.remitente, m.destinatario)])
     
     serializer = MessageSerializer(mensajes, many=True)
     return Response(serializer.data)
@@ -938,6 +1073,19 @@ def _asegurar_proveedores_default():
         Carrier(codigo='andreani', nombre='Andreani', activo=False),
         Carrier(codigo='oca', nombre='OCA', activo=False),
     ])
+    invalidar_carriers()
+
+
+def carriers_activos():
+    """Proveedores activos, cacheados (signals.py invalida la caché cuando cambia un Carrier)"""
+    def cargar():
+        _asegurar_proveedores_default()
+        return list(Carrier.objects.filter(activo=True))
+    return cache.get_or_set(CARRIERS_CACHE_KEY, cargar, CARRIERS_CACHE_TTL)
+
+
+def invalidar_carriers():
+    invalidar_claves(CARRIERS_CACHE_KEY)
 
 
 def _get_shipping_data(product, cantidad, data):
@@ -962,8 +1110,6 @@ def _get_shipping_data(product, cantidad, data):
 @permission_classes([IsAuthenticated])
 def shipping_quote(request):
     """Cotizar envíos con proveedores disponibles"""
-    _asegurar_proveedores_default()
-    
     serializer = ShippingQuoteSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     data = serializer.validated_data
@@ -990,7 +1136,7 @@ def shipping_quote(request):
         return Response({'message': error}, status=status.HTTP_400_BAD_REQUEST)
     
     # Simulación de cotización. Aquí se integrará la API real del proveedor.
-    carriers = Carrier.objects.filter(activo=True)
+    carriers = carriers_activos()
     opciones = []
     for idx, carrier in enumerate(carriers, start=1):
         base = 1200 + (shipping_data['peso_kg'] * 350)
@@ -1016,6 +1162,7 @@ def shipping_quote(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotente
 def shipping_create(request):
     """Crear envío asociado a una orden"""
     order_id = request.data.get('order_id')
@@ -1059,12 +1206,17 @@ def shipping_create(request):
 @permission_classes([AllowAny])
 def shipping_webhook(request):
     """Webhook para actualizar estados de envíos"""
+    # El secreto se verifica antes de reservar la clave de idempotencia: un tercero no puede
+    # ocupar las claves del proveedor. Sin secreto no hay remitente verificado ni claves
     secret = getattr(settings, 'SHIPPING_WEBHOOK_SECRET', None)
-    if secret:
-        header_secret = request.headers.get('X-Webhook-Secret')
-        if header_secret != secret:
-            return Response({'message': 'Webhook no autorizado.'}, status=status.HTTP_403_FORBIDDEN)
-    
+    if not secret:
+        return _procesar_webhook_envio(request)
+    if not constant_time_compare(request.headers.get('X-Webhook-Secret', ''), secret):
+        return Response({'message': 'Webhook no autorizado.'}, status=status.HTTP_403_FORBIDDEN)
+    return _procesar_webhook_envio_idempotente(request)
+
+
+def _procesar_webhook_envio(request):
     payload = request.data
     proveedor_envio_id = payload.get('proveedor_envio_id')
     tracking_number = payload.get('tracking_number')
@@ -1108,3 +1260,6 @@ def shipping_webhook(request):
     )
     
     return Response({'message': 'Webhook procesado correctamente.'})
+
+
+_procesar_webhook_envio_idempotente = idempotente(_procesar_webhook_envio, alcance=lambda request: 'webhook-envios')
@@ -6,6 +6,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from api.arranque import iniciar_worker
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mandale_project.settings')
 
 application = get_wsgi_application()
+
+# Precarga los módulos y calienta las cachés antes del primer request (ver api/arranque.py)
+iniciar_worker()